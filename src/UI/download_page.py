@@ -21,11 +21,13 @@ from src.download.download_utils import (
     build_file_filter_stats_text, validate_work_detail_for_download,
     create_download_item_data, calculate_global_speed
 )
-from src.download.download_threads import WorkDetailThread, DownloadListThread
+from src.download.download_threads import WorkDetailThread, WorkDetailFetcher, DownloadListThread, LibraryVerifyThread
+from src.download.progress import get_progress_registry
+from src.download.file_verify import repair_files
 from src.download.download_manager_utils import (
     setup_download_manager, update_download_path_if_needed,
     process_download_completion, get_ready_download_items,
-    start_first_download_and_queue_others, stop_all_downloads,
+    queue_downloads_and_fill_slots, stop_all_downloads,
     check_download_queue_status, clear_download_items_from_layout,
     handle_error_types
 )
@@ -160,6 +162,19 @@ class DownloadItemWidget(QWidget):
 
         bottom_layout.addStretch()
 
+        # 暂停/继续按钮，只在下载中显示
+        self.pause_button = QPushButton(language_manager.get_text('pause'))
+        self.pause_button.setFixedWidth(60)
+        self.pause_button.setVisible(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        bottom_layout.addWidget(self.pause_button)
+
+        # 立即下载按钮，只在排队中或等待重试时显示
+        self.download_now_button = QPushButton(language_manager.get_text('download_now'))
+        self.download_now_button.setVisible(False)
+        self.download_now_button.clicked.connect(self.download_now)
+        bottom_layout.addWidget(self.download_now_button)
+
         layout.addLayout(bottom_layout)
 
         # 文件目录展示区域（初始隐藏）
@@ -433,7 +448,11 @@ class DownloadItemWidget(QWidget):
         self.build_file_tree()
 
     def load_work_detail(self):
-        """加载作品详细信息"""
+        """加载作品详细信息，由下载页面的详情获取调度器统一获取，结果通过下载页面转交"""
+        if self.parent_page is not None:
+            self.parent_page.detail_fetcher.request(self.work_info['id'])
+            return
+
         self.detail_thread = WorkDetailThread(self.work_info['id'])
         self.detail_thread.detail_loaded.connect(self.on_detail_loaded)
         self.detail_thread.error_occurred.connect(self.on_detail_error)
@@ -482,25 +501,62 @@ class DownloadItemWidget(QWidget):
             return None, None
 
         self.is_downloading = True
+        self.is_paused = False
         self.status_label.setText(language_manager.get_text('downloading'))
+        self.pause_button.setText(language_manager.get_text('pause'))
+        self.pause_button.setVisible(True)
+        self.download_now_button.setVisible(False)
         # 重置进度条样式，清除之前的错误状态样式
         self.progress_bar.setStyleSheet("")
         return create_download_item_data(self.work_info['id'], self.work_detail)
 
+    def set_queued(self):
+        """标记为排队中，等待空闲的下载槽位"""
+        self.is_downloading = True
+        self.status_label.setText(language_manager.get_text('queued'))
+        self.progress_bar.setStyleSheet("")
+        self.download_now_button.setVisible(True)
+
+    def set_preempted(self):
+        """为立即下载的作品让出了槽位，有空闲槽位时自动继续"""
+        self.is_paused = False
+        self.status_label.setText(language_manager.get_text('queued'))
+        self.speed_label.setText("0 KB/s")
+        self.pause_button.setVisible(False)
+        self.download_now_button.setVisible(True)
+
+    def download_now(self):
+        """跳过队列中的其他作品立即开始下载"""
+        if self.parent_page and self.parent_page.download_manager:
+            self.parent_page.download_manager.download_now(str(self.work_info['id']))
+
+    def toggle_pause(self):
+        """暂停或继续当前作品的下载"""
+        if self.is_paused:
+            self.resume_download()
+        else:
+            self.pause_download()
+
     def pause_download(self):
-        """暂停下载（由全局按钮调用）"""
+        """暂停下载，连接会被关闭，下载槽位交给排队中的其他作品"""
         if not self.is_downloading:
             return
         self.is_paused = True
         self.status_label.setText(language_manager.get_text('paused'))
         self.speed_label.setText("0 KB/s")
+        self.pause_button.setText(language_manager.get_text('resume'))
+        if self.parent_page and self.parent_page.download_manager:
+            self.parent_page.download_manager.pause_download(str(self.work_info['id']))
 
     def resume_download(self):
-        """继续下载（由全局按钮调用）"""
+        """继续下载，从已下载的位置重新请求；没有空闲槽位时排队等待"""
         if not self.is_downloading:
             return
         self.is_paused = False
-        self.status_label.setText(language_manager.get_text('downloading'))
+        self.status_label.setText(language_manager.get_text('queued'))
+        self.pause_button.setText(language_manager.get_text('pause'))
+        if self.parent_page and self.parent_page.download_manager:
+            self.parent_page.download_manager.resume_download(str(self.work_info['id']))
 
 
     def update_progress(self, progress, downloaded_bytes=0, total_bytes=0, status="下载中..."):
@@ -538,6 +594,8 @@ class DownloadItemWidget(QWidget):
             self.status_label.setText(language_manager.get_text('completed'))
             self.speed_label.setText("0 KB/s")
             self.is_downloading = False
+            self.pause_button.setVisible(False)
+            self.download_now_button.setVisible(False)
 
     def update_speed(self, speed_kbps):
         """更新下载速度显示"""
@@ -551,6 +609,19 @@ class DownloadItemWidget(QWidget):
         self.status_label.setText(f"{language_manager.get_text('error')}: {error_msg}")
         self.speed_label.setText("0 KB/s")
         self.is_downloading = False
+        self.pause_button.setVisible(False)
+        self.download_now_button.setVisible(False)
+
+    def set_retrying(self, error_msg, attempt, max_attempts, delay):
+        """下载失败后等待自动重试，仍由下载管理器管理"""
+        retry_text = language_manager.get_text('retry_scheduled').format(
+            delay=int(delay), attempt=attempt, total=max_attempts)
+        self.status_label.setText(f"{language_manager.get_text('error')}: {error_msg}, {retry_text}")
+        self.status_label.setToolTip(error_msg)
+        self.speed_label.setText("0 KB/s")
+        self.is_downloading = True
+        self.pause_button.setVisible(False)
+        self.download_now_button.setVisible(True)
 
 
 
@@ -574,6 +645,9 @@ class DownloadItemWidget(QWidget):
         else:
             self.speed_label.setText(f"{self.download_speed:.1f} {language_manager.get_text('kb_per_second')}")
 
+        self.pause_button.setText(language_manager.get_text('resume' if self.is_paused else 'pause'))
+        self.download_now_button.setText(language_manager.get_text('download_now'))
+
         # 更新加载状态
         if not self.work_detail and self.size_label.text() == "Loading...":
             self.size_label.setText(language_manager.get_text('loading'))
@@ -589,6 +663,18 @@ class DownloadPage(QWidget):
         self.download_manager = None
         self.is_downloading_active = False  # 跟踪是否有活动下载
         self.auto_refresh_enabled = True   # 是否启用自动刷新功能
+        self.failed_work_ids = set()  # 重试次数用完仍然失败的作品，自动刷新后不再自动开始，避免反复失败
+        self.completed_work_ids = set()  # 本次运行中下载完成的作品，后台获取的新列表中没有它们时从列表移除
+        # 后台获取下载列表（低水位补充队列）
+        self.list_thread = None
+        self.refill_thread = None
+        self.last_refill_time = 0
+        self.refill_added = 0  # 最近一次后台获取追加的作品数
+        self.awaiting_detail_ids = set()  # 后台追加、还在等待详情的作品
+        # 所有下载项共用的作品详情获取调度器
+        self.detail_fetcher = WorkDetailFetcher(self.conf.read_download_conf()['detail_workers'])
+        self.detail_fetcher.detail_loaded.connect(self.on_work_detail_loaded)
+        self.detail_fetcher.error_occurred.connect(self.on_work_detail_error)
         self.setup_ui()
         self.setup_download_manager()
         self.load_download_list()
@@ -647,6 +733,11 @@ class DownloadPage(QWidget):
         self.refresh_button.clicked.connect(self.load_download_list)
         top_layout.addWidget(self.refresh_button)
 
+        # 校验已下载文件按钮
+        self.verify_button = QPushButton(language_manager.get_text('verify_library'))
+        self.verify_button.clicked.connect(self.verify_library)
+        top_layout.addWidget(self.verify_button)
+
         # 设置按钮
         self.settings_button = QPushButton(language_manager.get_text('settings'))
         self.settings_button.clicked.connect(self.open_settings)
@@ -667,6 +758,8 @@ class DownloadPage(QWidget):
         self.download_layout.addStretch()
 
         self.scroll.setWidget(self.download_container)
+        # 滚动时优先获取可见作品的详情
+        self.scroll.verticalScrollBar().valueChanged.connect(self.prioritize_visible_items)
         layout.addWidget(self.scroll)
 
         # 底部状态栏
@@ -694,11 +787,26 @@ class DownloadPage(QWidget):
         self.download_manager.download_progress.connect(self.on_download_progress)
         self.download_manager.download_completed.connect(self.on_download_completed)
         self.download_manager.download_failed.connect(self.on_download_failed)
-        self.download_manager.speed_updated.connect(self.on_speed_updated)
+        self.download_manager.download_retry_scheduled.connect(self.on_download_retry_scheduled)
+        self.download_manager.queue_finished.connect(self.on_queue_finished)
+        self.download_manager.download_preempted.connect(self.on_download_preempted)
         self.download_manager.file_filter_stats.connect(self.on_file_filter_stats)
 
+        # 恢复上次未完成的下载任务，下载管理器启动后从中断的位置继续
+        for work_id, work_detail, work_info in self.download_manager.restore_jobs():
+            if work_info and str(work_id) not in self.download_items:
+                item = self.add_download_item(work_info)
+                item.work_detail = work_detail
+                self.sync_item_with_download_manager(item)
+
         self.download_manager.start()
 
+        # 下载线程只累加进度计数器，由定时器按固定频率统一刷新所有下载项
+        progress_fps = max(1, self.conf.read_download_conf()['progress_fps'])
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        self.progress_timer.start(int(1000 / progress_fps))
+
     def update_download_path(self):
         """动态更新下载路径，无需重启程序"""
         update_download_path_if_needed(self.download_manager)
@@ -707,26 +815,42 @@ class DownloadPage(QWidget):
         self.status_label.setText(language_manager.get_text('loading'))
         self.refresh_button.setEnabled(False)
 
+        self.list_loaded_pages = 0
         self.list_thread = DownloadListThread()
+        self.list_thread.page_loaded.connect(self.on_list_page_loaded)
         self.list_thread.list_updated.connect(self.on_list_updated)
         self.list_thread.error_occurred.connect(self.on_list_error)
         self.list_thread.finished.connect(lambda: self.refresh_button.setEnabled(True))
         self.list_thread.start()
 
-    def on_list_updated(self, works_list):
-        # 清空现有列表（这已经重置了所有状态）
-        self.clear_all_items()
+    def on_list_page_loaded(self, works):
+        """收到一页下载列表，立即显示并开始加载详情，不等待其余页面"""
+        if self.list_loaded_pages == 0:
+            # 收到第一页时清空现有列表（这已经重置了所有状态）
+            self.clear_all_items()
+        self.list_loaded_pages += 1
+
+        # 添加新的下载项，已在下载管理器中的作品恢复对应的下载状态
+        for work in works:
+            if str(work['id']) not in self.download_items:
+                item = self.add_download_item(work)
+                self.sync_item_with_download_manager(item)
 
-        # 添加新的下载项
-        for work in works_list:
-            self.add_download_item(work)
+        # 布局更新后再计算哪些作品可见
+        QTimer.singleShot(0, self.prioritize_visible_items)
 
         # 更新计数和状态
-        self.count_label.setText(f"{language_manager.get_text('total_count')}: {len(works_list)}")
-        
+        self.count_label.setText(f"{language_manager.get_text('total_count')}: {len(self.download_items)}")
+        self.status_label.setText(f"{language_manager.get_text('loading')} {len(self.download_items)} {language_manager.get_text('download_items')}")
+
+    def on_list_updated(self, works_list):
+        """下载列表全部获取完成"""
+        if self.list_loaded_pages == 0:
+            self.clear_all_items()
+
         # 根据列表是否为空设置不同的状态信息
-        if works_list:
-            self.status_label.setText(f"{language_manager.get_text('loaded_items')} {len(works_list)} {language_manager.get_text('download_items')}")
+        if self.download_items:
+            self.status_label.setText(f"{language_manager.get_text('loaded_items')} {len(self.download_items)} {language_manager.get_text('download_items')}")
             self.start_all_button.setEnabled(True)
         else:
             # 对于空列表，保持清空状态并显示合适的提示
@@ -764,11 +888,66 @@ class DownloadPage(QWidget):
     def add_download_item(self, work_info):
         item_widget = DownloadItemWidget(work_info, parent_page=self)
         item_widget.detail_ready.connect(self.check_start_all_button)
+        item_widget.detail_ready.connect(lambda widget=item_widget: self.on_item_detail_ready(widget))
 
         # 插入到倒数第二个位置（最后一个是stretch）
         self.download_layout.insertWidget(self.download_layout.count() - 1, item_widget)
 
         self.download_items[str(work_info['id'])] = item_widget
+        return item_widget
+
+    def sync_item_with_download_manager(self, item):
+        """下载项与下载管理器中的任务状态保持一致（如恢复的任务、刷新列表时仍在下载的作品）"""
+        state = self.download_manager.get_job_state(item.work_info['id']) if self.download_manager else None
+        if state is None:
+            return
+
+        if state == 'queued':
+            item.set_queued()
+        else:
+            item.is_downloading = True
+            item.is_paused = state == 'paused'
+            item.status_label.setText(language_manager.get_text('paused' if item.is_paused else 'downloading'))
+            item.pause_button.setText(language_manager.get_text('resume' if item.is_paused else 'pause'))
+            item.pause_button.setVisible(True)
+
+        self.is_downloading_active = True
+        self.start_all_button.setEnabled(True)
+        self.start_all_button.setText(language_manager.get_text('stop_download'))
+        self.start_all_button.setStyleSheet("background-color: #f44336; color: white; font-weight: bold;")
+
+    def on_work_detail_loaded(self, work_id, work_detail):
+        """详情获取调度器返回结果，转交给对应的下载项"""
+        if work_id in self.download_items:
+            self.download_items[work_id].on_detail_loaded(work_detail)
+        if work_id in self.awaiting_detail_ids:
+            self.awaiting_detail_ids.discard(work_id)
+            self.check_idle()
+
+    def on_work_detail_error(self, work_id, error_msg):
+        if work_id in self.download_items:
+            self.download_items[work_id].on_detail_error(error_msg)
+        if work_id in self.awaiting_detail_ids:
+            self.awaiting_detail_ids.discard(work_id)
+            self.check_idle()
+
+    def prioritize_visible_items(self):
+        """提高当前滚动区域内可见、且尚未获取详情的作品的优先级"""
+        viewport_top = self.scroll.verticalScrollBar().value()
+        viewport_bottom = viewport_top + self.scroll.viewport().height()
+        for work_id, item in self.download_items.items():
+            if item.work_detail is None and item.y() < viewport_bottom and item.y() + item.height() > viewport_top:
+                self.detail_fetcher.bump(work_id, WorkDetailFetcher.PRIORITY_VISIBLE)
+
+    def prioritize_next_downloads(self):
+        """下载进行中时，按列表顺序提高接下来要下载的作品的优先级"""
+        count = self.download_manager.max_concurrent if self.download_manager else 1
+        for work_id, item in self.download_items.items():
+            if count <= 0:
+                break
+            if item.work_detail is None:
+                self.detail_fetcher.bump(work_id, WorkDetailFetcher.PRIORITY_NEXT_DOWNLOAD)
+                count -= 1
 
     def collapse_all_except(self, exception_widget):
         """收起所有展开的项，除了指定的项"""
@@ -778,6 +957,11 @@ class DownloadPage(QWidget):
 
     def clear_all_items(self):
         """完全清空所有下载项和UI状态"""
+        # 不再需要获取已移除作品的详情
+        self.detail_fetcher.clear()
+        self.awaiting_detail_ids.clear()
+        self.completed_work_ids.clear()
+
         # 使用工具函数清空下载项
         clear_download_items_from_layout(self.download_layout, self.download_items)
         
@@ -807,8 +991,11 @@ class DownloadPage(QWidget):
         QApplication.processEvents()
 
     def on_download_started(self, work_id):
-        """下载开始"""
+        """下载开始（排队中的任务获得下载槽位）"""
         print(f"开始下载: {work_id}")
+        if work_id in self.download_items:
+            self.download_items[work_id].start_download()
+        self.check_refill()
 
     def on_download_progress(self, work_id, progress, downloaded, total, status):
         """下载进度更新"""
@@ -818,51 +1005,76 @@ class DownloadPage(QWidget):
     def on_download_completed(self, work_id):
         """下载完成"""
         process_download_completion(work_id)
+        self.completed_work_ids.add(work_id)
         if work_id in self.download_items:
             self.download_items[work_id].update_progress(100, 0, 0, language_manager.get_text('completed'))
         self.update_global_speed()
+        if self.is_downloading_active:
+            self.prioritize_next_downloads()
 
-        # 检查是否还有等待中的下载任务
-        queue_status = check_download_queue_status(self.download_manager)
-        if queue_status == "has_queue":
-            # 获取 RJ 号用于显示
-            rj_display = work_id
-            if work_id in self.download_items:
-                work_info = self.download_items[work_id].work_info
-                rj_display = work_info.get('source_id', f"RJ{work_id}")
+        # 还有等待中的下载任务时显示进度，全部结束由 on_queue_finished 处理
+        if check_download_queue_status(self.download_manager) == "has_queue":
+            rj_display = self.get_rj_display(work_id)
             self.status_label.setText(f"{language_manager.get_text('download_completed')}: {rj_display}, {language_manager.get_text('continue_next')}")
-        else:
-            # 所有下载完成，检查是否需要自动刷新列表
-            if self.auto_refresh_enabled and self.is_downloading_active:
-                print("所有下载任务完成，开始自动刷新列表...")
-                self.status_label.setText("所有下载完成，正在自动刷新列表...")
-                # 延迟3秒后自动刷新，给用户一些时间看到完成状态
-                QTimer.singleShot(3000, self.auto_refresh_and_continue)
-            else:
-                # 所有下载完成，重置按钮状态
-                self.is_downloading_active = False
-                self.start_all_button.setText(language_manager.get_text('start_download'))
-                self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
-                self.status_label.setText(language_manager.get_text('all_downloads_completed'))
+            self.check_refill()
 
     def on_download_failed(self, work_id, error):
-        """下载失败"""
+        """作品重试次数用完仍然失败，队列中的其他作品继续下载"""
+        self.failed_work_ids.add(work_id)
         if work_id in self.download_items:
             self.download_items[work_id].set_error(error)
         self.update_global_speed()
-        
-        # 下载失败时重置按钮状态
-        self.is_downloading_active = False
-        self.start_all_button.setText(language_manager.get_text('start_download'))
-        self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
-        
-        # 显示错误对话框
-        self.show_download_error(work_id, error)
+        self.status_label.setText(f"{language_manager.get_text('error')}: {self.get_rj_display(work_id)} {language_manager.get_text('download_failed')}")
+        self.check_refill()
 
-    def on_speed_updated(self, work_id, speed_kbps):
-        """速度更新"""
+    def on_download_preempted(self, work_id):
+        """下载让出了槽位，等待继续"""
         if work_id in self.download_items:
-            self.download_items[work_id].update_speed(speed_kbps)
+            self.download_items[work_id].set_preempted()
+
+    def on_download_retry_scheduled(self, work_id, error, attempt, delay):
+        """作品下载失败，等待一段时间后自动重试"""
+        if work_id in self.download_items:
+            self.download_items[work_id].set_retrying(error, attempt, self.download_manager.work_retries, delay)
+        self.update_global_speed()
+
+    def on_queue_finished(self, failed_works):
+        """所有下载任务结束（包括重试），汇总失败的作品"""
+        if failed_works:
+            self.show_failure_summary(failed_works)
+
+        # 所有下载完成，检查是否需要自动刷新列表（有作品失败时也继续，不中断无人值守的下载）
+        if self.auto_refresh_enabled and self.is_downloading_active:
+            if not failed_works:
+                self.status_label.setText("所有下载完成，正在自动刷新列表...")
+            # 后台获取已经在进行时等它完成，否则立即获取；获取完成后由 check_idle 决定是否结束
+            self.check_refill(force=True)
+            self.check_idle()
+        else:
+            # 所有下载完成，重置按钮状态
+            self.is_downloading_active = False
+            self.start_all_button.setText(language_manager.get_text('start_download'))
+            self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
+            if not failed_works:
+                self.status_label.setText(language_manager.get_text('all_downloads_completed'))
+
+    def refresh_progress(self):
+        """读取所有正在下载的作品的进度计数器，批量更新进度、速度和总速度"""
+        counters = get_progress_registry().snapshot()
+        if not counters:
+            return
+
+        for counter in counters:
+            # 已暂停或等待继续的作品不占用槽位，进度也不会变化
+            if counter.work_id not in self.download_manager.active_downloads:
+                continue
+            progress, downloaded, total, speed_kbps = counter.sample()
+            item = self.download_items.get(counter.work_id)
+            if item is None:
+                continue
+            # 完成状态由下载完成信号设置，计数器达到100%时仍显示为下载中
+            item.update_progress(min(progress, 99), downloaded, total, language_manager.get_text('downloading'))
+            item.update_speed(speed_kbps)
         self.update_global_speed()
 
     def on_file_filter_stats(self, work_id, api_total, actual_total, skipped_total, total_files, skipped_files):
@@ -876,6 +1088,12 @@ class DownloadPage(QWidget):
         status_text = build_file_filter_stats_text(rj_display, total_files, skipped_files, skipped_total, actual_total)
         self.status_label.setText(status_text)
 
+    def on_item_detail_ready(self, item):
+        """下载进行中时，后续页面的作品详情加载完成后直接加入下载队列"""
+        if self.is_downloading_active and not item.is_downloading \
+                and str(item.work_info['id']) not in self.failed_work_ids:
+            queue_downloads_and_fill_slots([item], self.download_manager)
+
     def check_start_all_button(self):
         """检查是否应该启用开始全部下载按钮"""
         ready_count = 0
@@ -897,17 +1115,21 @@ class DownloadPage(QWidget):
 
     def start_downloads(self):
         """开始下载"""
+        # 手动开始时重新尝试之前失败的作品
+        self.failed_work_ids.clear()
         # 获取所有准备好的下载项
         ready_items = get_ready_download_items(self.download_layout, DownloadItemWidget)
 
         if ready_items:
             # 使用工具函数开始下载
-            if start_first_download_and_queue_others(ready_items, self.download_manager):
+            if queue_downloads_and_fill_slots(ready_items, self.download_manager):
                 # 更新状态
                 self.is_downloading_active = True
+                self.prioritize_next_downloads()
                 self.start_all_button.setText(language_manager.get_text('stop_download'))
                 self.start_all_button.setStyleSheet("background-color: #f44336; color: white; font-weight: bold;")
-                self.status_label.setText(f"{language_manager.get_text('start_sequential_download')} {len(ready_items)} {language_manager.get_text('tasks')}")
+                start_text = 'start_sequential_download' if self.download_manager.max_concurrent == 1 else 'start_concurrent_download'
+                self.status_label.setText(f"{language_manager.get_text(start_text)} {len(ready_items)} {language_manager.get_text('tasks')}")
         else:
             self.status_label.setText(language_manager.get_text('no_downloadable_tasks'))
 
@@ -918,6 +1140,8 @@ class DownloadPage(QWidget):
 
         # 更新所有下载项状态
         for item in self.download_items.values():
+            item.pause_button.setVisible(False)
+            item.download_now_button.setVisible(False)
             if item.is_downloading:
                 item.is_downloading = False
                 item.is_paused = False
@@ -958,6 +1182,7 @@ class DownloadPage(QWidget):
             self.start_all_button.setText(language_manager.get_text('start_download'))
         
         self.refresh_button.setText(language_manager.get_text('refresh_list'))
+        self.verify_button.setText(language_manager.get_text('verify_library'))
         self.settings_button.setText(language_manager.get_text('settings'))
 
         # 更新全局速度标签
@@ -984,121 +1209,163 @@ class DownloadPage(QWidget):
         self.settings_page.raise_()
         self.settings_page.activateWindow()
 
+    def verify_library(self):
+        """在后台线程中校验下载目录中已下载的文件"""
+        download_conf = self.conf.read_download_conf()
+        self.verify_button.setEnabled(False)
+        self.status_label.setText(language_manager.get_text('verify_in_progress'))
+        self.verify_thread = LibraryVerifyThread(download_conf['download_path'], download_conf['verify_workers'])
+        self.verify_thread.verify_finished.connect(self.on_verify_finished)
+        self.verify_thread.error_occurred.connect(self.on_verify_error)
+        self.verify_thread.start()
+
+    def on_verify_finished(self, checked, problems):
+        """显示文件校验结果"""
+        self.verify_button.setEnabled(True)
+        if problems:
+            text = language_manager.get_text('verify_problems').format(checked=checked, count=len(problems))
+        else:
+            text = language_manager.get_text('verify_all_ok').format(checked=checked)
+        self.status_label.setText(text)
+
+        msg_box = QMessageBox(self)
+        msg_box.setIcon(QMessageBox.Icon.Warning if problems else QMessageBox.Icon.Information)
+        msg_box.setWindowTitle(language_manager.get_text('verify_result'))
+        msg_box.setText(text)
+        if not problems:
+            msg_box.show()
+            return
+
+        # 损坏的文件可能是下载后被用户修改过（如重新写入标签），只在用户确认后删除
+        msg_box.setText(f"{text}\n\n{language_manager.get_text('verify_confirm_repair')}")
+        msg_box.setDetailedText('\n'.join(f"{file_path}: {reason}" for file_path, reason in problems))
+        msg_box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        msg_box.setDefaultButton(QMessageBox.StandardButton.No)
+        if msg_box.exec() != QMessageBox.StandardButton.Yes:
+            return
+        repaired = repair_files([file_path for file_path, _ in problems])
+        self.status_label.setText(language_manager.get_text('verify_repaired').format(count=repaired))
+
+    def on_verify_error(self, error_msg):
+        self.verify_button.setEnabled(True)
+        self.status_label.setText(f"{language_manager.get_text('verify_failed')}: {error_msg}")
+
     def update_global_speed(self):
         """更新全局下载速度"""
         total_speed = calculate_global_speed(self.download_items)
         speed_text = format_speed_display(total_speed)
         self.global_speed_label.setText(f"{language_manager.get_text('total_speed')}: {speed_text}")
 
-    def show_download_error(self, work_id, error_msg):
-        """显示下载错误对话框"""
-        # 获取作品信息
-        work_title = "未知作品"
-        rj_display = work_id
+    def get_rj_display(self, work_id):
+        """获取作品的 RJ 号用于显示"""
         if work_id in self.download_items:
             work_info = self.download_items[work_id].work_info
-            work_title = work_info.get('title', '未知作品')
-            rj_display = work_info.get('source_id', f"RJ{work_id}")
-        
-        # 创建错误对话框
-        msg_box = QMessageBox(self)
-        msg_box.setIcon(QMessageBox.Icon.Critical)
-        msg_box.setWindowTitle(language_manager.get_text('download_error'))
-        msg_box.setText(f"{language_manager.get_text('download_failed')}")
-        
-        # 详细信息
-        detail_text = f"作品: {rj_display} - {work_title}\n\n错误信息:\n{error_msg}\n\n下载队列已停止，请检查网络连接或稍后重试。"
-        msg_box.setDetailedText(detail_text)
-        
-        # 设置按钮
-        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-        
-        # 更新状态标签
-        self.status_label.setText(f"{language_manager.get_text('error')}: {rj_display} {language_manager.get_text('download_failed')}")
-        
-        # 显示对话框
-        msg_box.exec()
+            return work_info.get('source_id', f"RJ{work_id}")
+        return work_id
 
-    def auto_refresh_and_continue(self):
-        """自动刷新列表并继续下载"""
-        print("开始执行自动刷新...")
-        
-        # 禁用刷新按钮，防止用户重复点击
-        self.refresh_button.setEnabled(False)
-        self.status_label.setText("正在获取新的下载列表...")
-        
-        # 创建新的下载列表线程
-        self.auto_list_thread = DownloadListThread()
-        self.auto_list_thread.list_updated.connect(self.on_auto_refresh_completed)
-        self.auto_list_thread.error_occurred.connect(self.on_auto_refresh_failed)
-        self.auto_list_thread.finished.connect(lambda: self.refresh_button.setEnabled(True))
-        self.auto_list_thread.start()
-
-    def on_auto_refresh_completed(self, works_list):
-        """自动刷新完成，更新列表并自动开始下载"""
-        print(f"自动刷新成功，获取到 {len(works_list)} 个新的下载项目")
-        
-        # 清空现有列表
-        self.clear_all_items()
-
-        # 添加新的下载项
-        for work in works_list:
-            self.add_download_item(work)
-
-        self.count_label.setText(f"{language_manager.get_text('total_count')}: {len(works_list)}")
-        
-        if works_list:
-            # 自动开始下载新列表
-            print("自动开始下载新列表...")
-            self.status_label.setText(f"已刷新列表，获取到 {len(works_list)} 个新项目，正在自动开始下载...")
-            
-            # 等待所有详情加载完成后再开始下载
-            QTimer.singleShot(2000, self.auto_start_downloads)
-        else:
-            # 没有新的下载项，停止自动下载
-            print("没有获取到新的下载项目，停止自动下载")
-            self.is_downloading_active = False
-            self.start_all_button.setText(language_manager.get_text('start_download'))
-            self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
-            self.status_label.setText("刷新完成，但没有新的下载项目")
+    def show_failure_summary(self, failed_works):
+        """所有任务结束后汇总显示下载失败的作品，不阻塞界面"""
+        text = language_manager.get_text('download_failures_summary').format(count=len(failed_works))
+        self.status_label.setText(text)
 
-    def on_auto_refresh_failed(self, error_msg):
-        """自动刷新失败"""
+        msg_box = QMessageBox(self)
+        msg_box.setIcon(QMessageBox.Icon.Warning)
+        msg_box.setWindowTitle(language_manager.get_text('download_error'))
+        msg_box.setText(text)
+        msg_box.setDetailedText('\n\n'.join(
+            f"{self.get_rj_display(work_id)}: {error}" for work_id, error in failed_works
+        ))
+        msg_box.setModal(False)
+        msg_box.show()
+
+    def check_refill(self, force=False):
+        """
+        自动下载时排队的作品不多于低水位就在后台获取新的下载列表，
+        新作品直接追加到列表末尾并在详情获取后加入下载队列，正在下载的作品不受影响
+
+        Args:
+            force: 忽略两次获取之间的最短间隔（队列已经空了）
+        """
+        if not (self.auto_refresh_enabled and self.is_downloading_active):
+            return
+        if self.refill_thread is not None or (self.list_thread is not None and self.list_thread.isRunning()):
+            return
+        download_conf = self.conf.read_download_conf()
+        if not force:
+            if len(self.download_manager.download_queue) > download_conf['refill_watermark']:
+                return
+            if time.time() - self.last_refill_time < download_conf['refill_interval']:
+                return
+
+        print("下载队列即将用完，在后台获取新的下载列表...")
+        self.last_refill_time = time.time()
+        self.refill_added = 0
+        self.refill_thread = DownloadListThread()
+        self.refill_thread.page_loaded.connect(self.on_refill_page_loaded)
+        self.refill_thread.list_updated.connect(self.on_refill_finished)
+        self.refill_thread.error_occurred.connect(self.on_refill_failed)
+        self.refill_thread.finished.connect(self.on_refill_thread_finished)
+        self.refill_thread.start()
+
+    def on_refill_page_loaded(self, works):
+        """追加列表中新出现的作品，已有的下载项保持不变"""
+        added = 0
+        for work in works:
+            work_id = str(work['id'])
+            if work_id in self.download_items:
+                continue
+            item = self.add_download_item(work)
+            self.sync_item_with_download_manager(item)
+            if item.work_detail is None:
+                self.awaiting_detail_ids.add(work_id)
+                self.detail_fetcher.bump(work_id, WorkDetailFetcher.PRIORITY_NEXT_DOWNLOAD)
+            added += 1
+
+        if added:
+            self.refill_added += added
+            self.count_label.setText(f"{language_manager.get_text('total_count')}: {len(self.download_items)}")
+            self.status_label.setText(f"已追加 {self.refill_added} 个新的下载项目")
+
+    def on_refill_finished(self, works_list):
+        """新列表获取完成，移除已经下载完成并且不在新列表中的作品"""
+        current_ids = {str(work['id']) for work in works_list}
+        for work_id in list(self.completed_work_ids):
+            if work_id in current_ids or work_id not in self.download_items:
+                continue
+            if self.download_manager.get_job_state(work_id) is not None:
+                continue
+            item = self.download_items.pop(work_id)
+            self.download_layout.removeWidget(item)
+            item.deleteLater()
+            self.completed_work_ids.discard(work_id)
+        self.count_label.setText(f"{language_manager.get_text('total_count')}: {len(self.download_items)}")
+        print(f"后台获取下载列表完成，新增 {self.refill_added} 个下载项目")
+
+    def on_refill_failed(self, error_msg):
+        """后台获取失败不影响正在进行的下载，队列空闲时停止自动下载"""
         print(f"自动刷新失败: {error_msg}")
-        
-        # 停止自动下载
+        if self.is_downloading_active and not self.download_manager.has_pending_downloads():
+            self.status_label.setText(f"自动刷新失败: {error_msg}")
+
+    def on_refill_thread_finished(self):
+        self.refill_thread = None
+        self.check_idle()
+
+    def check_idle(self):
+        """
+        下载队列已经空了时决定是否继续：还有作品在等待详情时继续等待，
+        上一次获取到新作品时立即再获取一次，否则结束自动下载
+        """
+        if not self.is_downloading_active or self.download_manager.has_pending_downloads():
+            return
+        if self.refill_thread is not None or self.awaiting_detail_ids:
+            return
+        if self.auto_refresh_enabled and self.refill_added:
+            self.check_refill(force=True)
+            return
+
         self.is_downloading_active = False
         self.start_all_button.setText(language_manager.get_text('start_download'))
         self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
-        self.status_label.setText(f"自动刷新失败: {error_msg}")
-
-    def auto_start_downloads(self):
-        """自动开始下载"""
-        # 获取所有准备好的下载项
-        ready_items = get_ready_download_items(self.download_layout, DownloadItemWidget)
-
-        if ready_items:
-            print(f"开始自动下载 {len(ready_items)} 个项目")
-            
-            # 使用工具函数开始下载
-            if start_first_download_and_queue_others(ready_items, self.download_manager):
-                # 保持下载状态
-                self.status_label.setText(f"自动开始下载 {len(ready_items)} 个新项目")
-        else:
-            print("没有准备好的下载项目")
-            # 等待一下再重试，可能详情还在加载中
-            QTimer.singleShot(2000, self.check_and_retry_auto_start)
-
-    def check_and_retry_auto_start(self):
-        """检查并重试自动开始下载"""
-        ready_items = get_ready_download_items(self.download_layout, DownloadItemWidget)
-
-        if ready_items:
-            self.auto_start_downloads()
-        else:
-            # 最终没有可下载的项目，停止自动下载
-            print("重试后仍没有可下载的项目，停止自动下载")
-            self.is_downloading_active = False
-            self.start_all_button.setText(language_manager.get_text('start_download'))
-            self.start_all_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
-            self.status_label.setText("自动刷新完成，但没有可下载的项目")
\ No newline at end of file
+        if self.auto_refresh_enabled and self.last_refill_time and not self.failed_work_ids:
+            self.status_label.setText("刷新完成，但没有新的下载项目")
@@ -133,6 +133,7 @@ class SetConfig(QMainWindow):
         self.file_download_source.addItem("Mirror-1")
         self.file_download_source.addItem("Mirror-2")
         self.file_download_source.addItem("Mirror-3")
+        self.file_download_source.addItem("Auto")
         self.file_download_source.currentTextChanged.connect(self.set_file_download_source)
 
         # 第二行：代理设置（分为两个逻辑组件）
@@ -539,6 +540,8 @@ class SetConfig(QMainWindow):
             self.file_download_source.setCurrentIndex(2)
         elif website_course == 'Mirror-3':
             self.file_download_source.setCurrentIndex(3)
+        elif website_course == 'Auto':
+            self.file_download_source.setCurrentIndex(4)
 
     def save_download_path(self):
         download_path = QFileDialog.getExistingDirectory(self, language_manager.get_text('select_download_path'))
@@ -5,6 +5,10 @@ import requests
 from tqdm import tqdm
 # from src.UI.set_config import SetConfig
 from src.read_conf import ReadConf
+from src.http_session import get_session
+from src.download.rate_limiter import get_rate_limiter
+from src.download.stream_reader import StreamReader
+from src.asmr_api.client import get_client, AsmrApiError
 from http.client import IncompleteRead
 from src.download.re_title import sanitize_windows_filename
 
@@ -14,26 +18,18 @@ def down_file(url, file_name, stop_event):
     """
     conf = ReadConf()
     download_conf_data = conf.read_download_conf()
-    speed_limit = download_conf_data["speed_limit"]
     max_retries = download_conf_data["max_retries"]
     timeout = download_conf_data["timeout"]
     min_speed = download_conf_data["min_speed"] * 1024
     speed_check_interval = download_conf_data["min_speed_check"]
-    proxy = conf.read_proxy_conf()
-    if proxy['open_proxy']:
-        proxy_url = {
-            f'http': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}',
-            f'https': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}'
-        }
-    else:
-        proxy_url = None
+    session = get_session()
     try:
         retries = 1
         file_chick = 1
         while retries < max_retries:
             try:
                 # 获取文件总大小
-                response = requests.head(url, timeout=timeout)
+                response = session.head(url, timeout=timeout)
                 if response.status_code != 200:
                     return False, f"无法获取文件信息，状态码: {response.status_code}"
 
@@ -51,8 +47,9 @@ def down_file(url, file_name, stop_event):
                 # 设置请求头，支持断点续传
                 headers = {"Range": f"bytes={downloaded_size}-"}
 
-                with requests.get(url, headers=headers, stream=True, timeout=timeout, proxies=proxy_url) as resp, \
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as resp, \
                         open(file_name, "ab") as file, \
+                        get_rate_limiter().open(file_name, url) as throttle, \
                         tqdm(
                             desc="下载中",
                             total=total_size,
@@ -65,7 +62,7 @@ def down_file(url, file_name, stop_event):
                     last_check_time = start_time
                     bytes_downloaded_since_last_check = 0
 
-                    for chunk in resp.iter_content(chunk_size=1024):
+                    for chunk in StreamReader(resp).blocks():
                         # time.sleep(0.5)
                         if stop_event.is_set():
                             print("检测到停止信号，终止下载")
@@ -74,12 +71,8 @@ def down_file(url, file_name, stop_event):
                             file.write(chunk)
                             bar.update(len(chunk))
                             bytes_downloaded_since_last_check += len(chunk)
-                            # 限制下载速度
-                            elapsed_time = time.time() - start_time
-                            if elapsed_time < 1 and bytes_downloaded_since_last_check >= speed_limit * 1024 * 1024:
-                                time.sleep(1 - elapsed_time)
-                                start_time = time.time()
-                                bytes_downloaded_since_last_check = 0
+                            # 限制下载速度（与其他下载共用全局限速器）
+                            throttle.consume(len(chunk))
 
                             # 每30秒检查一次下载速度
                             current_time = time.time()
@@ -202,7 +195,7 @@ def get_asmr_downlist_api(stop_event):
     folder_flag = conf.read_name()
     selected_formats = conf.read_downfile_type()
     check_DB = conf.check_DB()
-    website_course = conf.read_website_course()
+    client = get_client()
 
     while True:
         works_list = get_down_list()
@@ -257,24 +250,15 @@ def get_asmr_downlist_api(stop_event):
             except Exception as e:
                 print(f"数据库检查出错: {e}")
 
-            if website_course == 'Original':
-               web_site = f'asmr.one'
-            elif website_course == 'Mirror-1':
-                web_site = 'asmr-100.com'
-            elif website_course == 'Mirror-2':
-                web_site = 'asmr-200.com'
-            elif website_course == 'Mirror-3':
-                web_site = 'asmr-300.com'
-
-            url = f"https://api.{web_site}/api/tracks/{keyword}?v=1"
+            url = client.build_url(f"tracks/{keyword}?v=1")
 
             print(url)
 
             try:
-                req = requests.get(url).json()
+                req = client.get_tracks(keyword)
                 # 解析下载信息
                 results = parse_req(req, work_title, download_path)
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, AsmrApiError) as e:
                 print(f"网络请求失败 ({url}): {str(e)}")
                 continue
             except Exception as e:
@@ -0,0 +1,144 @@
+"""
+本地API缓存模块
+将作品详情等API数据以压缩JSON的形式保存在配置文件同目录下的 SQLite 数据库中，
+记录按有效期失效，总大小超出上限时删除最久未使用的记录
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from src.read_conf import ReadConf
+
+
+class ApiCache:
+    """
+    基于 SQLite 的键值缓存
+
+    每条记录由 (kind, key) 唯一确定，kind 区分数据类型（如 'detail'、'tracks'），
+    数据使用 zlib 压缩的 JSON 保存
+    """
+
+    def __init__(self, db_path, max_size):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)')
+        self.conn.commit()
+
+    def get(self, kind, key, ttl=None):
+        """
+        读取缓存
+
+        Args:
+            kind: 数据类型
+            key: 键
+            ttl: 有效期（秒），为None时不检查是否过期
+
+        Returns:
+            缓存的数据，不存在或已过期时返回None
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT data, created_at FROM cache WHERE kind = ? AND key = ?',
+                                    (kind, key)).fetchone()
+            if row is None:
+                return None
+
+            data, created_at = row
+            now = time.time()
+            if ttl is not None and now - created_at > ttl:
+                self.conn.execute('DELETE FROM cache WHERE kind = ? AND key = ?', (kind, key))
+                self.conn.commit()
+                return None
+
+            self.conn.execute('UPDATE cache SET accessed_at = ? WHERE kind = ? AND key = ?', (now, kind, key))
+            self.conn.commit()
+
+        try:
+            return json.loads(zlib.decompress(data).decode('utf-8'))
+        except (zlib.error, ValueError) as e:
+            print(f"缓存数据损坏，已忽略: {kind}/{key} - {str(e)}")
+            self.delete(kind, key)
+            return None
+
+    def set(self, kind, key, value):
+        """写入缓存，并在超出大小上限时淘汰最久未使用的记录"""
+        data = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO cache (kind, key, data, size, created_at, accessed_at) '
+                              'VALUES (?, ?, ?, ?, ?, ?)', (kind, key, data, len(data), now, now))
+            self._evict()
+            self.conn.commit()
+
+    def delete(self, kind, key):
+        """删除一条缓存记录"""
+        with self.lock:
+            self.conn.execute('DELETE FROM cache WHERE kind = ? AND key = ?', (kind, key))
+            self.conn.commit()
+
+    def clear(self, kind=None):
+        """清空指定类型或全部缓存"""
+        with self.lock:
+            if kind is None:
+                self.conn.execute('DELETE FROM cache')
+            else:
+                self.conn.execute('DELETE FROM cache WHERE kind = ?', (kind,))
+            self.conn.commit()
+
+    def _evict(self):
+        """按最近访问时间淘汰记录，直到总大小不超过上限（调用方需持有锁）"""
+        total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        rows = self.conn.execute('SELECT kind, key, size FROM cache ORDER BY accessed_at').fetchall()
+        for kind, key, size in rows:
+            if total_size <= self.max_size:
+                break
+            self.conn.execute('DELETE FROM cache WHERE kind = ? AND key = ?', (kind, key))
+            total_size -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_api_cache():
+    """
+    获取进程内共享的API缓存
+
+    Returns:
+        ApiCache: 缓存对象；配置中关闭了缓存或数据库无法打开时返回None
+    """
+    global _cache
+
+    cache_conf = ReadConf().read_cache_conf()
+    if not cache_conf['open_cache']:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            db_path = os.path.join(os.path.dirname(ReadConf.get_config_path()), 'api_cache.db')
+            try:
+                _cache = ApiCache(db_path, cache_conf['max_size'])
+            except sqlite3.Error as e:
+                print(f"无法打开API缓存数据库: {str(e)}")
+                return None
+        _cache.max_size = cache_conf['max_size']
+        return _cache
@@ -0,0 +1,257 @@
+"""
+ASMR.ONE API 客户端模块
+统一处理镜像站点解析、请求重试、超时和响应解析
+"""
+
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from src.read_conf import ReadConf
+from src.http_session import get_session, no_auth
+from src.asmr_api.api_cache import get_api_cache
+from src.asmr_api.mirror_selector import MIRROR_SITES, AUTO_SITE, get_mirror_selector
+
+
+class AsmrApiError(Exception):
+    """API返回错误状态码或无法解析的响应"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsmrResponseError(AsmrApiError):
+    """API响应不是合法的JSON"""
+    pass
+
+
+def work_cache_key(web_site, work_id):
+    """镜像站点 web_site 上作品数据的缓存键"""
+    return f'{web_site}/{work_id}'
+
+
+class AsmrClient:
+    """
+    ASMR.ONE API 客户端
+
+    镜像站点在创建时解析一次，代理和Token由共享会话提供，
+    连接错误、超时和服务端错误会自动重试；
+    自动选择镜像站点时记录每次请求的延迟，出错后切换到测速结果最好的其他站点重试
+    """
+
+    max_retries = 3  # 网络错误和5xx错误的重试次数
+    retry_backoff = 1  # 秒，重试等待时间按 1, 2, 4... 递增
+    retry_status_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, site_source, session, timeout=None, selector=None):
+        self.session = session
+        self.timeout = timeout
+        self.selector = selector  # 镜像站点选择器，为 None 时固定使用 site_source
+        self.set_site(site_source)
+
+    def set_site(self, site_source):
+        """切换镜像站点"""
+        if site_source not in MIRROR_SITES:
+            site_source = 'Original'
+        self.site_source = site_source
+        self.web_site = MIRROR_SITES[site_source]
+        self.base_url = f'https://api.{self.web_site}/api'
+
+    def on_request_failed(self):
+        """自动选择镜像站点时，请求失败的站点进入冷却，之后的重试使用其他站点"""
+        if self.selector is None:
+            return
+        self.selector.record_failure(self.site_source, self.timeout or 10)
+        self.set_site(self.selector.best())
+
+    def build_url(self, path):
+        """拼接API地址"""
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    def request(self, method, path, check_status=True, **kwargs):
+        """
+        发送API请求，网络错误和5xx错误按指数退避重试
+
+        Args:
+            method: 请求方法
+            path: API路径，如 'tracks/123'
+            check_status: 是否在状态码异常时抛出 AsmrApiError
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+
+        retry_count = 0
+        while True:
+            url = self.build_url(path)
+            start_time = time.time()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.on_request_failed()
+                if retry_count >= self.max_retries:
+                    raise
+                print(f"API请求失败，将重试 ({retry_count + 1}/{self.max_retries}): {url} - {str(e)}")
+            else:
+                if response.status_code < 500:
+                    if self.selector is not None:
+                        self.selector.record_latency(self.site_source, time.time() - start_time)
+                elif response.status_code in self.retry_status_codes:
+                    self.on_request_failed()
+                if response.status_code not in self.retry_status_codes or retry_count >= self.max_retries:
+                    break
+                print(f"API返回状态码 {response.status_code}，将重试 ({retry_count + 1}/{self.max_retries}): {url}")
+
+            time.sleep(self.retry_backoff * (2 ** retry_count))
+            retry_count += 1
+
+        if check_status and response.status_code >= 400:
+            raise AsmrApiError(f"API请求失败，状态码: {response.status_code}, 响应内容: {response.text}",
+                               response.status_code)
+        return response
+
+    def request_json(self, method, path, check_status=True, **kwargs):
+        """发送API请求并解析JSON响应"""
+        response = self.request(method, path, check_status=check_status, **kwargs)
+        try:
+            return response.json()
+        except ValueError:
+            raise AsmrResponseError(f"JSON解析失败, 响应文本: {response.text}", response.status_code)
+
+    def get_review_list(self, page=1, review_filter='marked', order='updated_at', sort='desc'):
+        """
+        获取收听状态列表
+
+        Args:
+            page: 页码，从1开始
+            review_filter: 'marked'（想听）或 'listening'（在听）
+
+        Returns:
+            dict: 包含 'works' 和 'pagination' 的响应数据
+        """
+        params = {
+            'order': order,
+            'sort': sort,
+            'page': page,
+            'filter': review_filter,
+        }
+        return self.request_json('GET', 'review', params=params)
+
+    def iter_review_pages(self, review_filter='marked', max_pages=0, workers=3):
+        """
+        逐页获取收听状态列表
+
+        先获取第一页并读取分页信息，其余页面通过有限数量的并发请求获取，
+        按页码顺序逐页返回，调用方可在后续页面到达前先处理已有数据
+
+        Args:
+            review_filter: 'marked'（想听）或 'listening'（在听）
+            max_pages: 最多获取的页数，0 表示获取全部
+            workers: 同时进行的分页请求数
+
+        Yields:
+            list: 每一页的 works 列表
+        """
+        first_page = self.get_review_list(page=1, review_filter=review_filter)
+        yield first_page.get('works', [])
+
+        pagination = first_page.get('pagination') or {}
+        page_size = pagination.get('pageSize') or len(first_page.get('works', []))
+        total_count = pagination.get('totalCount', 0)
+        if not page_size or total_count <= page_size:
+            return
+
+        total_pages = -(-total_count // page_size)
+        if max_pages > 0:
+            total_pages = min(total_pages, max_pages)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            pages = executor.map(
+                lambda page: self.get_review_list(page=page, review_filter=review_filter),
+                range(2, total_pages + 1)
+            )
+            for page_data in pages:
+                yield page_data.get('works', [])
+
+    def cache_key(self, work_id):
+        """作品数据的缓存键，不同镜像站点返回的下载链接不同，需要分开缓存"""
+        return work_cache_key(self.web_site, work_id)
+
+    def get_tracks(self, work_id, use_cache=True):
+        """
+        获取作品的文件目录树
+
+        Args:
+            work_id: 作品ID
+            use_cache: 是否优先使用本地缓存，有效期内不再请求API
+        """
+        cache = get_api_cache() if use_cache else None
+        if cache is not None:
+            tracks = cache.get('tracks', self.cache_key(work_id), ttl=ReadConf().read_cache_conf()['detail_ttl'])
+            if tracks is not None:
+                return tracks
+
+        tracks = self.request_json('GET', f'tracks/{work_id}', params={'v': 1})
+        if cache is not None and tracks:
+            cache.set('tracks', self.cache_key(work_id), tracks)
+        return tracks
+
+    def update_review(self, work_id, progress):
+        """
+        更新作品的收听状态
+
+        Args:
+            work_id: 作品ID
+            progress: 'listening' 或 'listened'
+        """
+        data = {
+            'progress': progress,
+            'work_id': work_id,
+        }
+        self.request('PUT', 'review', data=data)
+
+    def login(self, name, password):
+        """登录并返回响应数据，登录失败时响应中包含 'error' 字段"""
+        data = {
+            'name': name,
+            'password': password,
+        }
+        return self.request_json('POST', 'auth/me', check_status=False, data=data, auth=no_auth)
+
+
+_client = None
+_client_version = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    获取进程内共享的 API 客户端
+
+    配置文件被修改（下载源、代理、Token等）后会重新创建客户端；
+    下载源为 'Auto' 时启动后台测速，并在每次获取时切换到当前得分最好的镜像站点
+
+    Returns:
+        AsmrClient: API 客户端
+    """
+    global _client, _client_version
+
+    session = get_session()
+    with _client_lock:
+        if _client is None or _client_version != ReadConf.config_version or _client.session is not session:
+            site_source = ReadConf().read_website_course()
+            if site_source == AUTO_SITE:
+                selector = get_mirror_selector()
+                selector.start()
+                _client = AsmrClient(selector.best(), session, selector=selector)
+            else:
+                _client = AsmrClient(site_source, session)
+            _client_version = ReadConf.config_version
+        elif _client.selector is not None:
+            best = _client.selector.best()
+            if best != _client.site_source:
+                _client.set_site(best)
+        return _client
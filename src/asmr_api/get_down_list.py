@@ -1,92 +1,88 @@
 import requests
 from src.read_conf import ReadConf
+from src.asmr_api.client import get_client, AsmrApiError, AsmrResponseError
 
 
-def get_down_list():
-    conf = ReadConf()
-    check_DB = conf.check_DB()
+class DownListError(Exception):
+    """获取下载列表失败，code 为UI层使用的错误标识"""
 
-    website_course = conf.read_website_course()
-    if website_course == 'Original':
-        web_site = f'asmr.one'
-    elif website_course == 'Mirror-1':
-        web_site = 'asmr-100.com'
-    elif website_course == 'Mirror-2':
-        web_site = 'asmr-200.com'
-    elif website_course == 'Mirror-3':
-        web_site = 'asmr-300.com'
-
-    if check_DB:
-        url = f'https://api.{web_site}/api/review?order=updated_at&sort=desc&page=1&filter=listening'
-    else:
-        url = f'https://api.{web_site}/api/review?order=updated_at&sort=desc&page=1&filter=marked'
-
-    user_data = conf.read_asmr_user()
-    token = user_data['token']
-    headers = {
-        'authorization': f'Bearer {token}'
-    }
-
-    proxy = conf.read_proxy_conf()
-    if proxy['open_proxy']:
-        proxy_url = {
-            f'http': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}',
-            f'https': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}'
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def parse_works(works):
+    """从API返回的 works 列表中提取下载所需的作品信息"""
+    id_list = []
+    for work in works:
+        work_info = {
+            'id': work['id'],
+            'title': work['title'],
+            'source_id': work.get('source_id', f"RJ{work['id']:08d}"),  # 从接口读取 source_id，如果没有则使用默认格式
         }
-    else:
-        proxy_url = None
+        id_list.append(work_info)
+    return id_list
+
+
+def iter_down_list():
+    """
+    逐页获取下载列表
+
+    第一页获取后立即返回，其余页面并发获取，页数和并发数由配置文件决定
+
+    Yields:
+        list: 每一页的作品信息列表
+
+    Raises:
+        DownListError: 获取失败，code 为 TOKEN_EXPIRED / API_ERROR / JSON_PARSE_ERROR / NETWORK_ERROR
+    """
+    conf = ReadConf()
+    check_DB = conf.check_DB()
+    review_filter = 'listening' if check_DB else 'marked'
+    download_conf = conf.read_download_conf()
 
     try:
-        # 发送API请求
-        response = requests.get(url, headers=headers, proxies=proxy_url)
-        
-        # 打印调试信息
-        # print(f"API请求URL: {url}")
-        # print(f"响应状态码: {response.status_code}")
-        # print(f"响应头信息: {response.headers}")
-        # print(f"API原始响应: {response.text}")
-        
+        # 发送API请求（客户端已解析镜像站点，共享会话已配置代理和Token）
+        pages = get_client().iter_review_pages(review_filter=review_filter,
+                                               max_pages=download_conf['max_list_pages'],
+                                               workers=download_conf['list_workers'])
+        for page_index, works in enumerate(pages, start=1):
+            print(f"成功获取第 {page_index} 页，共 {len(works)} 个作品")
+            yield parse_works(works)
+
+    except AsmrResponseError as e:
+        print(f"JSON解析失败: {e}")
+        raise DownListError("JSON_PARSE_ERROR")
+    except AsmrApiError as e:
         # 检查响应状态码
-        if response.status_code == 401:
+        if e.status_code == 401:
             print(f"Token认证失败，状态码: 401")
-            print(f"响应内容: {response.text}")
+            print(str(e))
             # 返回特殊标识，用于UI层识别
-            return "TOKEN_EXPIRED"
-        elif response.status_code != 200:
-            print(f"API请求失败，状态码: {response.status_code}")
-            print(f"响应内容: {response.text}")
-            return "API_ERROR"
-        
-        # 尝试解析JSON
-        req = response.json()
-        # print(f"解析后的JSON数据: {req}")
-        
+            raise DownListError("TOKEN_EXPIRED")
+        print(str(e))
+        raise DownListError("API_ERROR")
     except requests.exceptions.RequestException as e:
         print(f"网络请求异常: {e}")
-        return "NETWORK_ERROR"
-    except ValueError as e:
-        print(f"JSON解析失败: {e}")
-        print(f"响应文本: {response.text}")
-        return "JSON_PARSE_ERROR"
-    
+        raise DownListError("NETWORK_ERROR")
+
+
+def get_down_list():
+    """
+    获取完整的下载列表
+
+    Returns:
+        list: 作品信息列表；失败时返回错误标识字符串
+    """
     id_list = []
+    try:
+        for page in iter_down_list():
+            id_list.extend(page)
+    except DownListError as e:
+        return e.code
 
-    # 检查返回数据结构
-    if 'works' in req:
-        if req['works']:
-            print(f"成功获取到 {len(req['works'])} 个作品")
-            data = req['works']
-            for work in data:
-                work_info = {
-                    'id': work['id'],
-                    'title': work['title'],
-                    'source_id': work.get('source_id', f"RJ{work['id']:08d}"),  # 从接口读取 source_id，如果没有则使用默认格式
-                }
-                id_list.append(work_info)
-        else:
-            print("API返回的works列表为空")
+    if id_list:
+        print(f"成功获取到 {len(id_list)} 个作品")
     else:
-        print("API返回数据中没有'works'字段")
-        print(f"可用字段: {list(req.keys())}")
-
-    return id_list
\ No newline at end of file
+        print("API返回的works列表为空")
+    return id_list
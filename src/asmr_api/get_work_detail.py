@@ -1,5 +1,69 @@
 import requests
 from src.read_conf import ReadConf
+from src.asmr_api.client import get_client, work_cache_key, AsmrClient, AsmrApiError
+from src.asmr_api.api_cache import get_api_cache
+from src.asmr_api.mirror_selector import MIRROR_SITES, get_mirror_selector
+from src.download.url_probe import probe_urls
+
+
+def invalidate_work_detail(work_id):
+    """
+    删除作品的缓存数据（如下载链接失效时），下次获取时重新请求API
+
+    删除所有镜像站点的缓存：下载失败时使用的可能不是当前得分最好的镜像站点，
+    失败后重新获取时也可能切换到其他镜像站点
+    """
+    cache = get_api_cache()
+    if cache is not None:
+        for web_site in MIRROR_SITES.values():
+            key = work_cache_key(web_site, work_id)
+            cache.delete('detail', key)
+            cache.delete('tracks', key)
+
+
+def find_track_url(tracks, file_info, prefix_path=""):
+    """在作品目录树中查找与 file_info 对应的文件，优先按 hash 字段匹配，其次按路径和文件名匹配"""
+    for item in tracks:
+        if item.get('type') == 'folder' and 'children' in item:
+            folder_path = f"{prefix_path}/{item.get('title', '')}" if prefix_path else item.get('title', '')
+            url = find_track_url(item['children'], file_info, folder_path)
+            if url:
+                return url
+        elif item.get('mediaDownloadUrl'):
+            if file_info.get('hash') and item.get('hash') == file_info['hash']:
+                return item['mediaDownloadUrl']
+            if item.get('title') == file_info.get('title') and prefix_path == file_info.get('folder_path', ''):
+                return item['mediaDownloadUrl']
+    return None
+
+
+def iter_alternate_download_urls(work_id, file_info, exclude_site=None):
+    """
+    从其他镜像站点获取同一文件的下载链接，按镜像站点得分排列，逐个返回
+
+    Args:
+        work_id: 作品ID
+        file_info: 作品详情中的文件信息
+        exclude_site: 当前下载链接所属的镜像站点
+
+    Yields:
+        tuple: (镜像站点, 下载链接)
+    """
+    client = get_client()
+    seen = {file_info.get('download_url')}
+    for site_source in get_mirror_selector().alternatives(exclude_site or client.site_source):
+        # 不通过共享客户端请求，避免切换共享客户端当前使用的站点
+        mirror_client = AsmrClient(site_source, client.session, timeout=client.timeout)
+        mirror_client.max_retries = 0
+        try:
+            url = find_track_url(mirror_client.get_tracks(work_id), file_info)
+        except (requests.exceptions.RequestException, AsmrApiError) as e:
+            print(f"从镜像站点 {site_source} 获取备用下载链接失败: {str(e)}")
+            get_mirror_selector().record_failure(site_source)
+            continue
+        if url and url not in seen:
+            seen.add(url)
+            yield site_source, url
 
 
 def get_work_detail(work_id):
@@ -12,39 +76,19 @@ def get_work_detail(work_id):
     Returns:
         dict: 包含作品详细信息的字典，如果失败返回None
     """
-    conf = ReadConf()
-
-    website_course = conf.read_website_course()
-    if website_course == 'Original':
-        web_site = 'asmr.one'
-    elif website_course == 'Mirror-1':
-        web_site = 'asmr-100.com'
-    elif website_course == 'Mirror-2':
-        web_site = 'asmr-200.com'
-    elif website_course == 'Mirror-3':
-        web_site = 'asmr-300.com'
-
-    url = f'https://api.{web_site}/api/tracks/{work_id}?v=1'
-
-    user_data = conf.read_asmr_user()
-    token = user_data['token']
-    headers = {
-        'authorization': f'Bearer {token}'
-    }
-
-    proxy = conf.read_proxy_conf()
-    if proxy['open_proxy']:
-        proxy_url = {
-            'http': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}',
-            'https': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}'
-        }
-    else:
-        proxy_url = None
+    client = get_client()
+    session = client.session
+
+    # 有效期内的作品详情直接使用本地缓存，不再请求API
+    cache = get_api_cache()
+    if cache is not None:
+        work_detail = cache.get('detail', client.cache_key(work_id), ttl=ReadConf().read_cache_conf()['detail_ttl'])
+        if work_detail is not None:
+            print(f"作品 {work_id} 使用缓存的详情，共 {len(work_detail['files'])} 个文件")
+            return work_detail
 
     try:
-        response = requests.get(url, headers=headers, proxies=proxy_url)
-        response.raise_for_status()
-        tracks_data = response.json()
+        tracks_data = client.get_tracks(work_id)
 
         # API返回的是数组格式
         if not tracks_data or not isinstance(tracks_data, list):
@@ -60,7 +104,8 @@ def get_work_detail(work_id):
             'circle': '',  # API中没有circle信息
             'dl_count': 0,  # API中没有dl_count信息
             'total_size': 0,
-            'files': []
+            'files': [],
+            'mirror': client.site_source,  # 下载链接来自哪个镜像站点，用于记录下载速度
         }
 
         # 递归处理文件夹结构
@@ -81,22 +126,6 @@ def get_work_detail(work_id):
                     
                     print(f"文件: {item.get('title', '未知')} - API返回大小: {file_size}")
 
-                    # 如果API没有提供文件大小，尝试通过HEAD请求获取
-                    if file_size == 0:
-                        try:
-                            print(f"尝试通过HEAD请求获取文件大小: {item.get('title', '未知')}")
-                            head_response = requests.head(item.get('mediaDownloadUrl'),
-                                                        headers=headers, proxies=proxy_url, timeout=15)
-                            content_length = head_response.headers.get('content-length')
-                            if content_length:
-                                file_size = int(content_length)
-                                print(f"HEAD请求获得文件大小: {file_size} bytes")
-                            else:
-                                print(f"HEAD请求未返回Content-Length头部")
-                        except Exception as e:
-                            print(f"HEAD请求失败: {str(e)}")
-                            file_size = 0  # 如果获取失败，保持为0
-
                     file_info = {
                         'title': item.get('title', ''),
                         'download_url': item.get('mediaDownloadUrl'),
@@ -111,6 +140,20 @@ def get_work_detail(work_id):
 
         # 处理所有文件和文件夹
         process_items(tracks_data)
+
+        # API没有提供文件大小的文件，并发通过HEAD请求获取
+        unsized_files = [f for f in work_detail['files'] if f['size'] == 0]
+        if unsized_files:
+            print(f"通过HEAD请求获取 {len(unsized_files)} 个文件的大小")
+            probes = probe_urls(session, [f['download_url'] for f in unsized_files],
+                                workers=ReadConf().read_download_conf()['probe_workers'])
+            for file_info in unsized_files:
+                probe = probes.get(file_info['download_url'])
+                if probe and probe['size']:
+                    file_info['size'] = probe['size']
+                    work_detail['total_size'] += probe['size']
+                else:
+                    print(f"未能获取文件大小: {file_info['title']}")
         
         # 打印调试信息
         print(f"作品 {work_detail['id']} 文件统计:")
@@ -126,9 +169,16 @@ def get_work_detail(work_id):
             if len(zero_size_files) > 5:
                 print(f"    ... 还有 {len(zero_size_files)-5} 个文件")
 
+        if work_detail['files']:
+            # 记录一个下载链接，供镜像站点测速时测量下载速度
+            get_mirror_selector().remember_media_url(client.site_source, work_detail['files'][0]['download_url'])
+
+        if cache is not None and work_detail['files']:
+            cache.set('detail', client.cache_key(work_id), work_detail)
+
         return work_detail
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, AsmrApiError) as e:
         print(f"网络请求失败：{str(e)}")
         return None
     except Exception as e:
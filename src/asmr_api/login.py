@@ -1,5 +1,6 @@
 import requests
 from src.read_conf import ReadConf
+from src.asmr_api.client import get_client
 
 
 
@@ -9,33 +10,8 @@ def login():
     username = data['username']
     passwd = data['passwd']
 
-    website_course = conf.read_website_course()
-    if website_course == 'Original':
-        web_site = f'asmr.one'
-    elif website_course == 'Mirror-1':
-        web_site = 'asmr-100.com'
-    elif website_course == 'Mirror-2':
-        web_site = 'asmr-200.com'
-    elif website_course == 'Mirror-3':
-        web_site = 'asmr-300.com'
-
-    url = f'https://api.{web_site}/api/auth/me'
-    data = {
-        'name': username,
-        'password': passwd,
-    }
-
-    proxy = conf.read_proxy_conf()
-    if proxy['open_proxy']:
-        proxy_url = {
-            f'http': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}',
-            f'https': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}'
-        }
-    else:
-        proxy_url = None
-
     try:
-        req = requests.post(url, data=data, proxies=proxy_url).json()
+        req = get_client().login(username, passwd)
         print(f"响应内容: {req}")  # 调试信息
 
         # 检查响应是否包含用户信息
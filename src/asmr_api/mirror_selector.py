@@ -0,0 +1,205 @@
+"""
+镜像站点自动选择模块
+定期测量各镜像站点的API延迟和媒体下载速度，用指数加权移动平均（EWMA）记录得分，
+下载源设置为 'Auto' 时API请求和作品详情（包括其中的下载链接）使用得分最好的站点，
+出错的站点在冷却时间内不再被选择
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from src.read_conf import ReadConf
+from src.http_session import get_session
+
+
+AUTO_SITE = 'Auto'
+
+# 下载源配置与 API 域名的对应关系
+MIRROR_SITES = {
+    'Original': 'asmr.one',
+    'Mirror-1': 'asmr-100.com',
+    'Mirror-2': 'asmr-200.com',
+    'Mirror-3': 'asmr-300.com',
+}
+
+
+class MirrorStats:
+    """单个镜像站点的测量结果"""
+
+    def __init__(self):
+        self.latency = None  # 秒，API请求延迟的EWMA
+        self.throughput = None  # 字节/秒，媒体下载速度的EWMA
+        self.failures = 0  # 连续失败次数
+        self.down_until = 0  # 在此时间之前不选择该站点
+        self.media_url = None  # 最近一次从该站点获取的下载链接，用于测量下载速度
+
+
+class MirrorSelector:
+    """
+    镜像站点选择器
+
+    得分为预计获取一段参考大小数据所需的时间（API延迟 + 参考大小 / 下载速度），越小越好
+    """
+
+    alpha = 0.3  # EWMA 中新测量值的权重
+    reference_bytes = 1024 * 1024  # 计算得分时使用的参考数据大小
+    media_probe_bytes = 256 * 1024  # 主动测量下载速度时请求的数据量
+    failure_cooldown = 60  # 秒，站点出错后的冷却时间，连续出错时翻倍
+    max_cooldown = 30 * 60
+    probe_path = 'works'  # 测量API延迟时请求的接口
+
+    def __init__(self, sites=None):
+        self.sites = dict(sites or MIRROR_SITES)
+        self.stats = {site: MirrorStats() for site in self.sites}
+        self.lock = threading.Lock()
+        self.probe_thread = None
+        self.stop_event = threading.Event()
+        self.current = None
+
+    @staticmethod
+    def ewma(old, new, alpha):
+        return new if old is None else old + alpha * (new - old)
+
+    def record_latency(self, site_source, seconds):
+        """记录一次成功的API请求耗时，并清除站点的失败状态"""
+        with self.lock:
+            stats = self.stats.get(site_source)
+            if stats is None:
+                return
+            stats.latency = self.ewma(stats.latency, seconds, self.alpha)
+            stats.failures = 0
+            stats.down_until = 0
+
+    def record_throughput(self, site_source, bytes_per_second):
+        """记录一次媒体下载的速度"""
+        with self.lock:
+            stats = self.stats.get(site_source)
+            if stats is None or bytes_per_second <= 0:
+                return
+            stats.throughput = self.ewma(stats.throughput, bytes_per_second, self.alpha)
+
+    def record_failure(self, site_source, penalty=10):
+        """记录一次请求失败或超时，站点进入冷却时间，延迟按 penalty 秒计入"""
+        with self.lock:
+            stats = self.stats.get(site_source)
+            if stats is None:
+                return
+            stats.failures += 1
+            stats.latency = self.ewma(stats.latency, penalty, self.alpha)
+            cooldown = min(self.failure_cooldown * (2 ** (stats.failures - 1)), self.max_cooldown)
+            stats.down_until = time.time() + cooldown
+        print(f"镜像站点 {site_source} 请求失败，{cooldown:.0f} 秒内不再使用")
+
+    def remember_media_url(self, site_source, url):
+        """记录站点返回的一个下载链接，之后用于测量该站点的下载速度"""
+        with self.lock:
+            stats = self.stats.get(site_source)
+            if stats is not None and url:
+                stats.media_url = url
+
+    def score(self, stats, fallback_throughput):
+        if stats.latency is None:
+            return None
+        throughput = stats.throughput or fallback_throughput
+        return stats.latency + (self.reference_bytes / throughput if throughput else 0)
+
+    def ranked(self):
+        """按得分从好到差排列站点，冷却中的站点和还没有测量结果的站点排在后面"""
+        now = time.time()
+        with self.lock:
+            known = [s.throughput for s in self.stats.values() if s.throughput]
+            # 没有下载速度数据的站点按已知最慢的速度估计，避免因缺少数据而被优先选择
+            fallback_throughput = min(known) if known else None
+            keys = {}
+            for index, (site, stats) in enumerate(self.stats.items()):
+                score = self.score(stats, fallback_throughput)
+                keys[site] = (stats.down_until > now, score is None, score or 0, index)
+        return sorted(self.sites, key=keys.get)
+
+    def best(self):
+        """得分最好的站点"""
+        best = self.ranked()[0]
+        if best != self.current:
+            if self.current is not None:
+                print(f"自动切换镜像站点: {self.current} -> {best}")
+            self.current = best
+        return best
+
+    def alternatives(self, site_source):
+        """除指定站点外的其他可用站点，按得分排列"""
+        return [site for site in self.ranked() if site != site_source]
+
+    def probe_site(self, session, site_source, timeout):
+        """测量站点的API延迟，有已知下载链接时再测量下载速度"""
+        url = f'https://api.{self.sites[site_source]}/api/{self.probe_path}'
+        try:
+            start = time.time()
+            response = session.get(url, params={'page': 1, 'pageSize': 1}, timeout=timeout)
+            response.close()
+            if response.status_code >= 500:
+                raise requests.exceptions.RequestException(f"状态码: {response.status_code}")
+            self.record_latency(site_source, time.time() - start)
+        except requests.exceptions.RequestException as e:
+            print(f"镜像站点 {site_source} 测速失败: {str(e)}")
+            self.record_failure(site_source, sum(timeout))
+            return
+
+        media_url = self.stats[site_source].media_url
+        if not media_url:
+            return
+        try:
+            start = time.time()
+            headers = {'Range': f'bytes=0-{self.media_probe_bytes - 1}'}
+            with session.get(media_url, headers=headers, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                received = 0
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    received += len(chunk)
+                    if received >= self.media_probe_bytes:
+                        break
+            self.record_throughput(site_source, received / max(time.time() - start, 1e-3))
+        except requests.exceptions.RequestException as e:
+            print(f"镜像站点 {site_source} 下载测速失败: {str(e)}")
+
+    def probe_all(self, session=None):
+        """并发测量所有站点"""
+        session = session or get_session()
+        download_conf = ReadConf().read_download_conf()
+        timeout = (download_conf['connect_timeout'], download_conf['timeout'])
+        with ThreadPoolExecutor(max_workers=len(self.sites)) as executor:
+            for site_source in self.sites:
+                executor.submit(self.probe_site, session, site_source, timeout)
+        print("镜像站点测速结果: " + ', '.join(
+            f"{site}({self.stats[site].latency or 0:.2f}s)" for site in self.ranked()))
+
+    def start(self):
+        """启动后台测速线程：立即测量一次，之后按配置的间隔定期测量"""
+        with self.lock:
+            if self.probe_thread is not None:
+                return
+            self.probe_thread = threading.Thread(target=self.probe_loop, daemon=True)
+        self.probe_thread.start()
+
+    def probe_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"镜像站点测速出错: {str(e)}")
+            interval = ReadConf().read_mirror_conf()['probe_interval']
+            self.stop_event.wait(max(60, interval))
+
+
+_selector = None
+_selector_lock = threading.Lock()
+
+
+def get_mirror_selector():
+    """获取进程内共享的镜像站点选择器"""
+    global _selector
+
+    with _selector_lock:
+        if _selector is None:
+            _selector = MirrorSelector()
+        return _selector
@@ -0,0 +1,123 @@
+"""
+下载完成记录模块
+下载中的文件写入 <文件名>.part，校验通过后原子重命名为正式文件名，
+并在作品目录下的记录文件中追加一行，之后检查文件是否已下载只需查询记录，不再依赖文件大小
+"""
+
+import os
+import json
+import threading
+
+
+JOURNAL_NAME = '.download_journal'
+PART_SUFFIX = '.part'
+SEGMENTS_SUFFIX = '.segments'
+
+
+def get_part_path(file_path):
+    """下载中的临时文件路径"""
+    return file_path + PART_SUFFIX
+
+
+def get_segments_path(file_path):
+    """分段下载进度记录的路径，与 .part 文件放在一起"""
+    return get_part_path(file_path) + SEGMENTS_SUFFIX
+
+
+def read_segment_progress(file_path):
+    """
+    读取分段下载的进度记录
+
+    分段下载会把 .part 预分配到完整大小，程序中断后文件大小不能说明数据是否完整，
+    只有记录的位置之前的数据是连续写入的
+
+    Returns:
+        int | None: 可信的连续数据长度，没有记录时返回 None
+    """
+    segments_path = get_segments_path(file_path)
+    if not os.path.exists(segments_path):
+        return None
+    try:
+        with open(segments_path, 'r', encoding='utf-8') as f:
+            return max(0, int(json.load(f)['completed']))
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0  # 记录损坏时不信任 .part 中的任何数据
+
+
+def write_segment_progress(file_path, completed):
+    """写入分段下载的进度记录，先写临时文件再替换，中断时不会留下不完整的记录"""
+    segments_path = get_segments_path(file_path)
+    temp_path = segments_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'completed': completed}, f)
+    os.replace(temp_path, segments_path)
+
+
+def remove_segment_progress(file_path):
+    """删除分段下载的进度记录（.part 已截断到连续完成的部分，或已全部下载完成）"""
+    try:
+        os.remove(get_segments_path(file_path))
+    except FileNotFoundError:
+        pass
+
+
+class CompletionJournal:
+    """
+    作品的下载完成记录
+
+    记录文件每行一个JSON对象 {"path": 相对于作品目录的路径, "size": 文件大小, "hash": "算法:摘要"}，
+    只追加不修改，同一文件有多条记录时以最后一条为准，"removed" 记录表示该文件需要重新下载
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.journal_path = os.path.join(work_dir, JOURNAL_NAME)
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        entries = {}
+        if not os.path.exists(self.journal_path):
+            return entries
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if entry.get('removed'):
+                            entries.pop(entry['path'], None)
+                        else:
+                            entries[entry['path']] = {'size': entry['size'], 'hash': entry.get('hash', '')}
+                    except (ValueError, KeyError, TypeError):
+                        continue  # 跳过写入中断产生的不完整记录
+        except OSError as e:
+            print(f"读取下载记录失败: {str(e)}")
+        return entries
+
+    def relative_path(self, file_path):
+        return os.path.relpath(file_path, self.work_dir).replace(os.sep, '/')
+
+    def is_completed(self, file_path, expected_size=0):
+        """文件是否已下载完成；API提供了文件大小且与记录不一致时视为未完成（文件可能已更新）"""
+        entry = self.entries.get(self.relative_path(file_path))
+        if entry is None:
+            return False
+        return expected_size <= 0 or entry['size'] == expected_size
+
+    def add(self, file_path, size, content_hash=''):
+        """追加一条完成记录，content_hash 为下载时计算的 '算法:摘要'"""
+        relative_path = self.relative_path(file_path)
+        self.append({'path': relative_path, 'size': size, 'hash': content_hash})
+        self.entries[relative_path] = {'size': size, 'hash': content_hash}
+
+    def remove(self, file_path):
+        """移除文件的完成记录（如校验发现文件损坏），下次下载时重新下载该文件"""
+        relative_path = self.relative_path(file_path)
+        self.append({'path': relative_path, 'removed': True})
+        self.entries.pop(relative_path, None)
+
+    def append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
@@ -0,0 +1,288 @@
+"""
+磁盘写入模块
+下载线程只把收到的数据放入写入队列，由专门的写入线程写入磁盘，网络读取和磁盘写入互不阻塞；
+同一文件中连续的数据合并成大块顺序写入，适合 NAS、USB 等单次写入延迟较高的磁盘。
+待写入的数据（包括各文件还在累计、没有提交的数据）超过上限时下载线程等待（背压），避免内存无限增长
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from src.read_conf import ReadConf
+
+
+FSYNC_NONE = 'none'  # 不主动同步，由操作系统决定何时写入磁盘
+FSYNC_ON_COMPLETE = 'on_complete'  # 文件下载完成、重命名之前同步一次
+FSYNC_INTERVAL = 'interval'  # 每写入 fsync_interval_mb 同步一次，完成时也同步
+
+
+class WriteHandle:
+    """
+    通过写入线程写入的文件，接口与普通文件类似（seek / write / flush / close）
+
+    同一文件的写入按提交顺序执行；write 会复制数据，调用方可以立即复用自己的缓冲区
+    """
+
+    def __init__(self, writer, path, mode):
+        self.writer = writer
+        self.path = path
+        if mode == 'ab':
+            self.file = open(path, 'ab', buffering=0)
+            self.position = self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, mode, buffering=0)
+            self.position = 0
+        self.buffer = bytearray()  # 还没有提交的连续数据
+        self.buffer_offset = self.position
+        self.jobs = deque()  # (偏移位置, 数据)，由写入线程按顺序写入
+        self.scheduled = False  # 是否已在写入线程的待处理队列中（同一时间只有一个写入线程处理）
+        self.pending = 0  # 已提交但还没有写完的块数
+        self.condition = threading.Condition()
+        self.written_offset = self.position  # 已写入的最后位置，顺序写入时之前的数据都已写入
+        self.synced_bytes = 0  # 上次同步之后写入的字节数
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # 已经在处理异常（暂停、停滞重连等）时仍然写完已提交的数据，写入错误只打印，不覆盖原来的异常
+        try:
+            self.close()
+        except OSError as e:
+            print(f"关闭文件失败: {self.path} - {str(e)}")
+
+    def check_error(self):
+        if self.error is not None:
+            raise OSError(f"写入文件失败: {self.error}")
+
+    def seek(self, offset):
+        """改变下一次写入的位置，之前累计的数据先提交"""
+        if offset != self.buffer_offset + len(self.buffer):
+            self.submit()
+            self.buffer_offset = offset
+        self.position = offset
+
+    def write(self, data):
+        self.check_error()
+        if not self.writer.reserve(len(data), block=False):
+            # 共享上限已满：先把本文件累计的数据交给写入线程，再等待写入线程腾出空间
+            self.submit()
+            self.writer.reserve(len(data))
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= self.writer.coalesce_bytes:
+            self.submit()
+        return len(data)
+
+    def submit(self):
+        """把累计的数据交给写入线程（数据已在 write 时计入上限，这里不会等待）"""
+        if not self.buffer:
+            return
+        data = self.buffer
+        offset = self.buffer_offset
+        self.buffer = bytearray()
+        self.buffer_offset = offset + len(data)
+        self.writer.enqueue(self, offset, data)
+
+    def flush(self):
+        """提交累计的数据并等待本文件所有数据写入完成"""
+        self.submit()
+        with self.condition:
+            while self.pending:
+                self.condition.wait()
+        self.check_error()
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self.flush()
+            if self.writer.fsync_policy == FSYNC_INTERVAL and self.synced_bytes:
+                os.fsync(self.file.fileno())
+        finally:
+            self.file.close()
+
+
+class DiskWriter:
+    """写入线程池和有界的写入队列"""
+
+    coalesce_bytes = 4 * 1024 * 1024  # 每个文件的数据累计到这个大小再提交，写入线程还会合并相邻的块
+
+    def __init__(self, threads=2, max_pending_bytes=64 * 1024 * 1024,
+                 fsync_policy=FSYNC_NONE, fsync_interval_bytes=64 * 1024 * 1024):
+        self.max_pending_bytes = max_pending_bytes
+        self.fsync_policy = fsync_policy
+        self.fsync_interval_bytes = fsync_interval_bytes
+        self.condition = threading.Condition()
+        self.ready = deque()  # 有待写入数据的文件
+        self.pending_bytes = 0  # 还没有写入磁盘的数据，包括各文件累计中的和队列中的
+        self.queued_bytes = 0  # 其中已提交给写入线程的数据
+
+        # 背压统计
+        self.peak_pending_bytes = 0
+        self.written_bytes = 0
+        self.write_seconds = 0.0  # 写入线程在 write/fsync 中花费的时间
+        self.wait_seconds = 0.0  # 下载线程因写入队列已满而等待的时间
+        self.wait_count = 0
+
+        self.threads = []
+        for _ in range(max(1, threads)):
+            thread = threading.Thread(target=self.worker_loop, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def open(self, path, mode):
+        """打开文件，mode 为 'wb'、'ab' 或 'r+b'"""
+        return WriteHandle(self, path, mode)
+
+    def reserve(self, amount, block=True):
+        """
+        把即将累计的数据计入上限，超过上限时等待写入线程写完一部分
+
+        只在队列中有数据时等待：超出上限的部分都在各文件的累计缓冲区中时，等待不会有结果
+
+        Returns:
+            bool: block 为 False 且需要等待时返回 False，不计入
+        """
+        with self.condition:
+            if self.queued_bytes and self.pending_bytes + amount > self.max_pending_bytes:
+                if not block:
+                    return False
+                start = time.monotonic()
+                while self.queued_bytes and self.pending_bytes + amount > self.max_pending_bytes:
+                    self.condition.wait()
+                self.wait_seconds += time.monotonic() - start
+                self.wait_count += 1
+            self.pending_bytes += amount
+            self.peak_pending_bytes = max(self.peak_pending_bytes, self.pending_bytes)
+            return True
+
+    def enqueue(self, handle, offset, data):
+        with self.condition:
+            self.queued_bytes += len(data)
+            with handle.condition:
+                handle.jobs.append((offset, data))
+                handle.pending += 1
+                schedule = not handle.scheduled
+                handle.scheduled = True
+            if schedule:
+                self.ready.append(handle)
+                self.condition.notify_all()
+
+    def worker_loop(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                handle = self.ready.popleft()
+
+            with handle.condition:
+                jobs = list(handle.jobs)
+                handle.jobs.clear()
+
+            start = time.monotonic()
+            written = self.write_jobs(handle, jobs)
+            elapsed = time.monotonic() - start
+
+            with self.condition:
+                done_bytes = sum(len(data) for _, data in jobs)
+                self.pending_bytes -= done_bytes
+                self.queued_bytes -= done_bytes
+                self.written_bytes += written
+                self.write_seconds += elapsed
+                with handle.condition:
+                    handle.pending -= len(jobs)
+                    if handle.jobs:
+                        self.ready.append(handle)
+                    else:
+                        handle.scheduled = False
+                    handle.condition.notify_all()
+                self.condition.notify_all()
+
+    def write_jobs(self, handle, jobs):
+        """按顺序写入一个文件的数据块，相邻的块合并成一次写入"""
+        if handle.error is not None:
+            return 0
+        written = 0
+        try:
+            index = 0
+            while index < len(jobs):
+                offset, data = jobs[index]
+                index += 1
+                # 合并紧接在后面的块
+                if index < len(jobs) and jobs[index][0] == offset + len(data):
+                    merged = bytearray(data)
+                    while index < len(jobs) and jobs[index][0] == offset + len(merged):
+                        merged += jobs[index][1]
+                        index += 1
+                    data = merged
+                handle.file.seek(offset)
+                view = memoryview(data)
+                while view:
+                    count = handle.file.write(view)
+                    view = view[count:]
+                written += len(data)
+                handle.written_offset = offset + len(data)
+                handle.synced_bytes += len(data)
+                if self.fsync_policy == FSYNC_INTERVAL and handle.synced_bytes >= self.fsync_interval_bytes:
+                    os.fsync(handle.file.fileno())
+                    handle.synced_bytes = 0
+        except Exception as e:
+            print(f"写入文件失败: {handle.path} - {str(e)}")
+            handle.error = e
+        return written
+
+    def stats(self):
+        """
+        写入统计
+
+        Returns:
+            dict: pending_bytes（当前未写入的数据，包括累计中的）、peak_pending_bytes、written_bytes、
+                  write_seconds、wait_seconds（下载线程因背压等待的总时间）、wait_count
+        """
+        with self.condition:
+            return {
+                'pending_bytes': self.pending_bytes,
+                'peak_pending_bytes': self.peak_pending_bytes,
+                'written_bytes': self.written_bytes,
+                'write_seconds': self.write_seconds,
+                'wait_seconds': self.wait_seconds,
+                'wait_count': self.wait_count,
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats['written_bytes']:
+            return
+        print(f"磁盘写入: 共 {stats['written_bytes'] / 1024 / 1024:.1f} MB, 写入线程耗时 {stats['write_seconds']:.1f} 秒, "
+              f"待写入数据峰值 {stats['peak_pending_bytes'] / 1024 / 1024:.1f} MB, "
+              f"下载线程因写入队列已满等待 {stats['wait_count']} 次 共 {stats['wait_seconds']:.1f} 秒")
+
+
+def sync_file(path):
+    """把文件已写入的数据同步到磁盘"""
+    with open(path, 'r+b') as f:
+        os.fsync(f.fileno())
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_disk_writer():
+    """获取进程内共享的磁盘写入器，写入线程数和队列大小在第一次使用时从配置读取"""
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            download_conf = ReadConf().read_download_conf()
+            _writer = DiskWriter(threads=download_conf['writer_threads'],
+                                 max_pending_bytes=download_conf['write_buffer_mb'] * 1024 * 1024,
+                                 fsync_policy=download_conf['fsync_policy'],
+                                 fsync_interval_bytes=download_conf['fsync_interval_mb'] * 1024 * 1024)
+        return _writer
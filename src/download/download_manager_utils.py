@@ -55,24 +55,16 @@ def get_ready_download_items(download_layout, item_class):
     return ready_items
 
 
-def start_first_download_and_queue_others(ready_items, download_manager):
-    """开始第一个下载并将其他项添加到队列"""
+def queue_downloads_and_fill_slots(ready_items, download_manager):
+    """将所有准备好的下载项加入队列，并按并发数填满下载槽位"""
     if not ready_items or not download_manager:
         return False
-    
-    # 开始第一个下载
-    first_item = ready_items[0]
-    work_id, work_detail = first_item.start_download()
-    
-    # 添加到下载管理器
-    if work_id and work_detail:
-        download_manager.add_download(int(work_id), work_detail, first_item.work_info)
-        download_manager.start_next_download()
 
-    # 将剩余的添加到队列
-    for item in ready_items[1:]:
+    for item in ready_items:
         download_manager.add_download(int(item.work_info['id']), item.work_detail, item.work_info)
-    
+        item.set_queued()
+
+    download_manager.fill_download_slots()
     return True
 
 
@@ -81,10 +73,10 @@ def stop_all_downloads(download_manager, download_items):
     # 停止下载管理器
     if download_manager:
         # 清空队列
-        download_manager.download_queue.clear()
+        download_manager.clear_queue()
         
-        # 取消所有活动下载
-        for work_id in list(download_manager.active_downloads.keys()):
+        # 取消所有活动和已暂停的下载
+        for work_id in list(download_manager.active_downloads) + list(download_manager.paused_downloads):
             download_manager.cancel_download(work_id)
 
     # 更新所有下载项状态
@@ -98,8 +90,8 @@ def stop_all_downloads(download_manager, download_items):
 
 
 def check_download_queue_status(download_manager):
-    """检查下载队列状态"""
-    if download_manager and len(download_manager.download_queue) > 0:
+    """检查下载队列状态（包括排队中和其他正在下载的任务）"""
+    if download_manager and download_manager.has_pending_downloads():
         return "has_queue"
     else:
         return "queue_empty"
@@ -0,0 +1,176 @@
+"""
+下载任务调度模块
+用堆保存排队中的作品，按调度策略决定下一个开始下载的作品，
+调整优先级、置顶和移除都不需要重建队列（堆中过期的条目在取出时跳过）
+"""
+
+import heapq
+import itertools
+
+
+# 调度策略
+POLICY_AGE = 'age'  # 按加入队列的先后顺序（原来的行为）
+POLICY_SMALLEST_FIRST = 'smallest_first'  # 剩余大小最小的作品优先，单位时间内完成的作品最多
+POLICY_LARGEST_FIRST = 'largest_remaining_first'  # 剩余大小最大的作品优先，大作品尽早开始
+# 整批作品尽早全部完成：最长处理时间优先（LPT）分配到最先空闲的槽位，
+# 队列空了以后空闲槽位的连接分给预计最晚完成的作品（见 MultiFileDownloadManager.rebalance_connections）
+POLICY_MAKESPAN = 'makespan'
+POLICIES = (POLICY_AGE, POLICY_SMALLEST_FIRST, POLICY_LARGEST_FIRST, POLICY_MAKESPAN)
+
+
+class ScheduledWork:
+    """队列中的一个作品"""
+
+    def __init__(self, queue_item, seq, priority=0, remaining_bytes=0):
+        self.queue_item = queue_item  # (work_id, work_detail, work_info)
+        self.seq = seq  # 加入队列的顺序
+        self.priority = priority  # 用户设置的优先级，越大越先下载
+        self.pinned = False  # "立即下载"，排在所有未置顶的作品前面
+        self.remaining_bytes = remaining_bytes
+        self.version = 0  # 每次修改排序依据时更新，堆中版本不一致的条目视为已失效
+
+
+class DownloadScheduler:
+    """
+    排队中作品的优先级队列
+
+    排序依据依次为：是否置顶、用户优先级、调度策略、加入顺序。
+    置顶的作品之间按置顶的先后顺序排列，最后置顶的最先下载
+    """
+
+    def __init__(self, policy=POLICY_AGE):
+        self.policy = policy if policy in POLICIES else POLICY_AGE
+        self.heap = []  # (排序键, work_id, version)
+        self.works = {}  # work_id -> ScheduledWork
+        self.counter = itertools.count()
+        self.pin_counter = itertools.count()
+        # 所有作品共用的版本号，移除后重新加入的作品不会与堆中旧的条目版本相同
+        self.version_counter = itertools.count(1)
+        self.pin_order = {}  # work_id -> 置顶顺序
+
+    def __len__(self):
+        return len(self.works)
+
+    def __bool__(self):
+        return bool(self.works)
+
+    def __contains__(self, work_id):
+        return str(work_id) in self.works
+
+    def needs_size(self):
+        """当前策略是否需要作品的剩余大小"""
+        return self.policy != POLICY_AGE
+
+    def sort_key(self, work_id, work):
+        if self.policy == POLICY_SMALLEST_FIRST:
+            size_key = work.remaining_bytes
+        elif self.policy in (POLICY_LARGEST_FIRST, POLICY_MAKESPAN):
+            size_key = -work.remaining_bytes
+        else:
+            size_key = 0
+        pin_key = -self.pin_order[work_id] if work.pinned else 0
+        return (not work.pinned, pin_key, -work.priority, size_key, work.seq)
+
+    def push_entry(self, work_id, work):
+        work.version = next(self.version_counter)
+        heapq.heappush(self.heap, (self.sort_key(work_id, work), work_id, work.version))
+
+    def push(self, queue_item, priority=0, remaining_bytes=0):
+        """加入队列，已在队列中时更新作品信息，保留原来的顺序和优先级"""
+        work_id = str(queue_item[0])
+        work = self.works.get(work_id)
+        if work is not None:
+            work.queue_item = queue_item
+            return
+        work = ScheduledWork(queue_item, next(self.counter), priority, remaining_bytes)
+        self.works[work_id] = work
+        self.push_entry(work_id, work)
+
+    def pop(self):
+        """取出排在最前面的作品，队列为空时返回 None"""
+        while self.heap:
+            _, work_id, version = heapq.heappop(self.heap)
+            work = self.works.get(work_id)
+            if work is None or work.version != version:
+                continue
+            del self.works[work_id]
+            self.pin_order.pop(work_id, None)
+            return work.queue_item
+        return None
+
+    def peek_work(self):
+        """排在最前面的作品（不取出），队列为空时返回 None"""
+        while self.heap:
+            _, work_id, version = self.heap[0]
+            work = self.works.get(work_id)
+            if work is not None and work.version == version:
+                return work
+            heapq.heappop(self.heap)
+        return None
+
+    def peek(self):
+        """下一个将要开始下载的作品的队列条目，队列为空时返回 None"""
+        work = self.peek_work()
+        return work.queue_item if work is not None else None
+
+    def peek_pinned(self):
+        """排在最前面的作品是否是置顶的"""
+        work = self.peek_work()
+        return work is not None and work.pinned
+
+    def remove(self, work_id):
+        """从队列中移除作品，返回其队列条目，不在队列中时返回 None"""
+        work_id = str(work_id)
+        work = self.works.pop(work_id, None)
+        self.pin_order.pop(work_id, None)
+        return work.queue_item if work is not None else None
+
+    def set_priority(self, work_id, priority):
+        """修改作品的用户优先级"""
+        work = self.works.get(str(work_id))
+        if work is None or work.priority == priority:
+            return False
+        work.priority = priority
+        self.push_entry(str(work_id), work)
+        return True
+
+    def pin(self, work_id):
+        """置顶作品，下一个空闲的下载槽位会分配给它"""
+        work_id = str(work_id)
+        work = self.works.get(work_id)
+        if work is None:
+            return False
+        work.pinned = True
+        self.pin_order[work_id] = next(self.pin_counter)
+        self.push_entry(work_id, work)
+        return True
+
+    def unpin(self, work_id):
+        work_id = str(work_id)
+        work = self.works.get(work_id)
+        if work is None or not work.pinned:
+            return False
+        work.pinned = False
+        self.pin_order.pop(work_id, None)
+        self.push_entry(work_id, work)
+        return True
+
+    def set_policy(self, policy):
+        """切换调度策略，按新策略重新计算所有排序键"""
+        policy = policy if policy in POLICIES else POLICY_AGE
+        if policy == self.policy:
+            return
+        self.policy = policy
+        self.heap = []
+        for work_id, work in self.works.items():
+            self.push_entry(work_id, work)
+
+    def clear(self):
+        self.heap.clear()
+        self.works.clear()
+        self.pin_order.clear()
+
+    def work_ids(self):
+        """按下载顺序返回队列中的作品ID"""
+        ordered = sorted(self.works.items(), key=lambda item: self.sort_key(*item))
+        return [work_id for work_id, _ in ordered]
@@ -1,10 +1,35 @@
 import os
 import time
+import random
+import threading
 import requests
-from PyQt6.QtCore import QThread, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
 from src.read_conf import ReadConf
+from src.http_session import get_session
+from src.download.rate_limiter import get_rate_limiter
+from src.download.progress import get_progress_registry
+from src.download.job_store import (
+    get_job_store, WORK_QUEUED, WORK_DOWNLOADING, WORK_PAUSED, WORK_COMPLETED, WORK_FAILED, WORK_RETRYING,
+    FILE_DOWNLOADING, FILE_COMPLETED, FILE_FAILED
+)
+from src.download.url_probe import (
+    get_cached_probe, get_stored_probe, update_cached_probe, probe_range_support, probe_url
+)
+from src.asmr_api.mirror_selector import get_mirror_selector
+from src.download.mirror_failover import MirrorFailover
+from src.asmr_api.get_work_detail import get_work_detail
+from src.download.stall_monitor import ThroughputMonitor
+from src.download.stream_reader import StreamReader
+from src.download.disk_writer import get_disk_writer, sync_file, FSYNC_ON_COMPLETE
+from src.download.completion_journal import (CompletionJournal, get_part_path, read_segment_progress,
+                                              write_segment_progress, remove_segment_progress)
+from src.download.file_verify import (
+    parse_content_hash, format_content_hash, new_hasher, update_hasher_from_file, check_content_hash
+)
 from src.download.re_title import sanitize_windows_filename, sanitize_folder_path
-from src.download.download_utils import get_rj_number
+from src.download.download_utils import get_rj_number, calculate_actual_total_size, calculate_downloaded_size
+from src.download.download_scheduler import DownloadScheduler, POLICY_MAKESPAN
 
 
 class SpeedTooSlowException(Exception):
@@ -12,105 +37,128 @@ class SpeedTooSlowException(Exception):
     pass
 
 
+class DownloadPausedException(Exception):
+    """下载被暂停，连接已关闭，继续时从已下载的位置重新请求"""
+    pass
+
+
+def is_link_error(error):
+    """下载链接失效或无权访问（如 403/404），重试同一链接没有意义，由作品级重试重新获取下载链接"""
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None \
+        and response.status_code in (401, 403, 404, 410)
+
+
 class DownloadThread(QThread):
     progress_updated = pyqtSignal(int, 'PyQt_PyObject', 'PyQt_PyObject', str)  # progress%, downloaded_bytes, total_bytes, status
     download_finished = pyqtSignal(str)  # work_id
     download_error = pyqtSignal(str, str)  # work_id, error_message
-    speed_updated = pyqtSignal(str, float)  # work_id, speed_kb_s
     file_filter_stats = pyqtSignal('PyQt_PyObject', 'PyQt_PyObject', 'PyQt_PyObject', int, int)  # api_total, actual_total, skipped_total, total_files, skipped_files
 
-    def __init__(self, work_id, work_detail, download_dir):
+    def __init__(self, work_id, work_detail, download_dir, work_info=None, refresh_detail=False):
         super().__init__()
         self.work_id = str(work_id)
         self.work_detail = work_detail
+        self.work_info = work_info
         self.download_dir = download_dir
+        self.refresh_detail = refresh_detail  # 重试时重新获取作品详情，之前的下载链接可能已失效
         self.is_paused = False
         self.is_cancelled = False
-        self.downloaded_bytes = 0
+        self.resume_event = threading.Event()  # 暂停时清除，下载线程阻塞等待，不占用连接
+        self.resume_event.set()
         self.total_bytes = work_detail.get('total_size', 0)
         self.start_time = time.time()
-        self.last_update_time = time.time()
-        self.last_downloaded = 0
+        self.progress = None  # 进度计数器，由界面定时读取
 
-        # 读取速度限制配置 (MB/s)
+        # 读取下载配置，速度限制由进程内共享的限速器负责
         conf = ReadConf()
         download_conf = conf.read_download_conf()
-        self.speed_limit_mbps = download_conf['speed_limit']  # MB/s
-        self.speed_limit_bps = self.speed_limit_mbps * 1024 * 1024  # 转换为 bytes/s
-
-        # 令牌桶算法参数
-        self.bucket_size = self.speed_limit_bps  # 桶大小等于每秒允许的字节数
-        self.tokens = self.bucket_size  # 初始令牌数
-        self.last_refill_time = time.time()
+        self.rate_limiter = get_rate_limiter()
+        # 收到的数据交给共享的写入线程写入磁盘，网络读取不等待磁盘
+        self.disk_writer = get_disk_writer()
+
+        # 分段下载配置
+        self.segment_count = max(1, download_conf['segment_count'])  # 每个大文件的并发连接数
+        self.segment_threshold = download_conf['segment_threshold'] * 1024 * 1024  # MB 转换为 bytes
+        # 下载管理器在有空闲槽位时分配给本作品的额外连接数，用于拆分剩余较多的分段
+        self.extra_connections = 0
+        self.max_extra_connections = self.segment_count * 3
+        self.min_split_bytes = 2 * 1024 * 1024  # 拆分后每段至少剩余的大小
+        self.split_check_interval = 0.5  # 秒，检查是否有空闲连接可以拆分分段的间隔
+        self.state_lock = threading.Lock()  # 保护多个下载线程共享的失败状态
+
+        # 作品内并行下载的文件数量
+        self.file_workers = max(1, download_conf['file_workers'])
+        self.has_failed = False  # 作品内任一文件下载失败时停止其余文件
+        self.pause_check_interval = 1.0  # 秒，暂停等待期间检查作品是否已停止的间隔
+        self.file_error = threading.local()  # 当前线程正在下载的文件的错误信息
+        self.file_hash = threading.local()  # 当前线程正在下载的文件边下载边计算的哈希
+        self.verify_retries = 1  # 文件校验失败后重新下载的次数
+        self.throughput_sample_bytes = 1024 * 1024  # 下载量达到此大小的文件才计入镜像站点的下载速度
+
+        # 当前文件预计在两倍首字节等待时间内（至少剩余 lookahead_bytes）下载完成时，提前为下一个文件
+        # 建立连接（或探测分段支持），下一个文件开始时直接读取已收到响应头的连接，文件之间没有等待首字节的间隔
+        self.lookahead_bytes = 1024 * 1024
+        self.first_byte_time = 0.0  # 秒，最近请求从发出到收到响应头的时间（EWMA）
+        self.lookahead_lock = threading.Lock()
+        self.pending_tasks = []  # 还没有开始下载的文件任务，按开始的先后顺序
+        self.opening = {}  # 文件路径 -> threading.Event，提前打开的请求还没有返回
+        self.prefetched = {}  # 文件路径 -> (下载链接, 起始位置, 已打开的响应, 打开时间)
+        self.prefetch_max_age = 10  # 秒，提前打开的连接超过这个时间没有使用就不再使用，避免服务器已关闭空闲连接
+        self.lookahead_executor = None
+
+        # 文件状态和已下载位置记录到任务数据库，单连接下载每隔一段数据保存一次位置
+        self.job_store = get_job_store()
+        self.checkpoint_bytes = 4 * 1024 * 1024
+        self.journal = None  # 作品目录下的下载完成记录，开始下载时读取
 
         # 速度监控配置
         self.min_speed_kbps = download_conf['min_speed']  # KB/s，低于此速度需要重新下载
-        self.min_speed_check_interval = download_conf['min_speed_check']  # 秒，速度检查间隔
-        self.request_timeout = download_conf['timeout']  # 秒，请求超时时间
-        
-        # 速度监控状态
-        self.speed_check_start_time = time.time()
-        self.last_speed_check_time = time.time()
-        self.current_speed_kbps = 0.0
-        self.speed_check_enabled = True
+        self.min_speed_check_interval = download_conf['min_speed_check']  # 秒，开始下载后经过这段时间才检查最小速度
+        self.stall_window = download_conf['stall_window']  # 秒，按最近这段时间的速度判断是否停滞
+        # 秒，(连接超时, 读取超时)，读取超时内收不到任何数据即视为停滞
+        self.request_timeout = (download_conf['connect_timeout'], download_conf['timeout'])
         
         # 打印速度监控配置（用于调试）
-        print(f"速度监控配置 - 最小速度: {self.min_speed_kbps} KB/s, 检查间隔: {self.min_speed_check_interval}秒, 超时: {self.request_timeout}秒")
-
-    def refill_tokens(self):
-        """补充令牌桶中的令牌"""
-        if self.speed_limit_bps <= 0:
-            return
-
-        current_time = time.time()
-        elapsed = current_time - self.last_refill_time
-
-        # 根据时间补充令牌
-        tokens_to_add = elapsed * self.speed_limit_bps
-        self.tokens = min(self.bucket_size, self.tokens + tokens_to_add)
-        self.last_refill_time = current_time
-
-    def consume_tokens(self, bytes_needed):
-        """消费令牌，如果令牌不足则等待"""
-        if self.speed_limit_bps <= 0:
-            return
-
-        self.refill_tokens()
-
-        if self.tokens >= bytes_needed:
-            self.tokens -= bytes_needed
-        else:
-            # 计算需要等待的时间
-            deficit = bytes_needed - self.tokens
-            wait_time = deficit / self.speed_limit_bps
-            time.sleep(wait_time)
-
-            # 重新补充令牌并消费
-            self.refill_tokens()
-            self.tokens = max(0, self.tokens - bytes_needed)
+        print(f"速度监控配置 - 最小速度: {self.min_speed_kbps} KB/s, 预热时间: {self.min_speed_check_interval}秒, "
+              f"停滞检测窗口: {self.stall_window}秒, 连接/读取超时: {self.request_timeout}秒")
 
     def run(self):
         try:
+            if self.refresh_detail:
+                self.reload_work_detail()
             self.download_files()
         except Exception as e:
-            self.download_error.emit(self.work_id, str(e))
+            self.report_error(str(e))
 
-    def download_files(self):
-        conf = ReadConf()
-        proxy = conf.read_proxy_conf()
+    @staticmethod
+    def get_file_size(file_info):
+        """API返回的文件大小，可能是字符串或缺失，转换为整数，无法转换时为0"""
+        try:
+            return int(file_info.get('size') or 0)
+        except (TypeError, ValueError):
+            return 0
 
-        if proxy['open_proxy']:
-            proxy_url = {
-                'http': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}',
-                'https': f'{proxy["proxy_type"]}://{proxy["host"]}:{proxy["port"]}'
-            }
-        else:
-            proxy_url = None
+    def reload_work_detail(self):
+        """重新获取作品详情（缓存已在失败时删除），获取失败时继续使用原来的详情"""
+        work_detail = get_work_detail(self.work_detail.get('id', self.work_id))
+        if work_detail and work_detail['files']:
+            print(f"已重新获取作品详情: {self.work_id}")
+            self.work_detail = work_detail
+
+    def download_files(self):
+        # 所有文件和分段共用进程内的HTTP会话及其连接池
+        self.session = get_session()
 
         # 读取文件类型配置
         conf = ReadConf()
         selected_formats = conf.read_downfile_type()
 
+        # 上次运行中记录的文件状态和已下载位置
+        file_states = self.job_store.get_file_states(self.work_id) if self.job_store else {}
+        # 下载中的文件写入 .part，完成后重命名并记录，已完成的文件只需查询记录
+        self.journal = CompletionJournal(self.download_dir)
+
         # 重新计算实际要下载的文件总大小（排除跳过的文件）
         actual_total_size = 0
         skipped_total_size = 0
@@ -124,12 +172,7 @@ class DownloadThread(QThread):
             file_type = file_title[file_title.rfind('.') + 1:].upper()
 
             # 获取文件大小
-            file_size = file_info.get('size', 0)
-            if isinstance(file_size, str):
-                try:
-                    file_size = int(file_size)
-                except ValueError:
-                    file_size = 0
+            file_size = self.get_file_size(file_info)
 
             if not selected_formats.get(file_type, False):
                 # 跳过的文件，累计跳过大小和数量
@@ -155,9 +198,21 @@ class DownloadThread(QThread):
             # 标准化路径
             file_path = os.path.normpath(file_path)
 
-            if os.path.exists(file_path):
+            file_state = file_states.get(file_path)
+            part_path = get_part_path(file_path)
+            existing_path = part_path if os.path.exists(part_path) else file_path
+            if self.journal.is_completed(file_path, file_size):
+                # 下载记录中已完成的文件不再检查磁盘
+                total_downloaded += file_size
+            elif os.path.exists(existing_path):
                 # 使用os.path.getsize获取实际文件大小，支持大文件
-                downloaded_size = os.path.getsize(file_path)
+                downloaded_size = os.path.getsize(existing_path)
+                if file_state:
+                    # 记录的位置之后的数据不一定完整
+                    downloaded_size = min(downloaded_size, file_state[1])
+                segment_progress = read_segment_progress(file_path)
+                if segment_progress is not None:
+                    downloaded_size = min(downloaded_size, segment_progress)
                 # 确保不超过文件实际大小
                 downloaded_size = min(downloaded_size, file_size)
                 total_downloaded += downloaded_size
@@ -168,6 +223,11 @@ class DownloadThread(QThread):
         
         # 不发送初始进度更新，避免覆盖界面已显示的正确大小
 
+        # 已存在的部分计入初始下载量，各文件下载时在此基础上累加
+        self.progress = get_progress_registry().register(self.work_id, total_downloaded, actual_total_size)
+
+        # 先整理出需要下载的文件，再交给作品内的下载线程池并行处理
+        download_tasks = []
         for file_info in self.work_detail['files']:
             if self.is_cancelled:
                 return
@@ -179,7 +239,7 @@ class DownloadThread(QThread):
                 print(f"跳过文件: {file_title}")
                 continue
 
-            file_size = file_info['size']
+            file_size = self.get_file_size(file_info)
             download_url = file_info['download_url']
             filename = self.sanitize_filename(file_info['title'])
             
@@ -205,176 +265,735 @@ class DownloadThread(QThread):
                 file_path = os.path.normpath(file_path)  # 标准化路径
                 print(f"下载文件到根目录: {filename}")
 
-            # 检查文件是否已存在并完整
-            if os.path.exists(file_path):
-                file_downloaded = os.path.getsize(file_path)
-                if file_downloaded >= file_size:
+            # 检查文件是否已下载完成
+            if self.journal.is_completed(file_path, file_size):
+                print(f"文件已完整下载，跳过: {filename}")
+                continue
+
+            part_path = get_part_path(file_path)
+            if not os.path.exists(part_path) and os.path.exists(file_path):
+                # 没有下载记录的已有文件（旧版本下载的），大小一致时补充记录，不完整时改为 .part 继续下载
+                existing_size = os.path.getsize(file_path)
+                if file_size <= 0 and existing_size > 0:
+                    # API没有提供大小时向服务器确认，旧版本中断留下的不完整文件不能当作已完成
+                    probe = probe_url(self.session, file_info['download_url'], self.request_timeout)
+                    if probe and probe.get('size'):
+                        file_size = probe['size']
+                    else:
+                        print(f"无法获取文件大小，不能确认已有文件是否完整，重新下载: {filename}")
+                if file_size > 0 and existing_size == file_size:
                     print(f"文件已完整下载，跳过: {filename}")
+                    self.journal.add(file_path, existing_size)
+                    self.record_file_state(file_path, FILE_COMPLETED, existing_size, file_size)
                     continue
+                if existing_size < file_size:
+                    os.replace(file_path, part_path)
+
+            file_state = file_states.get(file_path)
+            if os.path.exists(part_path):
+                file_downloaded = os.path.getsize(part_path)
+                if file_size > 0 and file_downloaded > file_size:
+                    # 超出预期大小的数据无法判断是否正确，从头下载
+                    file_downloaded = 0
+                if file_state and file_state[1] < file_downloaded:
+                    # 记录的位置之后的数据可能不完整（如分段下载预分配的空间），从记录的位置继续
+                    file_downloaded = file_state[1]
+                segment_progress = read_segment_progress(file_path)
+                if segment_progress is not None and segment_progress < file_downloaded:
+                    # 分段下载中断（如程序崩溃）时预分配的空间中可能还有没写入的部分，只保留连续完成的数据
+                    print(f"分段下载上次未正常结束，从 {segment_progress} 字节继续: {filename}")
+                    file_downloaded = segment_progress
+                if file_downloaded < os.path.getsize(part_path):
+                    with open(part_path, 'r+b') as f:
+                        f.truncate(file_downloaded)
             else:
                 file_downloaded = 0
-
-            # 记录下载前的总量，用于计算当前文件的贡献
-            total_before_file = total_downloaded - file_downloaded if file_downloaded > 0 else total_downloaded
-            
-            # 尝试下载文件，如果速度过慢会重试
-            download_success, new_file_downloaded = self.download_file_with_speed_monitor(
-                download_url, file_path, file_downloaded, filename, 
-                actual_total_size, total_before_file, proxy_url
-            )
-            
-            if not download_success:
-                return  # 下载失败，停止整个下载过程
-            
-            # 更新总下载量
-            total_downloaded = total_before_file + new_file_downloaded
-
-        if not self.is_cancelled:
+            # .part 已截断到可信的位置，旧的分段进度记录不再需要
+            remove_segment_progress(file_path)
+
+            download_tasks.append((file_info, file_path, file_downloaded, file_size, filename))
+
+        self.pending_tasks = list(download_tasks)
+        with ThreadPoolExecutor(max_workers=1) as self.lookahead_executor, \
+                ThreadPoolExecutor(max_workers=self.file_workers) as executor:
+            for file_info, file_path, file_downloaded, file_size, filename in download_tasks:
+                executor.submit(
+                    self.download_file, file_info, file_path, file_downloaded,
+                    file_size, filename
+                )
+        self.discard_prefetched()
+
+        get_progress_registry().unregister(self.work_id)
+        if not self.should_stop():
             # 使用实际下载的总大小
             self.progress_updated.emit(100, actual_total_size, actual_total_size, "下载完成")
             self.download_finished.emit(self.work_id)
 
+    def download_file(self, file_info, file_path, file_downloaded, file_size, filename):
+        """下载线程池中的单个文件任务，作品中已有文件失败时不再开始新的文件"""
+        # 暂停期间不开始新的文件
+        self.wait_while_paused()
+        if self.should_stop():
+            return False
+
+        self.file_error.message = None
+        with self.lookahead_lock:
+            self.pending_tasks = [task for task in self.pending_tasks if task[1] != file_path]
+        self.record_file_state(file_path, FILE_DOWNLOADING, file_downloaded, file_size)
+        start_time = time.time()
+        start_downloaded = file_downloaded
+        expected_hash = file_info.get('hash', '')
+        # 下载停滞或出错时切换到其他镜像站点的同一文件继续下载
+        failover = MirrorFailover(self.work_detail.get('id', self.work_id), file_info, self.work_detail.get('mirror'))
+        download_url = file_info['download_url']
+        for verify_attempt in range(self.verify_retries + 1):
+            self.file_hash.hasher = None
+            try:
+                if 0 < file_downloaded and not 0 < file_size <= file_downloaded and not self.get_if_range(download_url):
+                    # 没有校验值时不能确认 .part 中的数据与服务器上的文件一致，不能断点续传
+                    print(f"没有文件的 ETag/Last-Modified，无法确认服务器上的文件未变化，从头重新下载: {filename}")
+                    self.add_downloaded_bytes(-file_downloaded)
+                    file_downloaded = 0
+
+                if file_size > 0 and file_downloaded >= file_size:
+                    # 上次已下载完成但未来得及重命名，直接校验
+                    download_success = True
+                # 大文件使用分段下载，其余文件使用单连接下载，如果速度过慢会重试
+                elif self.use_segments(file_size, file_downloaded):
+                    download_success, file_downloaded = self.download_file_segmented(
+                        download_url, file_path, file_downloaded, file_size, filename, expected_hash, failover
+                    )
+                else:
+                    download_success, file_downloaded = self.download_file_with_speed_monitor(
+                        download_url, file_path, file_downloaded, filename, expected_hash, failover
+                    )
+                if not download_success:
+                    break
+
+                verify_error = self.verify_part_file(failover.current(), file_path, file_size, expected_hash)
+                if verify_error is None:
+                    download_success = self.finalize_file(file_path, file_size, filename)
+                    if download_success:
+                        self.record_mirror_throughput(file_downloaded - start_downloaded, time.time() - start_time)
+                    break
+
+                # 校验失败的数据不能用于断点续传，只重新下载这个文件，不影响作品中的其他文件
+                os.remove(get_part_path(file_path))
+                self.add_downloaded_bytes(-file_downloaded)
+                file_downloaded = 0
+                if verify_attempt >= self.verify_retries:
+                    self.report_error(f"文件 {filename} 多次下载后校验仍然失败: {verify_error}")
+                    download_success = False
+                    break
+                print(f"文件 {filename} 校验失败: {verify_error}，重新下载 ({verify_attempt + 1}/{self.verify_retries})")
+                self.record_file_state(file_path, FILE_DOWNLOADING, 0, file_size)
+            except Exception as e:
+                self.report_error(f"下载文件 {filename} 失败: {str(e)}")
+                self.record_file_state(file_path, FILE_FAILED, 0, file_size, self.file_error.message)
+                return False
+
+        if not download_success:
+            if self.file_error.message is None:
+                # 被取消或因其他文件失败而停止，保留位置供下次继续
+                self.record_file_state(file_path, FILE_DOWNLOADING, file_downloaded, file_size)
+            else:
+                self.record_file_state(file_path, FILE_FAILED, file_downloaded, file_size, self.file_error.message)
+            # 下载失败，停止整个作品的下载过程
+            self.has_failed = True
+        return download_success
+
+    def record_mirror_throughput(self, downloaded_bytes, elapsed):
+        """把文件的下载速度计入下载链接所属镜像站点的得分，小文件主要受延迟影响，不计入"""
+        mirror = self.work_detail.get('mirror')
+        if mirror and downloaded_bytes >= self.throughput_sample_bytes and elapsed > 0:
+            get_mirror_selector().record_throughput(mirror, downloaded_bytes / elapsed)
+
+    def verify_part_file(self, download_url, file_path, file_size, expected_hash):
+        """
+        校验下载完成的 .part 文件
+
+        文件大小与API提供的大小不一致时，以服务器返回的文件大小为准；
+        API提供了可识别的内容哈希时还要与下载时计算的哈希一致
+
+        Returns:
+            str | None: 校验失败的原因，通过时返回 None
+        """
+        part_path = get_part_path(file_path)
+        actual_size = os.path.getsize(part_path)
+        if file_size > 0 and actual_size != file_size:
+            probe = get_cached_probe(download_url) or {}
+            if probe.get('size') != actual_size:
+                return f"大小 {actual_size} 与预期 {file_size} 不一致"
+
+        hasher = self.file_hash.hasher
+        if hasher is None and parse_content_hash(expected_hash):
+            # 分段下载的数据不是按顺序写入的，无法边下载边计算，只有API提供了哈希时才读取文件计算
+            hasher = update_hasher_from_file(new_hasher(expected_hash), part_path, actual_size)
+            self.file_hash.hasher = hasher
+        if check_content_hash(hasher, expected_hash) is False:
+            return "哈希值与API提供的不一致"
+        return None
+
+    def finalize_file(self, file_path, file_size, filename):
+        """将校验通过的 .part 文件原子重命名为正式文件名，然后写入下载完成记录"""
+        part_path = get_part_path(file_path)
+        hasher = self.file_hash.hasher
+        content_hash = format_content_hash(hasher.name, hasher.hexdigest()) if hasher is not None else ''
+        try:
+            if self.disk_writer.fsync_policy == FSYNC_ON_COMPLETE:
+                sync_file(part_path)
+            actual_size = os.path.getsize(part_path)
+            os.replace(part_path, file_path)
+            self.journal.add(file_path, actual_size, content_hash)
+        except OSError as e:
+            self.report_error(f"保存文件 {filename} 失败: {str(e)}")
+            self.record_file_state(file_path, FILE_FAILED, 0, file_size, self.file_error.message)
+            return False
+
+        self.record_file_state(file_path, FILE_COMPLETED, actual_size, file_size)
+        return True
+
+    def record_file_state(self, file_path, state, offset, size=0, error=None):
+        """将文件状态和已下载位置写入任务数据库，写入失败不影响下载"""
+        if self.job_store is None:
+            return
+        try:
+            self.job_store.set_file_state(self.work_id, file_path, state, offset, size, error)
+        except Exception as e:
+            print(f"保存文件下载状态失败: {str(e)}")
+
+    def should_stop(self):
+        """作品被取消或已有文件下载失败时，所有下载线程停止"""
+        return self.is_cancelled or self.has_failed
+
+    def report_error(self, error_message):
+        """报告下载错误，同一作品只发送一次错误信号"""
+        # 先移除进度计数器，避免界面定时刷新覆盖错误状态
+        get_progress_registry().unregister(self.work_id)
+        self.file_error.message = error_message
+        with self.state_lock:
+            already_failed = self.has_failed
+            self.has_failed = True
+        # 唤醒暂停中的其他下载线程，使其退出
+        self.resume_event.set()
+        if not already_failed:
+            self.download_error.emit(self.work_id, error_message)
+
+    def add_downloaded_bytes(self, bytes_count):
+        """累加作品的已下载字节数，界面按固定频率读取，不逐块发送信号"""
+        self.progress.add(bytes_count)
+
     def pause_download(self):
         self.is_paused = True
+        self.discard_prefetched()  # 暂停期间不保留提前打开的连接
+        self.resume_event.clear()
 
     def resume_download(self):
         self.is_paused = False
+        self.resume_event.set()
 
     def cancel_download(self):
         self.is_cancelled = True
+        self.resume_event.set()  # 唤醒暂停中的下载线程，使其退出
         self.quit()
 
-    def download_file_with_speed_monitor(self, download_url, file_path, initial_downloaded, filename, actual_total_size, total_downloaded_before, proxy_url):
-        """下载单个文件，包含速度监控和重试逻辑"""
+    def stop_workers(self):
+        """作品已结束（完成、出错或取消）时让仍在运行或暂停等待中的文件下载线程退出"""
+        self.is_cancelled = True
+        self.resume_event.set()
+
+    def wait_while_paused(self):
+        """暂停时等待继续，定期检查作品是否已停止，避免在已失败或已取消的作品中一直等待"""
+        while not self.resume_event.wait(self.pause_check_interval):
+            if self.should_stop():
+                return
+
+    def get_if_range(self, download_url):
+        """
+        获取断点续传时 If-Range 使用的校验值，服务器文件已变化时会返回完整内容而不是分段
+
+        优先使用强ETag（弱ETag不能用于If-Range），否则使用Last-Modified；没有校验值时返回空字符串，
+        此时不能断点续传（服务器上的文件变化后无法发现，新数据会接在旧数据后面）
+        """
+        probe = get_stored_probe(download_url) or {}
+        etag = probe.get('etag', '')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return probe.get('last_modified', '')
+
+    def fail_over(self, failover, failed_url, filename):
+        """
+        下载出错后切换到下一个下载链接
+
+        Returns:
+            bool: 所有链接都已试过一轮（或没有备用链接），调用方应计入重试次数并等待后再试
+        """
+        if failover is None or failover.switch(failed_url):
+            return True
+        print(f"切换到备用下载链接，从当前位置继续下载: {filename}")
+        return False
+
+    def download_file_with_speed_monitor(self, download_url, file_path, initial_downloaded, filename,
+                                         expected_hash='', failover=None):
+        """
+        下载单个文件，包含速度监控和重试逻辑，数据写入 .part 文件，写入的同时计算哈希
+
+        速度过慢或网络出错时先切换到其他镜像站点的下载链接从当前位置继续，
+        所有链接都试过一轮后才计入重试次数并等待
+        """
+        validator_url = download_url  # .part 文件中已有数据的来源，If-Range 使用它的校验值
         max_retries = 3  # 最大重试次数
         retry_count = 0
         file_downloaded = initial_downloaded
+        part_path = get_part_path(file_path)
+        hasher = new_hasher(expected_hash)
+        if file_downloaded > 0:
+            # 断点续传时先补上已下载部分的哈希
+            update_hasher_from_file(hasher, part_path, file_downloaded)
         
         while retry_count <= max_retries:
             try:
-                # 重置速度监控状态
-                self.speed_check_start_time = time.time()
-                self.last_speed_check_time = time.time()
-                file_start_time = time.time()
-                file_start_downloaded = file_downloaded
-                
+                if failover is not None:
+                    download_url = failover.current()
+
                 headers = {}
                 if file_downloaded > 0:
-                    headers['Range'] = f'bytes={file_downloaded}-'
-                    print(f"断点续传: {filename}, 从 {file_downloaded} 字节开始")
+                    if_range = self.get_if_range(validator_url)
+                    if if_range:
+                        headers['Range'] = f'bytes={file_downloaded}-'
+                        headers['If-Range'] = if_range
+                        print(f"断点续传: {filename}, 从 {file_downloaded} 字节开始")
+                    else:
+                        print(f"没有文件的 ETag/Last-Modified，无法确认服务器上的文件未变化，从头重新下载: {filename}")
+                        self.add_downloaded_bytes(-file_downloaded)
+                        file_downloaded = 0
+                        hasher = new_hasher(expected_hash)
 
                 print(f"开始下载文件: {filename} (尝试 {retry_count + 1}/{max_retries + 1})")
-                response = requests.get(download_url, headers=headers, stream=True, 
-                                      proxies=proxy_url, timeout=self.request_timeout)
+                response = self.take_prefetched(file_path, download_url, file_downloaded)
+                if response is None:
+                    request_time = time.time()
+                    response = self.session.get(download_url, headers=headers, stream=True, timeout=self.request_timeout)
+                    self.first_byte_time += 0.3 * (time.time() - request_time - self.first_byte_time)
                 response.raise_for_status()
+                response_start = (time.time(), file_downloaded)
+                # 本次响应的数据读完时文件的位置，剩余不到 lookahead_bytes 时准备下一个文件
+                content_length = response.headers.get('Content-Length', '')
+                response_end = file_downloaded + int(content_length) if content_length.isdigit() else None
+                if response.status_code == 200 and response_end is not None:
+                    response_end = int(content_length)
+
+                if file_downloaded > 0 and response.status_code == 200:
+                    # 服务器不支持Range或文件已变化，返回了完整内容，从头重新下载
+                    print(f"服务器返回完整文件，从头重新下载: {filename}")
+                    self.add_downloaded_bytes(-file_downloaded)
+                    file_downloaded = 0
+                    hasher = new_hasher(expected_hash)
+                if file_downloaded == 0:
+                    validator_url = download_url
+                self.record_server_size(download_url, response, file_downloaded == 0)
+
+                # 每个连接重新开始速度监控
+                monitor = ThroughputMonitor(self.min_speed_kbps * 1024, self.stall_window,
+                                            self.min_speed_check_interval)
                 
-                with open(file_path, 'ab' if file_downloaded > 0 else 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if self.is_cancelled:
+                next_checkpoint = file_downloaded + self.checkpoint_bytes
+                with self.disk_writer.open(part_path, 'ab' if file_downloaded > 0 else 'wb') as f, \
+                        self.rate_limiter.open(self.work_id, download_url) as throttle:
+                    # 数据读入线程复用的缓冲区，块大小随速度自适应，以下处理按块进行
+                    for chunk in StreamReader(response).blocks():
+                        if self.should_stop():
+                            response.close()
                             return False, file_downloaded
 
-                        while self.is_paused and not self.is_cancelled:
-                            time.sleep(0.1)
+                        if self.is_paused:
+                            response.close()
+                            raise DownloadPausedException()
 
                         if chunk:
                             chunk_size = len(chunk)
 
-                            # 使用令牌桶算法进行速度限制
-                            self.consume_tokens(chunk_size)
+                            # 由共享限速器按全局、作品、服务器三级限制速度
+                            throttle_wait = throttle.consume(chunk_size)
 
                             f.write(chunk)
+                            hasher.update(chunk)
                             file_downloaded += chunk_size
-                            current_total_downloaded = total_downloaded_before + (file_downloaded - initial_downloaded)
-
-                            # 更新进度
-                            progress = min(int((current_total_downloaded / actual_total_size) * 100), 100) if actual_total_size > 0 else 0
-                            self.progress_updated.emit(progress, current_total_downloaded, actual_total_size, "下载中...")
-
-                            # 计算并发送速度更新
-                            current_time = time.time()
-                            time_diff = current_time - self.last_update_time
-
-                            if time_diff >= 0.5:  # 每0.5秒更新一次速度
-                                bytes_diff = current_total_downloaded - self.last_downloaded
-                                speed_bps = bytes_diff / time_diff
-                                speed_kbps = speed_bps / 1024
-
-                                self.speed_updated.emit(self.work_id, speed_kbps)
-                                self.last_update_time = current_time
-                                self.last_downloaded = current_total_downloaded
-
-                            # 检查下载速度
-                            file_elapsed = current_time - file_start_time
-                            if file_elapsed >= self.min_speed_check_interval:  # 检查间隔后开始监控
-                                file_downloaded_in_period = file_downloaded - file_start_downloaded
-                                file_speed_bps = file_downloaded_in_period / file_elapsed
-                                file_speed_kbps = file_speed_bps / 1024
-                                
-                                if file_speed_kbps < self.min_speed_kbps:
-                                    print(f"文件 {filename} 速度过慢 ({file_speed_kbps:.2f} KB/s < {self.min_speed_kbps} KB/s)，重新下载")
-                                    response.close()  # 关闭当前连接
-                                    raise SpeedTooSlowException(f"速度过慢: {file_speed_kbps:.2f} KB/s")
+
+                            # 定期保存已写入磁盘的位置（不等待写入队列），异常退出后从这里继续
+                            if file_downloaded >= next_checkpoint:
+                                self.record_file_state(file_path, FILE_DOWNLOADING, f.written_offset)
+                                next_checkpoint = file_downloaded + self.checkpoint_bytes
+
+                            # 更新进度和速度
+                            self.add_downloaded_bytes(chunk_size)
+
+                            if response_end is not None and self.near_end(response_start, file_downloaded, response_end):
+                                self.prepare_next_file()
+                                response_end = None
+
+                            # 按最近一段时间的速度检查是否停滞
+                            stall_reason = monitor.add(chunk_size, idle=throttle_wait)
+                            if stall_reason:
+                                print(f"文件 {filename} 下载停滞 ({stall_reason})，重新连接")
+                                response.close()  # 关闭当前连接
+                                raise SpeedTooSlowException(stall_reason)
 
                 # 文件下载完成
                 print(f"文件下载完成: {filename}")
+                self.file_hash.hasher = hasher
                 return True, file_downloaded
-                
+
+            except DownloadPausedException:
+                # 暂停不计入重试次数，继续后从已写入的位置重新请求
+                print(f"已暂停: {filename}, 已下载 {file_downloaded} 字节，连接已关闭")
+                self.record_file_state(file_path, FILE_DOWNLOADING, file_downloaded)
+                self.wait_while_paused()
+                if self.should_stop():
+                    return False, file_downloaded
+                continue
+
             except SpeedTooSlowException as e:
                 print(f"速度监控触发重试: {str(e)}")
+                if not self.fail_over(failover, download_url, filename):
+                    continue
                 retry_count += 1
                 if retry_count <= max_retries:
                     print(f"将在3秒后重试... ({retry_count}/{max_retries})")
                     time.sleep(3)  # 等待3秒后重试
                     continue
                 else:
-                    self.download_error.emit(self.work_id, f"文件 {filename} 下载失败: 多次重试后速度仍然过慢")
+                    self.report_error(f"文件 {filename} 下载失败: 多次重试后速度仍然过慢")
                     return False, file_downloaded
                     
             except requests.exceptions.RequestException as e:
                 print(f"网络错误: {str(e)}")
+                if not self.fail_over(failover, download_url, filename):
+                    continue
+                if is_link_error(e):
+                    self.report_error(f"下载文件 {filename} 失败: {str(e)}")
+                    return False, file_downloaded
                 retry_count += 1
                 if retry_count <= max_retries:
                     print(f"网络错误，将在5秒后重试... ({retry_count}/{max_retries})")
                     time.sleep(5)  # 网络错误等待更长时间
                     continue
                 else:
-                    self.download_error.emit(self.work_id, f"下载文件 {filename} 失败: {str(e)}")
+                    self.report_error(f"下载文件 {filename} 失败: {str(e)}")
                     return False, file_downloaded
                     
             except Exception as e:
                 print(f"其他错误: {str(e)}")
-                self.download_error.emit(self.work_id, f"保存文件 {filename} 失败: {str(e)}")
+                self.report_error(f"保存文件 {filename} 失败: {str(e)}")
                 return False, file_downloaded
         
         return False, file_downloaded
 
-    def check_speed_and_retry_if_needed(self, current_time, total_downloaded):
-        """检查下载速度，如果过慢则返回True表示需要重新下载"""
-        if not self.speed_check_enabled:
+    def record_server_size(self, download_url, response, from_start=False):
+        """
+        记录服务器返回的文件总大小，完成后校验文件时使用
+
+        从头开始下载时同时记录 ETag 和 Last-Modified，之后断点续传用它们确认文件没有变化
+        """
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+        else:
+            total = response.headers.get('Content-Length', '')
+        fields = {}
+        if total.isdigit():
+            fields['size'] = int(total)
+        if from_start and response.status_code in (200, 206):
+            fields['etag'] = response.headers.get('ETag', '')
+            fields['last_modified'] = response.headers.get('Last-Modified', '')
+        if fields:
+            update_cached_probe(download_url, **fields)
+
+    def probe_range_support(self, download_url, file_size):
+        """检查服务器是否支持Range请求，且返回的文件总大小与预期一致，结果缓存供下次使用"""
+        return probe_range_support(self.session, download_url, file_size, self.request_timeout)
+
+    def use_segments(self, file_size, file_downloaded):
+        """文件是否使用分段下载"""
+        return self.segment_count > 1 and file_size - file_downloaded >= self.segment_threshold
+
+    def prepare_next_file(self):
+        """当前文件即将下载完成，在后台为下一个还没开始的文件做准备"""
+        with self.lookahead_lock:
+            if not self.pending_tasks or self.lookahead_executor is None:
+                return
+            task = self.pending_tasks.pop(0)
+            self.opening[task[1]] = threading.Event()
+        try:
+            self.lookahead_executor.submit(self.open_ahead, task)
+        except RuntimeError:
+            # 作品已结束，线程池已关闭
+            with self.lookahead_lock:
+                self.opening.pop(task[1]).set()
+
+    def open_ahead(self, task):
+        """分段下载的文件提前探测Range支持，单连接下载的文件提前发出请求，只读取响应头"""
+        try:
+            self.open_ahead_request(task)
+        finally:
+            with self.lookahead_lock:
+                self.opening.pop(task[1]).set()
+
+    def open_ahead_request(self, task):
+        file_info, file_path, file_downloaded, file_size, filename = task
+        if self.should_stop() or self.is_paused:
+            return
+        download_url = file_info['download_url']
+        if file_size > 0 and file_downloaded >= file_size:
+            return
+        if self.use_segments(file_size, file_downloaded):
+            self.probe_range_support(download_url, file_size)
+            return
+
+        headers = {}
+        if file_downloaded > 0:
+            if_range = self.get_if_range(download_url)
+            if not if_range:
+                return  # 不能断点续传，开始下载时从头请求
+            headers['Range'] = f'bytes={file_downloaded}-'
+            headers['If-Range'] = if_range
+        try:
+            response = self.session.get(download_url, headers=headers, stream=True, timeout=self.request_timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"提前建立连接失败，开始下载时重新请求: {filename} - {str(e)}")
+            return
+        if response.status_code >= 400 or self.should_stop() or self.is_paused:
+            response.close()
+            return
+        with self.lookahead_lock:
+            self.prefetched[file_path] = (download_url, file_downloaded, response, time.time())
+
+    def near_end(self, response_start, file_downloaded, response_end):
+        """按本次响应的平均速度判断剩余数据是否会在两倍首字节等待时间内下载完成"""
+        remaining = response_end - file_downloaded
+        if remaining <= self.lookahead_bytes:
+            return True
+        start_time, start_bytes = response_start
+        elapsed = time.time() - start_time
+        if elapsed <= 0:
             return False
-            
-        # 每隔指定时间检查一次速度
-        if current_time - self.last_speed_check_time >= self.min_speed_check_interval:
-            # 计算当前时间段内的平均速度
-            time_elapsed = current_time - self.speed_check_start_time
-            if time_elapsed > 0:
-                bytes_downloaded_in_period = total_downloaded - (total_downloaded - (total_downloaded * (time_elapsed - self.min_speed_check_interval) / time_elapsed)) if time_elapsed > self.min_speed_check_interval else total_downloaded
-                speed_bps = bytes_downloaded_in_period / time_elapsed
-                speed_kbps = speed_bps / 1024
-                self.current_speed_kbps = speed_kbps
-                
-                print(f"速度检查: 当前速度 {speed_kbps:.2f} KB/s, 最小要求 {self.min_speed_kbps} KB/s")
-                
-                # 如果速度低于最小要求，需要重新下载
-                if speed_kbps < self.min_speed_kbps:
-                    print(f"速度过慢 ({speed_kbps:.2f} KB/s < {self.min_speed_kbps} KB/s)，准备重新下载")
-                    return True
-                    
-            # 重置检查时间
-            self.last_speed_check_time = current_time
-            self.speed_check_start_time = current_time
-            
-        return False
+        speed = (file_downloaded - start_bytes) / elapsed
+        return remaining <= speed * self.first_byte_time * 2
+
+    def take_prefetched(self, file_path, download_url, file_downloaded):
+        """取出为文件提前打开的响应，提前打开的请求还没有返回时等待它，链接或起始位置不一致时关闭并返回 None"""
+        with self.lookahead_lock:
+            opening = self.opening.get(file_path)
+        if opening is not None:
+            opening.wait(sum(self.request_timeout))
+        with self.lookahead_lock:
+            prefetched = self.prefetched.pop(file_path, None)
+        if prefetched is None:
+            return None
+        url, offset, response, opened_at = prefetched
+        if url != download_url or offset != file_downloaded or time.time() - opened_at > self.prefetch_max_age:
+            response.close()
+            return None
+        return response
+
+    def discard_prefetched(self):
+        """关闭所有提前打开但没有使用的响应"""
+        with self.lookahead_lock:
+            prefetched = list(self.prefetched.values())
+            self.prefetched.clear()
+        for _, _, response, _ in prefetched:
+            response.close()
+
+    def set_extra_connections(self, count):
+        """设置额外连接数（由下载管理器在界面线程调用，分段下载时读取）"""
+        self.extra_connections = max(0, min(int(count), self.max_extra_connections))
+
+    def split_segment(self, segments):
+        """
+        把剩余最多的分段从中间拆开，后半段交给新的连接下载
+
+        原连接下载到新的结束位置后停止；拆分时原连接可能已经写过中点之后的少量数据，
+        新连接会重新写入相同的内容，不影响文件正确性
+
+        Returns:
+            dict | None: 新分段，没有足够大的分段时返回 None
+        """
+        with self.state_lock:
+            largest = max(segments, key=lambda segment: segment['end'] - segment['pos'], default=None)
+            if largest is None:
+                return None
+            remaining = largest['end'] + 1 - largest['pos']
+            if remaining < self.min_split_bytes * 2:
+                return None
+            middle = largest['pos'] + remaining // 2
+            new_segment = {'start': middle, 'end': largest['end'], 'pos': middle}
+            largest['end'] = middle - 1
+        return new_segment
+
+    def download_file_segmented(self, download_url, file_path, initial_downloaded, file_size, filename,
+                                expected_hash='', failover=None):
+        """将大文件按字节范围拆分，通过多个连接并行下载，各段写入文件中各自的偏移位置"""
+        if not self.probe_range_support(download_url, file_size):
+            print(f"服务器不支持分段下载，使用单连接下载: {filename}")
+            return self.download_file_with_speed_monitor(
+                download_url, file_path, initial_downloaded, filename, expected_hash, failover
+            )
+
+        # 按剩余部分均分字节范围，end 为闭区间
+        remaining = file_size - initial_downloaded
+        segment_size = -(-remaining // self.segment_count)
+        segments = []
+        for start in range(initial_downloaded, file_size, segment_size):
+            end = min(start + segment_size, file_size) - 1
+            segments.append({'start': start, 'end': end, 'pos': start})
+
+        # 预分配文件大小，各段直接写入 .part 文件中自己的偏移位置；
+        # 先记录连续完成的位置，程序中断后不会把预分配到完整大小的 .part 当作已下载完成
+        part_path = get_part_path(file_path)
+        write_segment_progress(file_path, initial_downloaded)
+        with open(part_path, 'r+b' if os.path.exists(part_path) else 'wb') as f:
+            f.truncate(file_size)
+
+        state = {'error': None}
+        print(f"分段下载: {filename}, {len(segments)} 个连接, 从 {initial_downloaded} 字节开始")
+
+        # 有连接先完成（或下载管理器分配了额外连接）时，拆分剩余最多的分段交给空闲的连接，
+        # 避免文件最后只剩一个慢连接在下载
+        with ThreadPoolExecutor(max_workers=self.segment_count + self.max_extra_connections) as executor:
+            running = set()
+            for segment in segments:
+                running.add(executor.submit(
+                    self.download_segment, download_url, file_path, segment, state, failover
+                ))
+            lookahead_done = False
+            while running:
+                _, running = wait(running, timeout=self.split_check_interval, return_when=FIRST_COMPLETED)
+                if state['error'] is not None or self.should_stop() or self.is_paused:
+                    continue
+                if not lookahead_done and sum(
+                        max(0, segment['end'] + 1 - segment['pos']) for segment in segments) <= self.lookahead_bytes:
+                    self.prepare_next_file()
+                    lookahead_done = True
+                while len(running) < self.segment_count + self.extra_connections:
+                    new_segment = self.split_segment(segments)
+                    if new_segment is None:
+                        break
+                    segments.append(new_segment)
+                    print(f"拆分分段: {filename}, 新连接下载 {new_segment['start']}-{new_segment['end']}")
+                    running.add(executor.submit(
+                        self.download_segment, download_url, file_path, new_segment, state, failover
+                    ))
+
+        if state['error'] is None and not self.should_stop():
+            # 各段的数据都已写入文件（写入句柄关闭时等待写完）
+            remove_segment_progress(file_path)
+            print(f"文件下载完成: {filename}")
+            return True, file_size
+
+        # 下载中断：将文件截断到连续完成的部分，下次可按普通断点续传继续
+        completed = initial_downloaded
+        for segment in sorted(segments, key=lambda segment: segment['start']):
+            completed = segment['pos']
+            if segment['pos'] <= segment['end']:
+                break
+        with open(part_path, 'r+b') as f:
+            f.truncate(completed)
+        remove_segment_progress(file_path)
+
+        if state['error'] is not None:
+            self.report_error(f"文件 {filename} 下载失败: {state['error']}")
+        return False, completed
+
+    def download_segment(self, download_url, file_path, segment, state, failover=None):
+        """下载单个字节范围，失败时切换到备用下载链接或从当前位置重试"""
+        max_retries = 3
+        retry_count = 0
+        # 每个连接只承担最小速度要求的一部分
+        min_segment_speed_bps = self.min_speed_kbps * 1024 / self.segment_count
+        validator_url = download_url
+
+        while segment['pos'] <= segment['end'] and state['error'] is None and not self.should_stop():
+            if failover is not None:
+                download_url = failover.current()
+            try:
+                headers = {'Range': f"bytes={segment['pos']}-{segment['end']}"}
+                if_range = self.get_if_range(validator_url)
+                if if_range:
+                    headers['If-Range'] = if_range
+                response = self.session.get(download_url, headers=headers, stream=True, timeout=self.request_timeout)
+                response.raise_for_status()
+                if response.status_code != 206:
+                    response.close()
+                    if if_range and response.status_code == 200 and download_url == validator_url:
+                        # 文件在服务器上已变化，已下载的各段不能再拼接
+                        state['error'] = "服务器上的文件已变化，请重新下载"
+                        return
+                    # 服务器声明支持Range但实际不支持，记录下来，之后这个文件使用单连接下载
+                    update_cached_probe(download_url, range_ok=False)
+                    raise requests.exceptions.RequestException(f"服务器未返回分段内容，状态码: {response.status_code}")
+
+                monitor = ThroughputMonitor(min_segment_speed_bps, self.stall_window, self.min_speed_check_interval)
+                with self.disk_writer.open(get_part_path(file_path), 'r+b') as f, \
+                        self.rate_limiter.open(self.work_id, download_url) as throttle:
+                    f.seek(segment['pos'])
+                    reader = StreamReader(response)
+                    for chunk in reader.blocks():
+                        if self.should_stop() or state['error'] is not None:
+                            response.close()
+                            return
+
+                        if self.is_paused:
+                            response.close()
+                            raise DownloadPausedException()
+
+                        if not chunk:
+                            continue
+
+                        # 服务器返回超出范围的数据，或本段已被拆分缩短时，只写入本段需要的部分
+                        needed = segment['end'] + 1 - segment['pos']
+                        if needed <= 0:
+                            reader.finish()
+                            break
+                        chunk = chunk[:needed]
+                        throttle_wait = throttle.consume(len(chunk))
+                        f.write(chunk)
+                        segment['pos'] += len(chunk)
+
+                        self.add_downloaded_bytes(len(chunk))
+
+                        if segment['pos'] > segment['end']:
+                            # 剩余数据读完后连接放回连接池，下一个分段请求可以复用
+                            reader.finish()
+                            break
+
+                        stall_reason = monitor.add(len(chunk), idle=throttle_wait)
+                        if stall_reason:
+                            response.close()
+                            raise SpeedTooSlowException(f"分段下载停滞: {stall_reason}")
+
+                if segment['pos'] <= segment['end']:
+                    raise requests.exceptions.RequestException("分段数据不完整")
+
+            except DownloadPausedException:
+                # 暂停时关闭连接，继续后从本段当前位置重新请求，不计入重试次数
+                self.wait_while_paused()
+
+            except (SpeedTooSlowException, requests.exceptions.RequestException) as e:
+                # 备用链接的校验值与原链接不一致时也会走到这里，直接换下一个链接
+                if not self.fail_over(failover, download_url, f"分段 {segment['start']}-{segment['end']}"):
+                    continue
+                if is_link_error(e):
+                    state['error'] = str(e)
+                    return
+                retry_count += 1
+                print(f"分段 {segment['start']}-{segment['end']} 出错: {str(e)} ({retry_count}/{max_retries})")
+                if retry_count > max_retries:
+                    state['error'] = f"多次重试后仍然失败: {str(e)}"
+                    return
+                time.sleep(3)
+
+            except Exception as e:
+                state['error'] = f"保存文件失败: {str(e)}"
+                return
 
     def sanitize_filename(self, filename):
         """清理文件名，将Windows不支持的字符转换为相似字符"""
@@ -395,16 +1014,43 @@ class MultiFileDownloadManager(QThread):
     download_started = pyqtSignal(str)  # work_id
     download_progress = pyqtSignal(str, int, 'PyQt_PyObject', 'PyQt_PyObject', str)  # work_id, progress%, downloaded, total, status
     download_completed = pyqtSignal(str)  # work_id
-    download_failed = pyqtSignal(str, str)  # work_id, error
-    speed_updated = pyqtSignal(str, float)  # work_id, speed
+    download_failed = pyqtSignal(str, str)  # work_id, error，重试次数用完后才发送
+    download_retry_scheduled = pyqtSignal(str, str, int, float)  # work_id, error, 第几次重试, 等待秒数
+    queue_finished = pyqtSignal(list)  # 所有任务结束，[(work_id, error), ...] 最终失败的作品
+    download_preempted = pyqtSignal(str)  # work_id，为"立即下载"的作品让出槽位，空闲后自动继续
     file_filter_stats = pyqtSignal(str, 'PyQt_PyObject', 'PyQt_PyObject', 'PyQt_PyObject', int, int)  # work_id, api_total, actual_total, skipped_total, total_files, skipped_files
 
     def __init__(self, download_dir):
         super().__init__()
         self.download_dir = download_dir
-        self.download_queue = []
+        conf = ReadConf()
+        download_conf = conf.read_download_conf()
+        # 排队中的作品按调度策略和用户优先级排序
+        self.download_queue = DownloadScheduler(download_conf['schedule_policy'])
         self.active_downloads = {}
-        self.max_concurrent = 1  # 顺序下载，一次只下载一个
+        self.paused_downloads = {}  # 已暂停的下载不占用下载槽位
+        # 已完成、出错或取消，正在等待其他文件下载线程退出的作品：work_id -> (线程, 结果, 错误信息)，线程结束前仍占用槽位
+        self.stopping_downloads = {}
+        self.resume_queue = []  # 等待空闲槽位继续下载的已暂停任务
+        self.job_store = get_job_store()  # 队列持久化，重启后从中断的位置继续
+        self.download_now_ids = set()  # 通过"立即下载"开始的作品，不会被其他作品抢占槽位
+        self.prepared_works = set()  # 已经提前准备过的排队作品
+        # 同时下载的作品数量，空闲的下载槽位会从队列中补充
+        self.max_concurrent = max(1, download_conf['max_concurrent'])
+
+        # 作品下载失败后等待一段时间重新排队，其他作品继续下载
+        self.retry_waiting = {}  # work_id -> (work_id, work_detail, work_info)
+        self.work_attempts = {}  # work_id -> 失败次数
+        self.failed_works = []  # 重试次数用完仍然失败的作品，所有任务结束后汇总
+        self.work_retries = max(0, download_conf['work_retries'])
+        self.retry_backoff = max(1, download_conf['retry_backoff'])
+        self.max_retry_delay = 30 * 60
+
+        # makespan 策略下定期按最新的下载速度重新分配空闲槽位的连接
+        self.segment_count = max(1, download_conf['segment_count'])
+        self.rebalance_timer = QTimer(self)
+        self.rebalance_timer.timeout.connect(self.rebalance_connections)
+        self.rebalance_timer.start(5000)
 
     def update_download_dir(self, new_download_dir):
         """动态更新下载目录"""
@@ -414,9 +1060,147 @@ class MultiFileDownloadManager(QThread):
             os.makedirs(new_download_dir, exist_ok=True)
             print(f"创建新的下载目录: {new_download_dir}")
 
-    def add_download(self, work_id, work_detail, work_info=None):
-        """添加下载任务到队列"""
-        self.download_queue.append((work_id, work_detail, work_info))
+    def update_max_concurrent(self, max_concurrent):
+        """动态更新同时下载的作品数量"""
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.fill_download_slots()
+
+    def add_download(self, work_id, work_detail, work_info=None, priority=0):
+        """添加下载任务到队列，已在下载或排队中的作品不会重复添加"""
+        if self.get_job_state(work_id) is not None:
+            return
+        self.queue_work((work_id, work_detail, work_info), priority)
+        if self.job_store:
+            self.job_store.add_work(work_id, work_detail, work_info)
+
+    def restore_jobs(self):
+        """
+        从任务数据库恢复上次未完成的作品，按原来的顺序重新排队
+
+        Returns:
+            list: [(work_id, work_detail, work_info), ...]
+        """
+        if not self.job_store:
+            return []
+
+        restored = []
+        for work_id, work_detail, work_info, state in self.job_store.unfinished_works():
+            if self.get_job_state(work_id) is not None:
+                continue
+            self.queue_work((work_id, work_detail, work_info))
+            restored.append((work_id, work_detail, work_info))
+        if restored:
+            print(f"恢复上次未完成的下载任务: {len(restored)} 个")
+        return restored
+
+    def queue_work(self, queue_item, priority=0):
+        """放入调度队列，按剩余大小排序的策略需要先估算作品的剩余下载量"""
+        remaining_bytes = 0
+        if self.download_queue.needs_size():
+            remaining_bytes = self.estimate_remaining_bytes(queue_item[1], queue_item[2])
+        self.download_queue.push(queue_item, priority, remaining_bytes)
+
+    def estimate_remaining_bytes(self, work_detail, work_info):
+        """作品还需要下载的大小（需要下载的文件总大小减去已下载的部分）"""
+        try:
+            total = calculate_actual_total_size(work_detail)
+            downloaded = calculate_downloaded_size(work_detail, work_info) if work_info else 0
+            return max(0, total - downloaded)
+        except Exception as e:
+            print(f"估算作品剩余大小失败: {str(e)}")
+            return 0
+
+    def set_priority(self, work_id, priority):
+        """修改排队中作品的优先级，数值越大越先下载"""
+        return self.download_queue.set_priority(work_id, priority)
+
+    def set_schedule_policy(self, policy):
+        """切换调度策略，已在队列中的作品按新策略重新排序"""
+        if policy == self.download_queue.policy:
+            return
+        if not self.download_queue.needs_size():
+            # 原来的策略不需要剩余大小，切换前补上
+            for work in self.download_queue.works.values():
+                work.remaining_bytes = self.estimate_remaining_bytes(work.queue_item[1], work.queue_item[2])
+        self.download_queue.set_policy(policy)
+        self.rebalance_connections()
+
+    def download_now(self, work_id):
+        """
+        立即下载指定作品：排到最前面，没有空闲槽位时暂停最后开始的一个下载让出槽位，
+        被暂停的下载在有空闲槽位时自动继续
+
+        Returns:
+            bool: 作品是否在下载管理器中
+        """
+        work_id = str(work_id)
+        if work_id in self.active_downloads:
+            return True
+        if work_id in self.retry_waiting:
+            # 不再等待重试，直接重新排队
+            self.queue_work(self.retry_waiting.pop(work_id))
+            self.set_job_state(work_id, WORK_QUEUED)
+
+        if work_id in self.paused_downloads:
+            if work_id in self.resume_queue:
+                self.resume_queue.remove(work_id)
+            self.resume_queue.insert(0, work_id)
+        elif not self.download_queue.pin(work_id):
+            return False
+
+        self.download_now_ids.add(work_id)
+        self.preempt_slot()
+        self.fill_download_slots()
+        return True
+
+    def preempt_slot(self):
+        """槽位已满时暂停最后开始的、不是"立即下载"的作品，空出一个槽位"""
+        if self.busy_slots() < self.max_concurrent:
+            return
+        for victim in reversed(list(self.active_downloads)):
+            if victim in self.download_now_ids:
+                continue
+            print(f"为立即下载的作品让出槽位，暂停作品 {victim}")
+            thread = self.active_downloads.pop(victim)
+            thread.pause_download()
+            self.paused_downloads[victim] = thread
+            self.resume_queue.append(victim)
+            self.set_job_state(victim, WORK_PAUSED)
+            self.download_preempted.emit(victim)
+            return
+
+    def get_job_state(self, work_id):
+        """
+        作品在下载管理器中的状态
+
+        Returns:
+            str: 'active'、'paused'、'stopping'、'queued'、'retrying'，不在管理器中时返回None
+        """
+        work_id = str(work_id)
+        if work_id in self.active_downloads:
+            return 'active'
+        if work_id in self.stopping_downloads:
+            return 'stopping'
+        if work_id in self.paused_downloads:
+            return 'paused'
+        if work_id in self.download_queue:
+            return 'queued'
+        if work_id in self.retry_waiting:
+            return 'retrying'
+        return None
+
+    def clear_queue(self):
+        """清空排队中和等待重试的任务，同时从任务数据库中删除"""
+        cleared = self.download_queue.work_ids() + list(self.retry_waiting)
+        self.download_queue.clear()
+        self.retry_waiting.clear()
+        self.failed_works.clear()
+        if self.job_store:
+            self.job_store.remove_works(cleared)
+
+    def set_job_state(self, work_id, state, error=None):
+        if self.job_store:
+            self.job_store.set_work_state(work_id, state, error)
 
     def get_folder_name(self, work_id, work_detail, work_info=None):
         """根据配置获取文件夹名称，与旧方法保持一致"""
@@ -450,13 +1234,111 @@ class MultiFileDownloadManager(QThread):
 
         return folder_name
 
+    def busy_slots(self):
+        """占用的下载槽位数，包括还在等待下载线程退出的作品"""
+        return len(self.active_downloads) + len(self.stopping_downloads)
+
+    def fill_download_slots(self):
+        """用队列中的任务填满所有空闲的下载槽位，等待继续的暂停任务优先"""
+        while self.busy_slots() < self.max_concurrent:
+            if self.download_queue.peek_pinned():
+                # "立即下载"的作品优先于等待继续的暂停任务
+                self.start_next_download()
+            elif self.resume_queue:
+                work_id = self.resume_queue.pop(0)
+                thread = self.paused_downloads.pop(work_id)
+                self.active_downloads[work_id] = thread
+                thread.resume_download()
+                self.set_job_state(work_id, WORK_DOWNLOADING)
+                self.download_started.emit(work_id)
+            elif self.download_queue:
+                self.start_next_download()
+            else:
+                break
+        self.rebalance_connections()
+        self.prepare_next_work()
+
+    def prepare_next_work(self):
+        """在后台为队列中的下一个作品做准备，槽位空出时可以立即开始下载"""
+        queue_item = self.download_queue.peek()
+        if queue_item is None:
+            return
+        work_id = str(queue_item[0])
+        if work_id in self.prepared_works:
+            return
+        self.prepared_works.add(work_id)
+        refresh_detail = work_id in self.work_attempts
+        threading.Thread(target=self.prepare_work, args=(queue_item, refresh_detail), daemon=True).start()
+
+    def prepare_work(self, queue_item, refresh_detail):
+        """创建作品目录；需要重试的作品提前重新获取详情（写入缓存）；探测前几个文件的链接，同时建立连接"""
+        work_id, work_detail, work_info = queue_item
+        try:
+            folder_name = self.get_folder_name(work_id, work_detail, work_info)
+            os.makedirs(os.path.normpath(os.path.join(self.download_dir, folder_name)), exist_ok=True)
+            if refresh_detail:
+                work_detail = get_work_detail(work_detail.get('id', work_id)) or work_detail
+
+            conf = ReadConf()
+            download_conf = conf.read_download_conf()
+            selected_formats = conf.read_downfile_type()
+            timeout = (download_conf['connect_timeout'], download_conf['timeout'])
+            files = [file_info for file_info in work_detail['files']
+                     if selected_formats.get(file_info['title'][file_info['title'].rfind('.') + 1:].upper(), False)]
+            session = get_session()
+            for file_info in files[:max(1, download_conf['file_workers'])]:
+                probe_url(session, file_info['download_url'], timeout)
+        except Exception as e:
+            print(f"提前准备作品 {work_id} 失败: {str(e)}")
+
+    def estimated_remaining_time(self, work_id):
+        """按开始下载以来的平均速度估算作品还需要的时间（秒），还没有速度数据时视为无限长"""
+        counter = get_progress_registry().get(work_id)
+        if counter is None:
+            return 0
+        remaining = max(0, counter.total_bytes - counter.downloaded_bytes())
+        speed = counter.average_speed()
+        return remaining / speed if speed > 0 else float('inf')
+
+    def rebalance_connections(self):
+        """
+        makespan 策略下，队列中没有其他作品时把空闲槽位的连接分给预计最晚完成的作品，
+        用于拆分它们的大文件；有新作品排队时收回，槽位留给新作品
+        """
+        extra = {}
+        idle_slots = self.max_concurrent - self.busy_slots()
+        if (self.download_queue.policy == POLICY_MAKESPAN and idle_slots > 0 and self.active_downloads
+                and not self.download_queue and not self.resume_queue):
+            ordered = sorted(self.active_downloads, key=self.estimated_remaining_time, reverse=True)
+            for index in range(idle_slots):
+                work_id = ordered[index % len(ordered)]
+                extra[work_id] = extra.get(work_id, 0) + self.segment_count
+
+        for work_id, thread in self.active_downloads.items():
+            thread.set_extra_connections(extra.get(work_id, 0))
+
+    def has_pending_downloads(self):
+        """是否还有正在下载、已暂停、正在停止、排队中或等待重试的任务"""
+        return bool(self.active_downloads or self.paused_downloads or self.stopping_downloads
+                    or self.download_queue or self.retry_waiting)
+
+    def pop_download_thread(self, work_id):
+        """从正在下载或已暂停的任务中移除并返回下载线程"""
+        if work_id in self.resume_queue:
+            self.resume_queue.remove(work_id)
+        thread = self.active_downloads.pop(work_id, None)
+        if thread is None:
+            thread = self.paused_downloads.pop(work_id, None)
+        return thread
+
     def start_next_download(self):
         """开始下一个下载任务"""
-        if len(self.active_downloads) >= self.max_concurrent or not self.download_queue:
+        if self.busy_slots() >= self.max_concurrent or not self.download_queue:
             return
 
         # 处理新的参数格式
-        queue_item = self.download_queue.pop(0)
+        queue_item = self.download_queue.pop()
+        self.prepared_works.discard(str(queue_item[0]))
         if len(queue_item) == 3:
             work_id, work_detail, work_info = queue_item
         else:
@@ -474,66 +1356,155 @@ class MultiFileDownloadManager(QThread):
         print(f"标准化后路径: '{work_dir}'")
         os.makedirs(work_dir, exist_ok=True)
 
-        download_thread = DownloadThread(work_id, work_detail, work_dir)
+        # 重试的作品重新获取详情
+        refresh_detail = str(work_id) in self.work_attempts
+        download_thread = DownloadThread(work_id, work_detail, work_dir, work_info, refresh_detail)
         download_thread.progress_updated.connect(
             lambda p, d, t, s, wid=work_id: self.download_progress.emit(str(wid), p, d, t, s)
         )
         download_thread.download_finished.connect(self.on_download_finished)
         download_thread.download_error.connect(self.on_download_error)
-        download_thread.speed_updated.connect(self.speed_updated.emit)
+        download_thread.finished.connect(lambda wid=str(work_id): self.on_thread_finished(wid))
         download_thread.file_filter_stats.connect(
             lambda api, actual, skipped, total_f, skipped_f, wid=work_id: self.file_filter_stats.emit(str(wid), api, actual, skipped, total_f, skipped_f)
         )
 
         self.active_downloads[str(work_id)] = download_thread
+        self.set_job_state(work_id, WORK_DOWNLOADING)
         download_thread.start()
         self.download_started.emit(str(work_id))
 
     def on_download_finished(self, work_id):
         """下载完成处理"""
-        if work_id in self.active_downloads:
-            thread = self.active_downloads[work_id]
-            thread.quit()
-            thread.wait()
-            del self.active_downloads[work_id]
-
-        self.download_completed.emit(work_id)
-        self.start_next_download()  # 开始下一个下载
+        self.stop_download_thread(work_id, WORK_COMPLETED)
 
     def on_download_error(self, work_id, error):
         """下载错误处理"""
-        if work_id in self.active_downloads:
-            thread = self.active_downloads[work_id]
-            thread.quit()
-            thread.wait()
-            del self.active_downloads[work_id]
-
-        # 清空下载队列，停止后续下载
-        self.download_queue.clear()
-        
-        self.download_failed.emit(work_id, error)
-        # 不再自动开始下一个下载，让用户决定是否继续
+        self.stop_download_thread(work_id, WORK_FAILED, error)
+
+    def stop_download_thread(self, work_id, outcome, error=None):
+        """
+        作品已结束（完成、出错或取消）：通知仍在运行的文件下载线程退出，不在这里等待
+
+        下载线程真正结束（finished 信号）后才释放槽位、记录结果和安排重试，
+        避免界面线程等待其他文件的连接超时，也避免重试的作品与还没退出的旧线程同时写同一文件
+        """
+        if work_id in self.stopping_downloads:
+            return  # 已在停止中，以第一次的结果为准
+        thread = self.pop_download_thread(work_id)
+        if thread is None:
+            return
+        thread.stop_workers()
+        self.stopping_downloads[work_id] = (thread, outcome, error)
+        if thread.isFinished():
+            # 线程在信号处理之前已经结束，finished 信号已被忽略
+            self.on_thread_finished(work_id)
+
+    def on_thread_finished(self, work_id):
+        """下载线程已退出：处理作品的结果，空出的槽位继续下载队列中的任务"""
+        entry = self.stopping_downloads.pop(work_id, None)
+        if entry is None:
+            return  # 结果信号还没有处理，处理时会发现线程已结束
+        thread, outcome, error = entry
+        # finished 信号发出后线程只剩退出的最后一步，这里的 wait() 会立即返回
+        thread.wait()
+        thread.deleteLater()
+
+        if outcome == WORK_COMPLETED:
+            self.set_job_state(work_id, WORK_COMPLETED)
+            self.work_attempts.pop(work_id, None)
+            self.download_now_ids.discard(work_id)
+            self.download_completed.emit(work_id)
+        elif outcome == WORK_FAILED:
+            self.handle_work_error(work_id, thread, error)
+        elif self.job_store:
+            # 取消的作品：线程退出后才删除记录，避免线程退出前又写入文件状态
+            self.job_store.remove_works([work_id])
+
+        self.fill_download_slots()
+        self.check_queue_finished()
+
+    def handle_work_error(self, work_id, thread, error):
+        """作品下载失败：还有重试次数时等待一段时间后重新排队，否则记为失败"""
+        # 下载链接可能已失效，删除缓存的作品详情，下次重新获取
+        try:
+            from src.asmr_api.get_work_detail import invalidate_work_detail
+            invalidate_work_detail(thread.work_detail.get('id', work_id))
+        except Exception as e:
+            print(f"删除作品缓存失败: {str(e)}")
+
+        self.download_now_ids.discard(work_id)
+        attempts = self.work_attempts.get(work_id, 0) + 1
+        self.work_attempts[work_id] = attempts
+        if attempts <= self.work_retries:
+            # 等待一段时间后重新排队，其他作品继续下载
+            delay = self.retry_delay(attempts)
+            print(f"作品 {work_id} 下载失败，{delay:.0f} 秒后第 {attempts}/{self.work_retries} 次重试: {error}")
+            self.retry_waiting[work_id] = (work_id, thread.work_detail, thread.work_info)
+            self.set_job_state(work_id, WORK_RETRYING, error)
+            QTimer.singleShot(int(delay * 1000), lambda wid=work_id: self.retry_download(wid))
+            self.download_retry_scheduled.emit(work_id, error, attempts, delay)
+        else:
+            self.set_job_state(work_id, WORK_FAILED, error)
+            self.work_attempts.pop(work_id, None)
+            self.failed_works.append((work_id, error))
+            self.download_failed.emit(work_id, error)
+
+    def retry_delay(self, attempts):
+        """第 attempts 次重试前的等待时间：指数退避并加入随机抖动，避免多个作品同时重试"""
+        delay = self.retry_backoff * (2 ** (attempts - 1))
+        return min(delay, self.max_retry_delay) * random.uniform(0.5, 1.5)
+
+    def retry_download(self, work_id):
+        """等待时间结束，把作品重新放回队列"""
+        queue_item = self.retry_waiting.pop(work_id, None)
+        if queue_item is None:
+            return  # 等待期间已被取消或清空
+        self.queue_work(queue_item)
+        self.set_job_state(work_id, WORK_QUEUED)
+        self.fill_download_slots()
+
+    def check_queue_finished(self):
+        """所有任务都已结束时发送汇总，包括重试次数用完仍然失败的作品"""
+        if self.has_pending_downloads():
+            return
+        failed_works = self.failed_works
+        self.failed_works = []
+        get_disk_writer().print_stats()
+        self.queue_finished.emit(failed_works)
 
     def pause_download(self, work_id):
-        """暂停指定下载"""
+        """暂停指定下载，下载线程关闭连接后等待继续，空出的槽位交给队列中的其他任务"""
         if work_id in self.active_downloads:
-            self.active_downloads[work_id].pause_download()
+            thread = self.active_downloads.pop(work_id)
+            thread.pause_download()
+            self.paused_downloads[work_id] = thread
+            self.set_job_state(work_id, WORK_PAUSED)
+            self.fill_download_slots()
 
     def resume_download(self, work_id):
-        """继续指定下载"""
-        if work_id in self.active_downloads:
-            self.active_downloads[work_id].resume_download()
+        """继续指定下载，没有空闲槽位时等待其他任务完成"""
+        if work_id in self.paused_downloads and work_id not in self.resume_queue:
+            self.resume_queue.append(work_id)
+            self.fill_download_slots()
 
     def cancel_download(self, work_id):
         """取消指定下载"""
-        if work_id in self.active_downloads:
-            thread = self.active_downloads[work_id]
-            thread.cancel_download()
-            thread.wait()
-            del self.active_downloads[work_id]
+        self.retry_waiting.pop(work_id, None)
+        self.work_attempts.pop(work_id, None)
+        self.download_now_ids.discard(work_id)
+        self.download_queue.remove(work_id)
+        if work_id in self.stopping_downloads:
+            # 已在停止中，线程退出后不再记录结果或安排重试
+            thread, _, _ = self.stopping_downloads[work_id]
+            self.stopping_downloads[work_id] = (thread, None, None)
+            return
+        if work_id in self.active_downloads or work_id in self.paused_downloads:
+            # 不等待线程退出，退出后再删除任务记录
+            self.stop_download_thread(work_id, None)
+        elif self.job_store:
+            self.job_store.remove_works([work_id])
 
     def run(self):
         """启动下载管理器"""
-        while len(self.active_downloads) < self.max_concurrent and self.download_queue:
-            self.start_next_download()
-            time.sleep(0.1)
\ No newline at end of file
+        self.fill_download_slots()
\ No newline at end of file
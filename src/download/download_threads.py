@@ -1,11 +1,15 @@
 """
 下载相关线程类模块
-包含工作详情获取线程和下载列表获取线程
+包含工作详情获取线程、作品详情获取调度器、下载列表获取线程和文件校验线程
 """
 
-from PyQt6.QtCore import QThread, pyqtSignal
-from src.asmr_api.get_down_list import get_down_list
+import heapq
+import itertools
+import threading
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from src.asmr_api.get_down_list import iter_down_list, DownListError
 from src.download.download_utils import get_work_detail_sync
+from src.download.file_verify import verify_library
 
 
 class WorkDetailThread(QThread):
@@ -28,8 +32,83 @@ class WorkDetailThread(QThread):
             self.error_occurred.emit(str(e))
 
 
+class WorkDetailFetcher(QObject):
+    """
+    作品详情获取调度器
+
+    固定数量的工作线程从优先级队列中取出作品ID获取详情，
+    结果通过信号发送到UI线程。数值越小优先级越高，同一优先级按加入顺序处理
+    """
+    detail_loaded = pyqtSignal(str, dict)  # work_id, work_detail
+    error_occurred = pyqtSignal(str, str)  # work_id, error
+
+    PRIORITY_NEXT_DOWNLOAD = 0  # 即将下载的作品
+    PRIORITY_VISIBLE = 1  # 当前可见的作品
+    PRIORITY_NORMAL = 2  # 其余作品
+
+    def __init__(self, workers=4):
+        super().__init__()
+        self.queue = []  # (priority, seq, work_id)
+        self.pending = {}  # work_id -> 当前优先级，队列中优先级不一致的条目视为已失效
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.workers = []
+        for _ in range(max(1, workers)):
+            worker = threading.Thread(target=self.worker_loop, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def request(self, work_id, priority=PRIORITY_NORMAL):
+        """加入获取队列；已在队列中时只会提高优先级"""
+        work_id = str(work_id)
+        with self.condition:
+            current = self.pending.get(work_id)
+            if current is not None and current <= priority:
+                return
+            self.pending[work_id] = priority
+            heapq.heappush(self.queue, (priority, next(self.counter), work_id))
+            self.condition.notify()
+
+    def bump(self, work_id, priority):
+        """提高队列中作品的优先级，不在队列中（已获取或正在获取）时忽略"""
+        work_id = str(work_id)
+        with self.condition:
+            current = self.pending.get(work_id)
+            if current is None or current <= priority:
+                return
+            self.pending[work_id] = priority
+            heapq.heappush(self.queue, (priority, next(self.counter), work_id))
+
+    def clear(self):
+        """清空等待中的请求，正在获取的请求完成后结果仍会发送"""
+        with self.condition:
+            self.queue.clear()
+            self.pending.clear()
+
+    def worker_loop(self):
+        while True:
+            with self.condition:
+                while True:
+                    while not self.queue:
+                        self.condition.wait()
+                    priority, _, work_id = heapq.heappop(self.queue)
+                    if self.pending.get(work_id) == priority:
+                        del self.pending[work_id]
+                        break
+
+            try:
+                detail = get_work_detail_sync(work_id)
+                if detail:
+                    self.detail_loaded.emit(work_id, detail)
+                else:
+                    self.error_occurred.emit(work_id, "Failed to get work detail")
+            except Exception as e:
+                self.error_occurred.emit(work_id, str(e))
+
+
 class DownloadListThread(QThread):
-    """下载列表获取线程"""
+    """下载列表获取线程，每获取到一页就发送一次 page_loaded，全部获取完成后发送 list_updated"""
+    page_loaded = pyqtSignal(list)
     list_updated = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
 
@@ -37,36 +116,28 @@ class DownloadListThread(QThread):
         super().__init__()
 
     def run(self):
+        works_list = []
         try:
             print("开始获取下载列表...")
-            works_list = get_down_list()
-            
-            # 检查是否返回了错误标识
-            if isinstance(works_list, str):
-                if works_list == "TOKEN_EXPIRED":
-                    self.error_occurred.emit("TOKEN_EXPIRED")
-                    return
-                elif works_list == "NETWORK_ERROR":
-                    self.error_occurred.emit("NETWORK_ERROR")
-                    return
-                elif works_list == "API_ERROR":
-                    self.error_occurred.emit("API_ERROR")
-                    return
-                elif works_list == "JSON_PARSE_ERROR":
-                    self.error_occurred.emit("JSON_PARSE_ERROR")
-                    return
-            
-            # 检查是否是有效的列表数据
-            if isinstance(works_list, list):
-                if works_list:
-                    print(f"成功获取到 {len(works_list)} 个下载项目")
-                else:
-                    print("API返回的works列表为空，但这是有效的响应")
+            for page in iter_down_list():
+                # 跳过已在前面页面出现过的作品（获取期间列表发生变动时可能重复）
+                known_ids = {work['id'] for work in works_list}
+                page = [work for work in page if work['id'] not in known_ids]
+                works_list.extend(page)
+                self.page_loaded.emit(page)
+
+            if works_list:
+                print(f"成功获取到 {len(works_list)} 个下载项目")
+            else:
+                print("API返回的works列表为空，但这是有效的响应")
+            self.list_updated.emit(works_list)
+        except DownListError as e:
+            if works_list:
+                # 已经获取到部分页面时保留已有数据，只放弃剩余页面
+                print(f"获取剩余页面失败 ({e.code})，保留已获取的 {len(works_list)} 个下载项目")
                 self.list_updated.emit(works_list)
             else:
-                error_msg = "API返回数据格式错误"
-                print(f"错误: {error_msg}")
-                self.error_occurred.emit("EMPTY_LIST")
+                self.error_occurred.emit(e.code)
         except Exception as e:
             error_msg = f"Failed to get download list: {str(e)}"
             print(f"异常错误: {error_msg}")
@@ -75,3 +146,28 @@ class DownloadListThread(QThread):
             print(f"完整错误堆栈:")
             traceback.print_exc()
             self.error_occurred.emit(f"EXCEPTION: {str(e)}")
+
+
+class LibraryVerifyThread(QThread):
+    """校验下载目录中已下载的文件，只报告损坏或缺失的文件，不删除（由用户确认后处理）"""
+    verify_finished = pyqtSignal(int, list)  # 校验的文件数, [(文件路径, 原因), ...]
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, download_root, workers=4):
+        super().__init__()
+        self.download_root = download_root
+        self.workers = workers
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            print(f"开始校验已下载的文件: {self.download_root}")
+            checked, problems = verify_library(self.download_root, self.workers, stop_event=self.stop_event)
+            print(f"文件校验完成，共 {checked} 个文件，{len(problems)} 个文件损坏或缺失")
+            self.verify_finished.emit(checked, problems)
+        except Exception as e:
+            print(f"文件校验出错: {str(e)}")
+            self.error_occurred.emit(str(e))
+
+    def stop(self):
+        self.stop_event.set()
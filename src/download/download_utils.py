@@ -8,6 +8,7 @@ import re
 import time
 from src.read_conf import ReadConf
 from src.download.re_title import sanitize_windows_filename
+from src.download.completion_journal import CompletionJournal, get_part_path, read_segment_progress
 
 
 def format_bytes(bytes_value):
@@ -92,6 +93,7 @@ def calculate_downloaded_size(work_detail, work_info):
     
     try:
         if os.path.exists(work_download_dir):
+            journal = CompletionJournal(work_download_dir)
             for file_info in work_detail['files']:
                 file_title = sanitize_windows_filename(file_info['title'])
 
@@ -113,17 +115,29 @@ def calculate_downloaded_size(work_detail, work_info):
                 else:
                     file_path = os.path.join(work_download_dir, file_title)
                 
-                if os.path.exists(file_path):
+                expected_size = file_info.get('size', 0)
+                # 确保expected_size是数字类型，支持超大数值
+                if isinstance(expected_size, str):
+                    try:
+                        expected_size = int(expected_size)
+                    except ValueError:
+                        expected_size = 0
+
+                if journal.is_completed(file_path, expected_size):
+                    # 下载记录中已完成的文件不再检查磁盘
+                    downloaded_size += expected_size
+                    continue
+
+                # 下载中的文件保存为 .part，旧版本下载的文件没有 .part 后缀
+                part_path = get_part_path(file_path)
+                existing_path = part_path if os.path.exists(part_path) else file_path
+                if os.path.exists(existing_path):
                     # 使用os.path.getsize获取实际文件大小，支持大文件
-                    actual_size = os.path.getsize(file_path)
-                    expected_size = file_info.get('size', 0)
-                    # 确保expected_size是数字类型，支持超大数值
-                    if isinstance(expected_size, str):
-                        try:
-                            expected_size = int(expected_size)
-                        except ValueError:
-                            expected_size = 0
-                    
+                    actual_size = os.path.getsize(existing_path)
+                    segment_progress = read_segment_progress(file_path)
+                    if segment_progress is not None:
+                        # 分段下载中断的 .part 已预分配到完整大小，只有记录的位置之前是完整数据
+                        actual_size = min(actual_size, segment_progress)
                     # 取实际大小和期望大小的最小值，避免超过文件实际大小
                     downloaded_size += min(actual_size, expected_size)
     except Exception as e:
@@ -0,0 +1,211 @@
+"""
+文件完整性校验模块
+下载时边写入边计算哈希，不需要下载完成后再读一遍文件；
+API提供了可识别的内容哈希时与之比较，否则比较文件大小，计算出的哈希写入下载完成记录，
+供之后的"校验文件"功能检查已下载的文件是否损坏
+"""
+
+import os
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from src.download.completion_journal import CompletionJournal, JOURNAL_NAME
+
+
+DEFAULT_ALGORITHM = 'sha256'
+HASH_READ_SIZE = 1024 * 1024
+
+# 按十六进制长度识别不带算法前缀的哈希值
+HEX_LENGTH_ALGORITHMS = {
+    32: 'md5',
+    40: 'sha1',
+    64: 'sha256',
+}
+
+
+def parse_content_hash(value):
+    """
+    解析哈希值，返回 (算法, 小写十六进制摘要)，无法识别时返回 None
+
+    支持 'sha256:abcd...' 形式和不带前缀的 md5/sha1/sha256 十六进制字符串；
+    asmr.one 的 tracks 接口中 hash 字段是 '作品ID/序号' 形式的文件标识，不是内容哈希，会返回 None
+    """
+    if not value or not isinstance(value, str):
+        return None
+    algorithm, _, digest = value.strip().rpartition(':')
+    digest = digest.lower()
+    if not re.fullmatch(r'[0-9a-f]+', digest):
+        return None
+    if algorithm:
+        algorithm = algorithm.lower().replace('-', '')
+        return (algorithm, digest) if algorithm in hashlib.algorithms_available else None
+    algorithm = HEX_LENGTH_ALGORITHMS.get(len(digest))
+    return (algorithm, digest) if algorithm else None
+
+
+def format_content_hash(algorithm, digest):
+    return f'{algorithm}:{digest}'
+
+
+def new_hasher(expected_hash=''):
+    """创建增量哈希对象，API提供了可识别的哈希时使用相同的算法"""
+    parsed = parse_content_hash(expected_hash)
+    return hashlib.new(parsed[0] if parsed else DEFAULT_ALGORITHM)
+
+
+def update_hasher_from_file(hasher, file_path, length):
+    """把文件开头 length 字节加入哈希（断点续传时补上之前已下载的部分）"""
+    remaining = length
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            data = f.read(min(HASH_READ_SIZE, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+
+def hash_file(file_path, algorithm=DEFAULT_ALGORITHM):
+    """计算整个文件的哈希"""
+    hasher = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(HASH_READ_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def check_content_hash(hasher, expected_hash):
+    """
+    比较计算出的哈希和API提供的哈希
+
+    Returns:
+        bool | None: 一致返回 True，不一致返回 False，API没有可识别的哈希时返回 None
+    """
+    parsed = parse_content_hash(expected_hash)
+    if parsed is None or hasher is None or parsed[0] != hasher.name:
+        return None
+    return hasher.hexdigest() == parsed[1]
+
+
+def verify_journal_entry(journal, relative_path, entry):
+    """
+    校验下载完成记录中的一个文件
+
+    Returns:
+        str | None: 文件缺失或损坏时返回原因，正常返回 None
+    """
+    file_path = os.path.join(journal.work_dir, relative_path)
+    if not os.path.exists(file_path):
+        return '文件不存在'
+    actual_size = os.path.getsize(file_path)
+    if actual_size != entry['size']:
+        return f'大小 {actual_size} 与记录的 {entry["size"]} 不一致'
+    parsed = parse_content_hash(entry.get('hash', ''))
+    if parsed is not None and hash_file(file_path, parsed[0]) != parsed[1]:
+        return '哈希值不一致'
+    return None
+
+
+def find_work_dirs(download_root):
+    """查找下载目录中带有下载完成记录的作品文件夹"""
+    work_dirs = []
+    for dir_path, dir_names, file_names in os.walk(download_root):
+        if JOURNAL_NAME in file_names:
+            work_dirs.append(dir_path)
+            dir_names.clear()  # 作品文件夹内不会再有其他作品
+    return work_dirs
+
+
+def verify_library(download_root, workers=4, repair=False, stop_event=None):
+    """
+    校验下载目录中所有记录过的文件，文件在线程池中并行读取（hashlib 计算时会释放GIL）
+
+    Args:
+        download_root: 下载目录
+        workers: 同时校验的文件数
+        repair: 是否直接删除损坏的文件并移除其完成记录（默认只报告，由用户确认后调用 repair_files）
+        stop_event: 设置后停止提交新的校验任务
+
+    Returns:
+        tuple: (校验的文件数, [(文件路径, 原因), ...])
+    """
+    tasks = []
+    for work_dir in find_work_dirs(download_root):
+        journal = CompletionJournal(work_dir)
+        for relative_path, entry in journal.entries.items():
+            tasks.append((journal, relative_path, entry))
+
+    problems = []
+    checked = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = []
+        for journal, relative_path, entry in tasks:
+            if stop_event is not None and stop_event.is_set():
+                break
+            futures.append((journal, relative_path,
+                            executor.submit(verify_journal_entry, journal, relative_path, entry)))
+
+        for journal, relative_path, future in futures:
+            file_path = os.path.normpath(os.path.join(journal.work_dir, relative_path))
+            try:
+                reason = future.result()
+            except OSError as e:
+                reason = f'读取失败: {str(e)}'
+            checked += 1
+            if reason is None:
+                continue
+            print(f"文件校验失败: {file_path} - {reason}")
+            problems.append((file_path, reason))
+            if repair:
+                remove_journal_file(journal, file_path)
+
+    return checked, problems
+
+
+def remove_journal_file(journal, file_path):
+    """删除文件并移除其完成记录，下次下载该作品时只重新下载这个文件"""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        journal.remove(file_path)
+        return True
+    except OSError as e:
+        print(f"删除损坏的文件失败: {str(e)}")
+        return False
+
+
+def find_journal_dir(file_path):
+    """向上查找文件所属的作品文件夹（带有下载完成记录的文件夹），找不到时返回 None"""
+    dir_path = os.path.dirname(os.path.abspath(file_path))
+    while True:
+        if os.path.exists(os.path.join(dir_path, JOURNAL_NAME)):
+            return dir_path
+        parent = os.path.dirname(dir_path)
+        if parent == dir_path:
+            return None
+        dir_path = parent
+
+
+def repair_files(file_paths):
+    """
+    删除校验失败的文件并移除其完成记录（用户确认后调用），下次下载对应作品时重新获取这些文件
+
+    Returns:
+        int: 处理成功的文件数
+    """
+    journals = {}
+    repaired = 0
+    for file_path in file_paths:
+        work_dir = find_journal_dir(file_path)
+        if work_dir is None:
+            print(f"找不到文件的下载完成记录: {file_path}")
+            continue
+        if work_dir not in journals:
+            journals[work_dir] = CompletionJournal(work_dir)
+        if remove_journal_file(journals[work_dir], file_path):
+            repaired += 1
+    return repaired
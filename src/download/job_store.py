@@ -0,0 +1,166 @@
+"""
+下载任务持久化模块
+将下载队列中的作品、每个文件的状态、已下载位置、重试次数和最后的错误信息
+保存在配置文件同目录下的 SQLite 数据库中，程序异常退出或重启后可以从中断的位置继续
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from src.read_conf import ReadConf
+
+
+# 作品状态
+WORK_QUEUED = 'queued'
+WORK_DOWNLOADING = 'downloading'
+WORK_PAUSED = 'paused'
+WORK_COMPLETED = 'completed'
+WORK_FAILED = 'failed'
+WORK_RETRYING = 'retrying'  # 下载失败，等待自动重试
+
+# 文件状态
+FILE_DOWNLOADING = 'downloading'
+FILE_COMPLETED = 'completed'
+FILE_FAILED = 'failed'
+
+
+class DownloadJobStore:
+    """基于 SQLite（WAL模式）的下载任务存储，可被多个下载线程同时使用"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS works (
+                work_id TEXT PRIMARY KEY,
+                work_detail TEXT NOT NULL,
+                work_info TEXT,
+                state TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_works_state ON works (state, position);
+
+            CREATE TABLE IF NOT EXISTS files (
+                work_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                offset INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (work_id, path)
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_work_state ON files (work_id, state);
+        ''')
+        self.conn.commit()
+
+    def add_work(self, work_id, work_detail, work_info=None):
+        """将作品加入队列末尾，已存在时更新详情并重新排队"""
+        with self.lock:
+            position = self.conn.execute('SELECT COALESCE(MAX(position), 0) + 1 FROM works').fetchone()[0]
+            self.conn.execute('''
+                INSERT INTO works (work_id, work_detail, work_info, state, position, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (work_id) DO UPDATE SET
+                    work_detail = excluded.work_detail, work_info = excluded.work_info,
+                    state = excluded.state, position = excluded.position, updated_at = excluded.updated_at
+            ''', (str(work_id), json.dumps(work_detail, ensure_ascii=False),
+                  json.dumps(work_info, ensure_ascii=False) if work_info else None,
+                  WORK_QUEUED, position, time.time()))
+            self.conn.commit()
+
+    def set_work_state(self, work_id, state, error=None):
+        """更新作品状态，失败时累计失败次数并记录错误信息"""
+        with self.lock:
+            if state in (WORK_FAILED, WORK_RETRYING):
+                self.conn.execute('UPDATE works SET state = ?, attempts = attempts + 1, last_error = ?, updated_at = ? '
+                                  'WHERE work_id = ?', (state, error, time.time(), str(work_id)))
+            else:
+                self.conn.execute('UPDATE works SET state = ?, updated_at = ? WHERE work_id = ?',
+                                  (state, time.time(), str(work_id)))
+            self.conn.commit()
+
+    def remove_works(self, work_ids):
+        """从存储中删除作品及其文件记录"""
+        work_ids = [(str(work_id),) for work_id in work_ids]
+        if not work_ids:
+            return
+        with self.lock:
+            self.conn.executemany('DELETE FROM works WHERE work_id = ?', work_ids)
+            self.conn.executemany('DELETE FROM files WHERE work_id = ?', work_ids)
+            self.conn.commit()
+
+    def unfinished_works(self):
+        """
+        按加入顺序返回未完成的作品（排队中、下载中、已暂停、等待重试）
+
+        Returns:
+            list: [(work_id, work_detail, work_info, state), ...]
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT work_id, work_detail, work_info, state FROM works '
+                                     'WHERE state IN (?, ?, ?, ?) ORDER BY position',
+                                     (WORK_QUEUED, WORK_DOWNLOADING, WORK_PAUSED, WORK_RETRYING)).fetchall()
+        return [(work_id, json.loads(detail), json.loads(info) if info else None, state)
+                for work_id, detail, info, state in rows]
+
+    def get_file_states(self, work_id):
+        """
+        读取作品中所有文件的记录
+
+        Returns:
+            dict: path -> (state, offset)
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT path, state, offset FROM files WHERE work_id = ?',
+                                     (str(work_id),)).fetchall()
+        return {path: (state, offset) for path, state, offset in rows}
+
+    def set_file_state(self, work_id, path, state, offset=0, size=0, error=None):
+        """记录文件状态和已下载位置，失败时累计失败次数"""
+        attempts_increment = 1 if state == FILE_FAILED else 0
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO files (work_id, path, size, state, offset, attempts, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (work_id, path) DO UPDATE SET
+                    size = CASE WHEN excluded.size > 0 THEN excluded.size ELSE files.size END,
+                    state = excluded.state, offset = excluded.offset,
+                    attempts = files.attempts + ?, last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+            ''', (str(work_id), path, size, state, offset, attempts_increment, error, time.time(),
+                  attempts_increment))
+            self.conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """
+    获取进程内共享的下载任务存储
+
+    Returns:
+        DownloadJobStore: 任务存储；数据库无法打开时返回None，下载仍可正常进行但不会持久化
+    """
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            db_path = os.path.join(os.path.dirname(ReadConf.get_config_path()), 'download_jobs.db')
+            try:
+                _store = DownloadJobStore(db_path)
+            except sqlite3.Error as e:
+                print(f"无法打开下载任务数据库: {str(e)}")
+                return None
+        return _store
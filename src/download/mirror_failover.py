@@ -0,0 +1,58 @@
+"""
+下载链接切换模块
+文件下载停滞或出错时，切换到其他镜像站点提供的同一文件的下载链接，从当前位置继续下载，
+而不是反复重试同一个慢速节点
+"""
+
+import threading
+from src.asmr_api.get_work_detail import iter_alternate_download_urls
+
+
+class MirrorFailover:
+    """
+    一个文件的下载链接列表，出错时按顺序切换到下一个链接
+
+    备用链接在第一次需要切换时才从其他镜像站点获取；所有链接都试过一轮后回到第一个链接，
+    调用方据此决定是否等待一段时间再继续
+    """
+
+    def __init__(self, work_id, file_info, mirror=None):
+        self.urls = [file_info['download_url']]
+        self.index = 0
+        self.rounds = 0  # 已完整切换过的轮数
+        self.lock = threading.Lock()
+        self.alternates = None
+        self.work_id = work_id
+        self.file_info = file_info
+        self.mirror = mirror
+
+    def current(self):
+        return self.urls[self.index]
+
+    def next_alternate(self):
+        if self.alternates is None:
+            self.alternates = iter_alternate_download_urls(self.work_id, self.file_info, self.mirror)
+        for site_source, url in self.alternates:
+            print(f"找到镜像站点 {site_source} 的备用下载链接")
+            return url
+        return None
+
+    def switch(self, failed_url):
+        """
+        当前链接出错后切换到下一个链接，多个分段同时出错时只切换一次
+
+        Returns:
+            bool: 是否回到了第一个链接（所有链接都已试过一轮）
+        """
+        with self.lock:
+            if failed_url != self.current():
+                return False
+            if self.index == len(self.urls) - 1:
+                url = self.next_alternate()
+                if url is not None:
+                    self.urls.append(url)
+            self.index = (self.index + 1) % len(self.urls)
+            if self.index == 0:
+                self.rounds += 1
+                return True
+            return False
@@ -0,0 +1,100 @@
+"""
+下载进度汇总模块
+下载线程只累加计数器，不再逐块发送Qt信号；
+界面线程用定时器按固定频率读取所有计数器，一次性刷新所有下载项
+"""
+
+import time
+import threading
+
+
+class ProgressCounter:
+    """
+    单个作品的进度计数器
+
+    每个下载线程只写入以自己线程ID为键的槽位（单写者），读取时求和，写入和读取都不需要加锁
+    """
+
+    speed_window = 0.5  # 秒，速度计算的最小时间间隔
+
+    def __init__(self, work_id, initial_bytes=0, total_bytes=0):
+        self.work_id = work_id
+        self.initial_bytes = initial_bytes  # 开始下载前已存在的部分
+        self.total_bytes = total_bytes
+        self.slots = {}  # 线程ID -> 该线程下载的字节数
+        self.start_time = time.time()
+
+        # 以下字段只由界面线程读写
+        self.last_sample_time = time.time()
+        self.last_sample_bytes = initial_bytes
+        self.speed_kbps = 0.0
+
+    def add(self, bytes_count):
+        ident = threading.get_ident()
+        self.slots[ident] = self.slots.get(ident, 0) + bytes_count
+
+    def downloaded_bytes(self):
+        return self.initial_bytes + sum(list(self.slots.values()))
+
+    def average_speed(self):
+        """开始下载以来的平均速度（字节/秒）"""
+        elapsed = time.time() - self.start_time
+        if elapsed <= 0:
+            return 0.0
+        return (self.downloaded_bytes() - self.initial_bytes) / elapsed
+
+    def sample(self):
+        """
+        读取当前进度（由界面定时器调用）
+
+        Returns:
+            tuple: (进度百分比, 已下载字节数, 总字节数, 速度KB/s)
+        """
+        downloaded = self.downloaded_bytes()
+        now = time.time()
+        elapsed = now - self.last_sample_time
+        if elapsed >= self.speed_window:
+            self.speed_kbps = (downloaded - self.last_sample_bytes) / elapsed / 1024
+            self.last_sample_time = now
+            self.last_sample_bytes = downloaded
+
+        if self.total_bytes > 0:
+            progress = min(int(downloaded / self.total_bytes * 100), 100)
+        else:
+            progress = 0
+        return progress, downloaded, self.total_bytes, self.speed_kbps
+
+
+class ProgressRegistry:
+    """正在下载的作品的进度计数器集合"""
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def register(self, work_id, initial_bytes=0, total_bytes=0):
+        counter = ProgressCounter(work_id, initial_bytes, total_bytes)
+        with self.lock:
+            self.counters[work_id] = counter
+        return counter
+
+    def unregister(self, work_id):
+        with self.lock:
+            self.counters.pop(work_id, None)
+
+    def get(self, work_id):
+        with self.lock:
+            return self.counters.get(work_id)
+
+    def snapshot(self):
+        """返回当前所有计数器的列表"""
+        with self.lock:
+            return list(self.counters.values())
+
+
+_registry = ProgressRegistry()
+
+
+def get_progress_registry():
+    """获取进程内共享的进度计数器集合"""
+    return _registry
@@ -0,0 +1,221 @@
+"""
+全局限速模块
+进程内所有下载连接共用一个限速器，分为三级令牌桶：
+全局（speed_limit）、每个作品（全局速度在正在下载的作品之间按需分配）、每个服务器（host_speed_limit）
+"""
+
+import time
+import threading
+from urllib.parse import urlparse
+from src.read_conf import ReadConf
+
+
+class TokenBucket:
+    """令牌桶，速度为0表示不限速"""
+
+    def __init__(self, rate):
+        self.rate = rate  # bytes/s
+        self.tokens = rate  # 桶大小等于每秒允许的字节数
+        self.last_refill_time = time.monotonic()
+
+    def set_rate(self, rate):
+        self.rate = rate
+        self.tokens = min(self.tokens, rate)
+
+    def reserve(self, amount, now):
+        """
+        预支令牌，不足部分由等待时间补偿
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0
+        self.tokens = min(self.rate, self.tokens + (now - self.last_refill_time) * self.rate)
+        self.last_refill_time = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class Throttle:
+    """
+    单个下载连接的限速句柄
+
+    接收到的数据先累计，达到一批后才向限速器申请一次令牌，避免每个小数据块都加锁和休眠
+    """
+
+    def __init__(self, limiter, work_id, host):
+        self.limiter = limiter
+        self.work_id = work_id
+        self.host = host
+        self.pending = 0
+
+    def consume(self, amount):
+        """
+        记录收到的数据量，累计够一批时申请令牌
+
+        Returns:
+            float: 因限速休眠的秒数，停滞检测不计入这段时间
+        """
+        self.pending += amount
+        if self.pending < self.limiter.batch_size:
+            return 0
+        wait_time = self.limiter.acquire(self.pending, self.work_id, self.host)
+        self.pending = 0
+        return wait_time
+
+    def close(self):
+        self.limiter.release(self.work_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RateLimiter:
+    """
+    分级限速器
+
+    配置文件修改后（配置版本号变化）自动读取新的限速值，正在进行的下载立即生效
+    """
+
+    min_batch_size = 16 * 1024
+    max_batch_size = 1024 * 1024
+    rebalance_interval = 0.5  # 秒，按各作品最近的实际速度重新分配作品速度的间隔
+    headroom = 1.5  # 用不满平分速度的作品分配到实际速度的这个倍数，留出增长的余地
+    demand_smoothing = 0.3  # 作品速度统计的指数移动平均系数
+    min_share_ratio = 0.05  # 作品至少分配到全局速度的这个比例，空闲的作品恢复下载时不会被卡住
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(0)
+        self.host_rate = 0
+        self.work_buckets = {}  # work_id -> TokenBucket
+        self.work_connections = {}  # work_id -> 正在使用限速器的连接数
+        self.work_usage = {}  # work_id -> 上次统计以来申请的字节数
+        self.work_demand = {}  # work_id -> 最近一个统计周期的速度（bytes/s）乘以余量
+        self.last_rebalance_time = time.monotonic()
+        self.host_buckets = {}  # host -> TokenBucket
+        self.batch_size = self.min_batch_size
+        self.config_version = None
+        self.reload()
+
+    def reload(self):
+        """重新读取限速配置"""
+        download_conf = ReadConf().read_download_conf()
+        with self.lock:
+            self.config_version = ReadConf.config_version
+            self.global_bucket.set_rate(download_conf['speed_limit'] * 1024 * 1024)
+            self.host_rate = download_conf['host_speed_limit'] * 1024 * 1024
+            for bucket in self.host_buckets.values():
+                bucket.set_rate(self.host_rate)
+            self.update_work_rates()
+
+    def update_work_rates(self, measure=False):
+        """
+        按最大最小公平分配全局速度（调用方需持有锁）
+
+        用不满平分速度的作品（服务器慢、快要下载完成）只分配到实际速度加余量，
+        省下的速度由其他作品平分，所有作品加起来能用满全局限速；刚开始下载的作品按平分计算
+
+        Args:
+            measure: 是否按上次统计以来各作品申请的字节数更新需求（定期调用），否则沿用上次的需求
+        """
+        global_rate = self.global_bucket.rate
+        if global_rate > 0:
+            # 每秒大约申请20次令牌
+            self.batch_size = int(min(self.max_batch_size, max(self.min_batch_size, global_rate / 20)))
+        else:
+            self.batch_size = self.max_batch_size
+
+        if measure:
+            now = time.monotonic()
+            elapsed = now - self.last_rebalance_time
+            self.last_rebalance_time = now
+            demand = {}
+            for work_id, usage in self.work_usage.items():
+                if work_id not in self.work_buckets:
+                    continue
+                # 每批令牌较大，单个周期的统计忽高忽低，按指数移动平均平滑
+                speed = usage * self.headroom / elapsed
+                previous = self.work_demand.get(work_id)
+                demand[work_id] = speed if previous is None else previous + self.demand_smoothing * (speed - previous)
+            self.work_demand = demand
+            self.work_usage = {work_id: 0 for work_id in self.work_buckets}
+
+        remaining = global_rate
+        # 还没有完整统计周期的作品视为需求不限
+        ordered = sorted(((work_id, self.work_demand.get(work_id, float('inf'))) for work_id in self.work_buckets),
+                         key=lambda item: item[1])
+        for index, (work_id, demand) in enumerate(ordered):
+            fair = remaining / (len(ordered) - index)
+            share = min(fair, max(demand, global_rate * self.min_share_ratio))
+            self.work_buckets[work_id].set_rate(share)
+            remaining -= share
+
+    def open(self, work_id, url):
+        """为一个下载连接创建限速句柄，连接结束后需调用 close()"""
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            self.work_connections[work_id] = self.work_connections.get(work_id, 0) + 1
+            if work_id not in self.work_buckets:
+                self.work_buckets[work_id] = TokenBucket(0)
+                self.update_work_rates()
+            if host not in self.host_buckets:
+                self.host_buckets[host] = TokenBucket(self.host_rate)
+        return Throttle(self, work_id, host)
+
+    def release(self, work_id):
+        with self.lock:
+            count = self.work_connections.get(work_id, 0) - 1
+            if count > 0:
+                self.work_connections[work_id] = count
+                return
+            self.work_connections.pop(work_id, None)
+            self.work_buckets.pop(work_id, None)
+            self.work_usage.pop(work_id, None)
+            self.work_demand.pop(work_id, None)
+            self.update_work_rates()
+
+    def acquire(self, amount, work_id, host):
+        """申请令牌，三级令牌桶中等待时间最长的决定休眠时间，返回休眠的秒数"""
+        if self.config_version != ReadConf.config_version:
+            self.reload()
+
+        with self.lock:
+            now = time.monotonic()
+            work_bucket = self.work_buckets.get(work_id)
+            if work_bucket is not None:
+                # 各作品的速度加起来不超过全局限速，由作品的令牌桶限制即可；
+                # 再等待全局令牌桶时，用不满自己份额的作品会被其他作品预支的令牌拖慢
+                wait_time = work_bucket.reserve(amount, now)
+            else:
+                wait_time = self.global_bucket.reserve(amount, now)
+            host_bucket = self.host_buckets.get(host)
+            if host_bucket is not None:
+                wait_time = max(wait_time, host_bucket.reserve(amount, now))
+            # 只统计已经历完整统计周期的作品，刚加入的作品在下一个周期开始统计
+            if work_id in self.work_usage:
+                self.work_usage[work_id] += amount
+            if now - self.last_rebalance_time >= self.rebalance_interval and self.global_bucket.rate > 0:
+                self.update_work_rates(measure=True)
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """获取进程内共享的限速器"""
+    global _limiter
+
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
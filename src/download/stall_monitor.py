@@ -0,0 +1,85 @@
+"""
+下载停滞检测模块
+按滑动窗口统计最近一段时间的下载速度，而不是从文件开始计算的平均速度：
+开始时较慢的大文件不会被误判，开始很快之后停滞的下载能在几秒内被发现。
+因限速器休眠的时间不计入统计，被限速但正常的连接不会被判定为停滞。
+完全收不到数据的情况由请求的读取超时负责检测
+"""
+
+import time
+from collections import deque
+
+
+class ThroughputMonitor:
+    """
+    单个连接的滑动窗口速度监控
+
+    判定为停滞的两种情况：
+    1. 预热时间过后，窗口内的速度低于配置的最小速度
+    2. 窗口内的速度低于本次连接历史窗口速度中位数的 drop_ratio 倍（先快后慢），不需要等待预热
+    """
+
+    sample_interval = 0.5  # 秒，速度采样和检查的间隔
+    drop_ratio = 0.2  # 低于历史中位数的这个比例视为停滞
+    percentile = 0.5  # 自适应阈值使用的历史速度百分位
+    history_size = 240  # 保留的历史采样数（约2分钟）
+
+    def __init__(self, min_speed_bps, window=5.0, warmup=30.0, now=None):
+        now = time.time() if now is None else now
+        self.min_speed_bps = min_speed_bps
+        self.window = max(self.sample_interval * 2, window)
+        self.warmup = warmup
+        self.start_time = now
+        self.samples = deque()  # (时间, 累计字节数)，只保留窗口内的采样
+        self.samples.append((now, 0))
+        self.history = deque(maxlen=self.history_size)  # 最近各采样点的窗口速度
+        self.total_bytes = 0
+        self.last_sample_time = now
+        self.idle_time = 0.0  # 累计因限速休眠的时间，从所有时间中扣除
+
+    def add(self, bytes_count, now=None, idle=0.0):
+        """
+        累加收到的数据量，到达采样间隔时检查速度
+
+        Args:
+            idle: 本次数据之后因限速器休眠的秒数
+
+        Returns:
+            str | None: 判定为停滞时返回原因
+        """
+        self.total_bytes += bytes_count
+        self.idle_time += idle
+        now = (time.time() if now is None else now) - self.idle_time
+        if now - self.last_sample_time < self.sample_interval:
+            return None
+        self.last_sample_time = now
+        return self.check(now)
+
+    def window_speed(self, now):
+        """窗口内的平均速度（字节/秒），窗口尚未填满时返回 None"""
+        while len(self.samples) > 1 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+        first_time, first_bytes = self.samples[0]
+        self.samples.append((now, self.total_bytes))
+        if now - first_time < self.window:
+            return None
+        return (self.total_bytes - first_bytes) / (now - first_time)
+
+    def adaptive_threshold(self):
+        """历史窗口速度的百分位乘以 drop_ratio，历史不足一个窗口时返回 0"""
+        if len(self.history) < self.window / self.sample_interval:
+            return 0
+        ordered = sorted(self.history)
+        return ordered[int((len(ordered) - 1) * self.percentile)] * self.drop_ratio
+
+    def check(self, now):
+        speed = self.window_speed(now)
+        if speed is None:
+            return None
+        threshold = self.adaptive_threshold()
+        self.history.append(speed)
+        if threshold and speed < threshold:
+            return f"速度从 {threshold / self.drop_ratio / 1024:.2f} KB/s 降至 {speed / 1024:.2f} KB/s"
+        if now - self.start_time >= self.warmup and speed < self.min_speed_bps:
+            return f"最近 {self.window:.0f} 秒速度 {speed / 1024:.2f} KB/s 低于 {self.min_speed_bps / 1024:.2f} KB/s"
+        return None
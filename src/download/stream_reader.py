@@ -0,0 +1,176 @@
+"""
+响应体读取模块
+把下载数据直接读入可复用的缓冲区（readinto），不为每个数据块创建新的 bytes 对象；
+每块的大小按链路速度自适应（快速链路上可达数MB），写文件、计算哈希、限速、进度和停滞检测都按块进行，
+每块的 Python 开销被分摊到更多数据上
+"""
+
+import time
+import socket
+import threading
+import http.client
+import requests
+
+
+_thread_buffers = threading.local()
+
+
+def get_thread_buffer(size):
+    """
+    当前线程复用的接收缓冲区，同一线程中的连接依次使用，不需要每次请求重新分配
+
+    缓冲区按需要的大小增长（块大小自适应变大时），慢速连接的线程不会占用最大块大小的内存
+    """
+    buffer = getattr(_thread_buffers, 'buffer', None)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(size)
+        _thread_buffers.buffer = buffer
+    return buffer
+
+
+class StreamReader:
+    """
+    按块读取 requests 流式响应的数据
+
+    没有 Content-Encoding 时直接从底层的 http.client 响应 readinto 到缓冲区（由 socket 直接写入，没有中间复制），
+    否则退回到 urllib3 解码后读取。每次读取只接收已到达的数据，链路变慢时不会阻塞到整块填满。
+    产生的 memoryview 只在下一次读取前有效
+    """
+
+    min_block_size = 16 * 1024
+    max_block_size = 4 * 1024 * 1024
+    max_drain_bytes = 1024 * 1024  # 提前结束时剩余数据不超过这个大小就读完，保留连接供下次请求复用
+    target_interval = 0.1  # 秒，每块数据（读取加处理）的目标时间，链路越快块越大
+    max_block_time = 0.2  # 秒，读取一块数据最多等待的时间，超过时返回已收到的部分
+
+    def __init__(self, response, buffer=None):
+        self.response = response
+        self.block_size = self.min_block_size
+        # 调用方提供缓冲区时块大小不超过它，否则使用线程复用的缓冲区，随块大小增长
+        self.growable = buffer is None
+        self.buffer = buffer if buffer is not None else get_thread_buffer(self.block_size)
+        self.view = memoryview(self.buffer)
+        raw = response.raw
+        fp = getattr(raw, '_fp', None)
+        # 需要解压的响应必须经过 urllib3 解码，不能直接读取
+        self.direct = isinstance(fp, http.client.HTTPResponse) and not response.headers.get('Content-Encoding')
+        self.fp = fp if self.direct else None
+
+    def readinto(self, view):
+        """
+        读取已经到达的数据，最多一次 socket 接收，不等待填满 view
+
+        返回 0 表示响应已结束（或连接提前关闭，由调用方按剩余长度判断）
+        """
+        try:
+            if self.direct:
+                fp = self.fp
+                if fp.fp is None:
+                    return 0
+                if fp.chunked:
+                    data = fp.read1(len(view))
+                    view[:len(data)] = data
+                    return len(data)
+                # 与 http.client 的 readinto 相同，只是底层用 readinto1，有数据到达就返回
+                if fp.length is not None and len(view) > fp.length:
+                    view = view[:fp.length]
+                count = fp.fp.readinto1(view)
+                if not count and view:
+                    fp._close_conn()
+                elif fp.length is not None:
+                    fp.length -= count
+                    if not fp.length:
+                        fp._close_conn()
+                return count
+            data = self.response.raw.read1(len(view), decode_content=True)
+            view[:len(data)] = data
+            return len(data)
+        except socket.timeout as e:
+            raise requests.exceptions.ReadTimeout(str(e))
+        except (http.client.HTTPException, OSError) as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def read_block(self):
+        """
+        读取一块数据：填满块、响应结束或超过 max_block_time 时返回
+
+        Returns:
+            tuple: (字节数, 响应是否已结束)
+        """
+        view = self.view[:self.block_size]
+        filled = 0
+        deadline = time.monotonic() + self.max_block_time
+        while filled < len(view):
+            count = self.readinto(view[filled:])
+            if count == 0:
+                return filled, True
+            filled += count
+            if time.monotonic() >= deadline:
+                break
+        return filled, False
+
+    def blocks(self):
+        """
+        逐块产生收到的数据（memoryview），读完后把连接放回连接池
+
+        块大小按上一块从开始读取到处理完成的时间调整，使每块大约需要 target_interval 秒；
+        每块最多等待 max_block_time 秒，速度突然下降时不会等待按原来速度计算的整块数据，
+        写入、限速、进度、暂停和停滞检测仍按大致固定的间隔进行
+        """
+        last_time = time.monotonic()
+        while True:
+            count, ended = self.read_block()
+            if count:
+                yield self.view[:count]
+            if ended:
+                # http.client 在连接提前关闭时不会抛出异常，按剩余长度判断是否读完
+                if self.direct and self.fp.length:
+                    raise requests.exceptions.ConnectionError(f"连接提前关闭，还有 {self.fp.length} 字节未收到")
+                break
+            now = time.monotonic()
+            self.adapt(count, now - last_time)
+            last_time = now
+
+        if self.direct:
+            # 直接读取时 urllib3 不知道响应已读完，手动把连接放回连接池
+            self.response.raw.release_conn()
+
+    def remaining(self):
+        """响应中还没有读取的字节数，未知时返回 None"""
+        if self.direct:
+            return self.fp.length
+        return self.response.raw.length_remaining
+
+    def finish(self):
+        """
+        不再需要响应中剩余的数据时调用（如分段的范围已下载完）
+
+        剩余数据不多时读完并把连接放回连接池，避免下一个请求重新建立 TCP/TLS 连接；
+        剩余很多（分段被拆分缩短）或长度未知时关闭连接
+        """
+        remaining = self.remaining()
+        if remaining is None or remaining > self.max_drain_bytes:
+            self.response.close()
+            return
+        try:
+            while self.readinto(self.view[:self.block_size]):
+                pass
+        except requests.exceptions.RequestException:
+            self.response.close()
+            return
+        self.response.raw.release_conn()
+
+    def adapt(self, count, elapsed):
+        if elapsed <= 0:
+            target = self.max_block_size
+        else:
+            target = count / elapsed * self.target_interval
+        # 每次最多翻倍或减半，避免速度波动时块大小剧烈变化
+        target = min(max(target, self.block_size / 2), self.block_size * 2)
+        max_block_size = self.max_block_size if self.growable else len(self.buffer)
+        block_size = int(min(max(target, self.min_block_size), max_block_size))
+        self.block_size = block_size - block_size % 4096 or self.min_block_size
+        if self.block_size > len(self.buffer):
+            # 上一块数据已处理完，换成更大的缓冲区
+            self.buffer = get_thread_buffer(self.block_size)
+            self.view = memoryview(self.buffer)
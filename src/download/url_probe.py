@@ -0,0 +1,118 @@
+"""
+文件链接探测模块
+通过HEAD请求获取文件大小、ETag、Last-Modified和Range支持情况，
+结果保存在本地API缓存中，供作品详情加载和下载引擎（分段下载、断点续传）复用
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from src.read_conf import ReadConf
+from src.asmr_api.api_cache import get_api_cache
+
+
+def get_cached_probe(url):
+    """读取缓存的探测结果，没有或已过期时返回None"""
+    cache = get_api_cache()
+    if cache is None:
+        return None
+    return cache.get('probe', url, ttl=ReadConf().read_cache_conf()['detail_ttl'])
+
+
+def get_stored_probe(url):
+    """读取保存的探测结果，不检查有效期（用于 If-Range 校验值，过期的校验值最多导致服务器返回完整文件）"""
+    cache = get_api_cache()
+    if cache is None:
+        return None
+    return cache.get('probe', url)
+
+
+def update_cached_probe(url, **fields):
+    """合并更新缓存的探测结果"""
+    cache = get_api_cache()
+    if cache is None:
+        return
+    probe = cache.get('probe', url) or {}
+    probe.update(fields)
+    cache.set('probe', url, probe)
+
+
+def probe_url(session, url, timeout=15):
+    """
+    通过HEAD请求探测文件信息，优先使用缓存
+
+    Returns:
+        dict: size, etag, last_modified, accept_ranges（服务器没有返回 Accept-Ranges 时为 None）；
+              请求失败时返回None
+    """
+    probe = get_cached_probe(url)
+    if probe is not None and probe.get('size'):
+        return probe
+
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+    except requests.exceptions.RequestException as e:
+        print(f"HEAD请求失败: {str(e)}")
+        return None
+
+    if response.status_code >= 400:
+        print(f"HEAD请求失败，状态码: {response.status_code}")
+        return None
+
+    content_length = response.headers.get('Content-Length')
+    accept_ranges = response.headers.get('Accept-Ranges', '').strip().lower()
+    probe = {
+        'size': int(content_length) if content_length and content_length.isdigit() else 0,
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+        'accept_ranges': accept_ranges == 'bytes' if accept_ranges else None,
+    }
+    if probe['size']:
+        update_cached_probe(url, **probe)
+    return probe
+
+
+def probe_urls(session, urls, workers=8, timeout=15):
+    """
+    并发探测多个文件链接
+
+    Returns:
+        dict: url -> 探测结果（失败时为None）
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as executor:
+        results = executor.map(lambda url: probe_url(session, url, timeout), urls)
+        return dict(zip(urls, results))
+
+
+def probe_range_support(session, url, file_size, timeout=15):
+    """
+    检查服务器是否支持Range请求，且返回的文件总大小与预期一致，结果缓存供下次使用
+
+    HEAD探测已经得到 Accept-Ranges（bytes 或 none）且大小一致时直接使用，不再发送 bytes=0-0 的请求
+    """
+    probe = get_cached_probe(url)
+    if probe is not None and probe.get('size') == file_size:
+        if 'range_ok' in probe:
+            return probe['range_ok']
+        if probe.get('accept_ranges') is not None:
+            update_cached_probe(url, range_ok=probe['accept_ranges'])
+            return probe['accept_ranges']
+
+    try:
+        response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+        response.close()
+    except requests.exceptions.RequestException as e:
+        print(f"Range探测失败: {str(e)}")
+        return False
+
+    content_range = response.headers.get('Content-Range', '')
+    total = content_range.rsplit('/', 1)[-1]
+    range_ok = response.status_code == 206 and total.isdigit() and int(total) == file_size
+    if response.status_code == 206 and total.isdigit():
+        update_cached_probe(url, size=int(total), range_ok=range_ok,
+                            etag=response.headers.get('ETag', ''),
+                            last_modified=response.headers.get('Last-Modified', ''))
+    return range_ok
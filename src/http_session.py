@@ -0,0 +1,122 @@
+"""
+共享HTTP会话模块
+所有API请求和媒体下载共用同一个 requests.Session，复用 keep-alive 连接，
+代理、Token 和默认超时时间只在会话创建时配置一次
+"""
+
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from src.read_conf import ReadConf
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """未指定超时时间的请求使用配置中的默认超时"""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class ApiTokenAuth(AuthBase):
+    """只对 api.* 域名附加 Bearer Token，避免把 Token 发送给媒体文件服务器"""
+
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, request):
+        host = urlparse(request.url).hostname or ''
+        if self.token and host.startswith('api.') and 'authorization' not in request.headers:
+            request.headers['authorization'] = f'Bearer {self.token}'
+        return request
+
+
+def no_auth(request):
+    """不附加 Token 的认证方式，用于登录等请求"""
+    return request
+
+
+def build_proxies(proxy_conf):
+    """根据代理配置生成 requests 使用的代理字典"""
+    if not proxy_conf['open_proxy']:
+        return None
+    proxy_address = f'{proxy_conf["proxy_type"]}://{proxy_conf["host"]}:{proxy_conf["port"]}'
+    return {
+        'http': proxy_address,
+        'https': proxy_address
+    }
+
+
+def max_connections(download_conf):
+    """
+    下载同时可能使用的最大连接数，用作连接池大小
+
+    - 各作品的文件：作品数 × 每作品文件数 × 每文件分段数
+    - makespan 策略下空闲槽位分给其他作品的额外连接：最多 (作品数 - 1) 个槽位，每个文件都可能使用；
+      有新作品开始时收回，但已拆分的分段会继续下载完，所以与新作品的连接同时存在
+    - 文件即将下载完成时为下一个文件提前打开的连接：每个作品的每个文件最多一个
+    - 为队列中下一个作品提前探测链接的请求，以及API请求的余量
+    """
+    max_concurrent = max(1, download_conf['max_concurrent'])
+    file_workers = max(1, download_conf['file_workers'])
+    segment_count = max(1, download_conf['segment_count'])
+    downloads = max_concurrent * file_workers * segment_count
+    extra = (max_concurrent - 1) * file_workers * segment_count
+    lookahead = max_concurrent * file_workers
+    prepare = 1  # 提前探测在一个后台线程中依次进行
+    return downloads + extra + lookahead + prepare + 4
+
+
+_session = None
+_session_settings = None  # 创建会话时使用的 (代理, Token, 超时, 连接池大小)
+_session_version = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    获取进程内共享的 HTTP 会话
+
+    代理、Token、超时或连接池大小（由并发数决定）变化后会重新创建会话，修改其他配置时继续使用原来的会话和连接；
+    正在使用旧会话的下载不受影响
+
+    Returns:
+        requests.Session: 配置好连接池、代理、认证和默认超时的会话
+    """
+    global _session, _session_settings, _session_version
+
+    with _session_lock:
+        if _session is not None and _session_version == ReadConf.config_version:
+            return _session
+
+        conf = ReadConf()
+        proxies = build_proxies(conf.read_proxy_conf())
+        token = conf.read_asmr_user()['token']
+        download_conf = conf.read_download_conf()
+        pool_size = max_connections(download_conf)
+        # 连接超时和读取超时分开设置：连接不上时尽快失败，读取超时用于检测收不到数据的停滞连接
+        timeout = (download_conf['connect_timeout'], download_conf['timeout'])
+
+        settings = (tuple(sorted(proxies.items())) if proxies else None, token, timeout, pool_size)
+        _session_version = ReadConf.config_version
+        if _session is not None and _session_settings == settings:
+            return _session
+
+        session = requests.Session()
+        adapter = TimeoutHTTPAdapter(timeout=timeout, pool_connections=10, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if proxies:
+            session.proxies.update(proxies)
+        session.auth = ApiTokenAuth(token)
+
+        _session = session
+        _session_settings = settings
+        return _session
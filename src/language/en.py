@@ -14,11 +14,13 @@ TRANSLATIONS = {
     "settings": "Settings",
     "start": "Start",
     "pause": "Pause",
+    "download_now": "Download now",
     "resume": "Resume",
     "downloading": "Downloading...",
     "paused": "Paused",
     "completed": "Completed",
     "waiting": "Waiting",
+    "queued": "Queued",
     "error": "Error",
     "download_error": "Download Error",
     "download_failed": "Download Failed",
@@ -35,6 +37,7 @@ TRANSLATIONS = {
     "download_completed": "Download completed",
     "continue_next": "continue next...",
     "start_sequential_download": "Starting sequential download, total",
+    "start_concurrent_download": "Starting parallel download, total",
     "tasks": "tasks",
     "no_downloadable_tasks": "No downloadable tasks",
     "kb_per_second": "KB/s",
@@ -98,5 +101,17 @@ TRANSLATIONS = {
     "validation_failed": "Validation failed",
     "download_stopped": "Download stopped",
     "stop_operation": "Stop operation",
-    "download_complete": "Download complete"
+    "download_complete": "Download complete",
+
+    # File verification
+    "verify_library": "Verify Files",
+    "verify_in_progress": "Verifying downloaded files...",
+    "verify_result": "File Verification",
+    "verify_all_ok": "Verified {checked} files, all intact",
+    "verify_problems": "Verified {checked} files, {count} damaged or missing",
+    "verify_confirm_repair": "Delete these files? They will be fetched again when their works are downloaded. Files edited after download (e.g. retagged) also show up as damaged",
+    "verify_repaired": "Removed {count} damaged files. They will be fetched again when their works are downloaded",
+    "verify_failed": "File verification failed",
+    "retry_scheduled": "retrying in {delay}s ({attempt}/{total})",
+    "download_failures_summary": "All downloads finished, {count} works failed"
 }
@@ -14,11 +14,13 @@ TRANSLATIONS = {
     "settings": "設定",
     "start": "開始",
     "pause": "一時停止",
+    "download_now": "今すぐダウンロード",
     "resume": "再開",
     "downloading": "ダウンロード中...",
     "paused": "一時停止中",
     "completed": "完了",
     "waiting": "待機中",
+    "queued": "待機中",
     "error": "エラー",
     "download_error": "ダウンロードエラー",
     "download_failed": "ダウンロード失敗",
@@ -35,6 +37,7 @@ TRANSLATIONS = {
     "download_completed": "ダウンロード完了",
     "continue_next": "次へ続行...",
     "start_sequential_download": "順次ダウンロード開始、合計",
+    "start_concurrent_download": "並列ダウンロード開始、合計",
     "tasks": "タスク",
     "no_downloadable_tasks": "ダウンロード可能なタスクがありません",
     "kb_per_second": "KB/s",
@@ -98,5 +101,17 @@ TRANSLATIONS = {
     "validation_failed": "検証に失敗しました",
     "download_stopped": "ダウンロードが停止されました",
     "stop_operation": "停止操作",
-    "download_complete": "ダウンロード完了"
+    "download_complete": "ダウンロード完了",
+
+    # ファイル検証
+    "verify_library": "ファイル検証",
+    "verify_in_progress": "ダウンロード済みファイルを検証中...",
+    "verify_result": "ファイル検証結果",
+    "verify_all_ok": "{checked} 個のファイルを検証しました。すべて正常です",
+    "verify_problems": "{checked} 個のファイルを検証し、{count} 個が破損または欠落しています",
+    "verify_confirm_repair": "これらのファイルを削除しますか？作品を再ダウンロードすると再取得されます。ダウンロード後に編集したファイル（タグの書き換えなど）も破損として表示されます",
+    "verify_repaired": "破損した {count} 個のファイルを削除しました。作品を再ダウンロードすると再取得されます",
+    "verify_failed": "ファイル検証に失敗しました",
+    "retry_scheduled": "{delay} 秒後に再試行 ({attempt}/{total})",
+    "download_failures_summary": "すべてのダウンロードが終了しました。{count} 件の作品が失敗しました"
 }
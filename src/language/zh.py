@@ -14,11 +14,13 @@ TRANSLATIONS = {
     "settings": "设置",
     "start": "开始",
     "pause": "暂停",
+    "download_now": "立即下载",
     "resume": "继续",
     "downloading": "下载中...",
     "paused": "已暂停",
     "completed": "下载完成",
     "waiting": "等待下载",
+    "queued": "排队中",
     "error": "错误",
     "download_error": "下载错误",
     "download_failed": "下载失败",
@@ -35,6 +37,7 @@ TRANSLATIONS = {
     "download_completed": "下载完成",
     "continue_next": "继续下一个...",
     "start_sequential_download": "开始按顺序下载，共",
+    "start_concurrent_download": "开始并行下载，共",
     "tasks": "个任务",
     "no_downloadable_tasks": "没有可开始的下载任务",
     "kb_per_second": "KB/s",
@@ -98,5 +101,17 @@ TRANSLATIONS = {
     "validation_failed": "验证失败",
     "download_stopped": "下载已停止",
     "stop_operation": "停止操作",
-    "download_complete": "下载完成"
+    "download_complete": "下载完成",
+
+    # 文件校验
+    "verify_library": "校验文件",
+    "verify_in_progress": "正在校验已下载的文件...",
+    "verify_result": "文件校验结果",
+    "verify_all_ok": "已校验 {checked} 个文件，全部完好",
+    "verify_problems": "已校验 {checked} 个文件，{count} 个文件损坏或缺失",
+    "verify_confirm_repair": "是否删除这些文件？重新下载对应作品时会重新获取这些文件。下载后修改过的文件（如重新写入标签）也会显示为损坏",
+    "verify_repaired": "已删除 {count} 个损坏的文件，重新下载对应作品时会重新获取这些文件",
+    "verify_failed": "文件校验失败",
+    "retry_scheduled": "{delay} 秒后重试 ({attempt}/{total})",
+    "download_failures_summary": "所有下载任务已结束，{count} 个作品下载失败"
 }
@@ -6,6 +6,7 @@ import pymysql
 
 class ReadConf:
     config = None
+    config_version = 0  # 每次写入配置后递增，供缓存了配置的模块判断是否需要重新读取
     
     @staticmethod
     def get_config_path():
@@ -32,6 +33,13 @@ class ReadConf:
         self.config.read(config_path, encoding='utf-8')
         return self.config
     
+    def save_config(self):
+        """将当前配置写入文件，并递增配置版本号"""
+        config_path = self.get_config_path()
+        with open(config_path, 'w', encoding='utf-8') as configfile:
+            self.config.write(configfile)
+        ReadConf.config_version += 1
+
     def check_DB(self):
         open_DB = self.config.get('database', 'open_DB')
         if open_DB == 'True':
@@ -67,9 +75,7 @@ class ReadConf:
 
     def write_downfile_type(self, item_type, flag):
         self.config.set('file_type', item_type, flag)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
     
     def read_name(self):
         folder_for_name = self.config.get('name', 'name')
@@ -77,9 +83,7 @@ class ReadConf:
 
     def write_folder_for_name(self, name):
         self.config.set('name', 'name', name)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
     
     def read_download_conf(self):
         speed_limit = float(self.config.get('down_conf', 'speed_limit'))
@@ -88,6 +92,29 @@ class ReadConf:
         timeout = int(self.config.get('down_conf', 'timeout'))
         min_speed = int(self.config.get('down_conf', 'min_speed'))
         min_speed_check = int(self.config.get('down_conf', 'min_speed_check'))
+        # 分段下载配置（旧配置文件中可能不存在，使用默认值）
+        segment_count = int(self.config.get('down_conf', 'segment_count', fallback='4'))
+        segment_threshold = int(self.config.get('down_conf', 'segment_threshold', fallback='64'))
+        max_concurrent = int(self.config.get('down_conf', 'max_concurrent', fallback='3'))
+        file_workers = int(self.config.get('down_conf', 'file_workers', fallback='4'))
+        max_list_pages = int(self.config.get('down_conf', 'max_list_pages', fallback='0'))
+        list_workers = int(self.config.get('down_conf', 'list_workers', fallback='3'))
+        detail_workers = int(self.config.get('down_conf', 'detail_workers', fallback='4'))
+        probe_workers = int(self.config.get('down_conf', 'probe_workers', fallback='8'))
+        host_speed_limit = float(self.config.get('down_conf', 'host_speed_limit', fallback='0'))
+        progress_fps = int(self.config.get('down_conf', 'progress_fps', fallback='10'))
+        verify_workers = int(self.config.get('down_conf', 'verify_workers', fallback='4'))
+        connect_timeout = float(self.config.get('down_conf', 'connect_timeout', fallback='5'))
+        stall_window = float(self.config.get('down_conf', 'stall_window', fallback='5'))
+        work_retries = int(self.config.get('down_conf', 'work_retries', fallback='3'))
+        retry_backoff = float(self.config.get('down_conf', 'retry_backoff', fallback='30'))
+        refill_watermark = int(self.config.get('down_conf', 'refill_watermark', fallback='2'))
+        refill_interval = float(self.config.get('down_conf', 'refill_interval', fallback='60'))
+        schedule_policy = self.config.get('down_conf', 'schedule_policy', fallback='age')
+        writer_threads = int(self.config.get('down_conf', 'writer_threads', fallback='2'))
+        write_buffer_mb = int(self.config.get('down_conf', 'write_buffer_mb', fallback='64'))
+        fsync_policy = self.config.get('down_conf', 'fsync_policy', fallback='none')
+        fsync_interval_mb = int(self.config.get('down_conf', 'fsync_interval_mb', fallback='64'))
         if download_path[1:] == '\\' or download_path[1:] == '/':
             download_path = download_path[:-1]
         if '\\' in download_path:
@@ -99,44 +126,54 @@ class ReadConf:
             'timeout': timeout,
             'min_speed': min_speed,
             'min_speed_check': min_speed_check,
+            'segment_count': segment_count,
+            'segment_threshold': segment_threshold,
+            'max_concurrent': max_concurrent,
+            'file_workers': file_workers,
+            'max_list_pages': max_list_pages,
+            'list_workers': list_workers,
+            'detail_workers': detail_workers,
+            'probe_workers': probe_workers,
+            'host_speed_limit': host_speed_limit,
+            'progress_fps': progress_fps,
+            'verify_workers': verify_workers,
+            'connect_timeout': connect_timeout,
+            'stall_window': stall_window,
+            'work_retries': work_retries,
+            'retry_backoff': retry_backoff,
+            'refill_watermark': refill_watermark,
+            'refill_interval': refill_interval,
+            'schedule_policy': schedule_policy,
+            'writer_threads': writer_threads,
+            'write_buffer_mb': write_buffer_mb,
+            'fsync_policy': fsync_policy,
+            'fsync_interval_mb': fsync_interval_mb,
         }
 
     def write_speed_limit(self, speed_limit):
         self.config.set('down_conf', 'speed_limit', speed_limit)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_max_retries(self, max_retries):
         self.config.set('down_conf', 'max_retries', max_retries)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_timeout(self, timeout):
         self.config.set('down_conf', 'timeout', timeout)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_min_speed(self, min_speed):
         self.config.set('down_conf', 'min_speed', str(min_speed))
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_min_speed_check(self, min_speed_check):
         self.config.set('down_conf', 'min_speed_check', str(min_speed_check))
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
 
     def write_download_conf_(self, download_path):
         self.config.set('down_conf', 'download_path', download_path)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
 
     def read_asmr_user(self):
@@ -155,24 +192,18 @@ class ReadConf:
     def write_asmr_username(self, username, passwd):
         self.config.set('user', 'username', username)
         self.config.set('user', 'passwd', passwd)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_asmr_token(self, recommenderUuid, token):
         self.config.set('user', 'recommenderUuid', recommenderUuid)
         self.config.set('user', 'token', token)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
 
     def write_download_conf(self, speed_limit, download_path):
         self.config.set('down_conf', 'speed_limit', speed_limit)
         self.config.set('down_conf', 'download_path', download_path)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def read_proxy_conf(self):
         host = self.config.get('proxy', 'host')
@@ -192,21 +223,15 @@ class ReadConf:
 
     def write_proxy_host(self, proxy_host):
         self.config.set('proxy', 'host', proxy_host)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_proxy_port(self, proxy_port):
         self.config.set('proxy', 'port', proxy_port)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_proxy_type(self, proxy_type):
         self.config.set('proxy', 'type', proxy_type)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def write_open_proxy(self, open_proxy):
         # if open_proxy:
@@ -214,9 +239,7 @@ class ReadConf:
         # else:
         #     open_proxy = 'False'
         self.config.set('proxy', 'open_proxy', open_proxy)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
     def read_website_course(self):
         site_source = self.config.get('mirror_site', 'site_source')
@@ -224,9 +247,27 @@ class ReadConf:
 
     def write_website_course(self, site_source):
         self.config.set('mirror_site', 'site_source', site_source)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
+
+    def read_mirror_conf(self):
+        """读取镜像站点设置，site_source 为 'Auto' 时按测速结果自动选择"""
+        site_source = self.config.get('mirror_site', 'site_source')
+        probe_interval = float(self.config.get('mirror_site', 'probe_interval', fallback='30'))
+        return {
+            'site_source': site_source,
+            'probe_interval': probe_interval * 60,  # 分钟转换为秒
+        }
+
+    def read_cache_conf(self):
+        """读取本地API缓存设置"""
+        open_cache = self.config.get('cache', 'open_cache', fallback='True')
+        detail_ttl = float(self.config.get('cache', 'detail_ttl', fallback='12'))
+        max_size = int(self.config.get('cache', 'max_size', fallback='64'))
+        return {
+            'open_cache': open_cache == 'True',
+            'detail_ttl': detail_ttl * 3600,  # 小时转换为秒
+            'max_size': max_size * 1024 * 1024,  # MB转换为字节
+        }
 
     def read_language_setting(self):
         """读取语言设置"""
@@ -241,9 +282,7 @@ class ReadConf:
         if not self.config.has_section('language'):
             self.config.add_section('language')
         self.config.set('language', 'current', language_code)
-        config_path = self.get_config_path()
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            self.config.write(configfile)
+        self.save_config()
 
 def create_ini_file():
     config = configparser.ConfigParser()
@@ -273,10 +312,35 @@ def create_ini_file():
     config['down_conf'] = {
         'speed_limit': '10',
         'max_retries': '10',
-        'timeout': '10',
+        'timeout': '10',  # 读取超时（秒），连续这么久收不到数据视为连接停滞
         'download_path': default_path,
         'min_speed': '256',
         'min_speed_check': '30',
+        'segment_count': '4',  # 大文件分段下载的并发连接数，1 表示不分段
+        'segment_threshold': '64',  # MB，超过此大小的文件使用分段下载
+        'max_concurrent': '3',  # 同时下载的作品数量
+        'file_workers': '4',  # 每个作品内同时下载的文件数量
+        'max_list_pages': '0',  # 获取下载列表的最大页数，0 表示获取全部
+        'list_workers': '3',  # 同时获取下载列表分页的请求数
+        'detail_workers': '4',  # 同时获取作品详情的请求数
+        'probe_workers': '8',  # 同时探测文件大小的HEAD请求数
+        'host_speed_limit': '0',  # 单个服务器的速度限制（MB/s），0 表示不单独限制
+        'progress_fps': '10',  # 下载进度每秒刷新次数
+        'verify_workers': '4',  # 校验已下载文件时同时读取的文件数
+        'connect_timeout': '5',  # 建立连接的超时时间（秒）
+        'stall_window': '5',  # 秒，按最近这段时间的速度判断下载是否停滞
+        'work_retries': '3',  # 作品下载失败后自动重试的次数，重试期间其他作品继续下载
+        'retry_backoff': '30',  # 秒，第一次重试前的等待时间，之后每次翻倍
+        'refill_watermark': '2',  # 自动下载时排队的作品少于等于这个数量就在后台获取新的下载列表
+        'refill_interval': '60',  # 秒，两次后台获取下载列表的最短间隔
+        # 排队作品的下载顺序：age（按加入顺序）、smallest_first（剩余大小最小的优先）、largest_remaining_first（剩余大小最大的优先）、
+        # makespan（整批作品尽早全部完成，队列空了以后空闲槽位的连接用于加速剩余的大文件）
+        'schedule_policy': 'age',
+        'writer_threads': '2',  # 写入磁盘的线程数，下载线程收到的数据由这些线程写入
+        'write_buffer_mb': '64',  # MB，等待写入磁盘的数据上限，超过时下载线程等待磁盘
+        # 同步到磁盘的方式：none（由系统决定）、on_complete（每个文件完成时同步）、interval（每写入 fsync_interval_mb 同步一次）
+        'fsync_policy': 'none',
+        'fsync_interval_mb': '64',
     }
 
     # 配置 [user] 部分
@@ -322,7 +386,15 @@ def create_ini_file():
     }
 
     config['mirror_site'] = {
-        'site_source': 'Original',
+        'site_source': 'Original',  # Original/Mirror-1/Mirror-2/Mirror-3，Auto 表示按测速结果自动选择
+        'probe_interval': '30',  # 分钟，自动选择时重新测速的间隔
+    }
+
+    # 本地API缓存设置
+    config['cache'] = {
+        'open_cache': 'True',
+        'detail_ttl': '12',  # 作品详情缓存有效期（小时）
+        'max_size': '64',  # 缓存文件最大大小（MB），超出后删除最久未使用的记录
     }
 
     # 配置语言设置
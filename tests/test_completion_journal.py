@@ -0,0 +1,61 @@
+import os
+from src.download.completion_journal import (
+    CompletionJournal, JOURNAL_NAME, get_segments_path, read_segment_progress, write_segment_progress,
+    remove_segment_progress
+)
+
+
+def test_add_and_remove_round_trip(tmp_path):
+    work_dir = str(tmp_path)
+    track = os.path.join(work_dir, 'disc1', 'a.mp3')
+    other = os.path.join(work_dir, 'b.mp3')
+    journal = CompletionJournal(work_dir)
+    journal.add(track, 100, 'sha256:abc')
+    journal.add(other, 200)
+    journal.remove(other)
+
+    reloaded = CompletionJournal(work_dir)
+    assert reloaded.is_completed(track, 100)
+    assert reloaded.entries['disc1/a.mp3'] == {'size': 100, 'hash': 'sha256:abc'}
+    assert not reloaded.is_completed(other)
+
+    # 移除后重新下载完成，以最后一条记录为准
+    reloaded.add(other, 250)
+    assert CompletionJournal(work_dir).is_completed(other, 250)
+
+
+def test_size_mismatch_means_not_completed(tmp_path):
+    journal = CompletionJournal(str(tmp_path))
+    path = os.path.join(str(tmp_path), 'a.mp3')
+    journal.add(path, 100)
+    assert journal.is_completed(path)  # API没有提供大小
+    assert not journal.is_completed(path, 120)
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    work_dir = str(tmp_path)
+    path = os.path.join(work_dir, 'a.mp3')
+    CompletionJournal(work_dir).add(path, 100)
+    with open(os.path.join(work_dir, JOURNAL_NAME), 'a', encoding='utf-8') as f:
+        f.write('{"path": "b.mp3", "si')  # 写入中断
+
+    journal = CompletionJournal(work_dir)
+    assert journal.is_completed(path, 100)
+    assert list(journal.entries) == ['a.mp3']
+
+
+def test_segment_progress_round_trip(tmp_path):
+    path = os.path.join(str(tmp_path), 'a.mp3')
+    assert read_segment_progress(path) is None
+    write_segment_progress(path, 4096)
+    assert read_segment_progress(path) == 4096
+    remove_segment_progress(path)
+    assert read_segment_progress(path) is None
+    remove_segment_progress(path)  # 没有记录时不报错
+
+
+def test_corrupt_segment_progress_trusts_nothing(tmp_path):
+    path = os.path.join(str(tmp_path), 'a.mp3')
+    with open(get_segments_path(path), 'w', encoding='utf-8') as f:
+        f.write('{"comp')
+    assert read_segment_progress(path) == 0
@@ -0,0 +1,103 @@
+import os
+import random
+import threading
+import time
+import src.download.disk_writer as disk_writer
+from src.download.disk_writer import DiskWriter, FSYNC_NONE, FSYNC_INTERVAL, FSYNC_ON_COMPLETE, sync_file
+
+KB = 1024
+
+
+def make_writer(**kwargs):
+    writer = DiskWriter(**kwargs)
+    writer.coalesce_bytes = KB  # 每次写入都提交，便于观察队列
+    return writer
+
+
+def test_out_of_order_blocks_land_at_their_offsets(tmp_path):
+    data = os.urandom(64 * KB)
+    offsets = list(range(0, len(data), 4 * KB))
+    random.Random(1).shuffle(offsets)
+    path = tmp_path / 'out.bin'
+    writer = make_writer(threads=2)
+    with writer.open(str(path), 'wb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            f.write(data[offset:offset + 4 * KB])
+    assert path.read_bytes() == data
+
+
+def test_append_mode_continues_after_existing_data(tmp_path):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'head')
+    writer = make_writer(threads=1)
+    with writer.open(str(path), 'ab') as f:
+        for index in range(100):
+            f.write(bytes([index]) * 100)
+    assert path.read_bytes() == b'head' + b''.join(bytes([index]) * 100 for index in range(100))
+    assert writer.stats()['pending_bytes'] == 0
+
+
+def test_full_queue_blocks_writer_until_disk_catches_up(tmp_path, monkeypatch):
+    writer = make_writer(threads=1, max_pending_bytes=4 * KB)
+    release = threading.Event()
+    write_jobs = writer.write_jobs
+
+    def slow_write_jobs(handle, jobs):
+        release.wait()
+        return write_jobs(handle, jobs)
+
+    monkeypatch.setattr(writer, 'write_jobs', slow_write_jobs)
+    path = tmp_path / 'out.bin'
+    data = os.urandom(16 * KB)
+
+    def download():
+        with writer.open(str(path), 'wb') as f:
+            for offset in range(0, len(data), KB):
+                f.write(data[offset:offset + KB])
+
+    thread = threading.Thread(target=download)
+    thread.start()
+    time.sleep(0.3)
+    # 磁盘写不动时下载线程停在上限处，不会继续占用内存
+    assert thread.is_alive()
+    assert writer.stats()['pending_bytes'] <= 4 * KB
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert path.read_bytes() == data
+    stats = writer.stats()
+    assert stats['wait_count'] >= 1
+    assert stats['peak_pending_bytes'] <= 4 * KB
+    assert stats['pending_bytes'] == 0
+
+
+def count_fsync(monkeypatch):
+    calls = []
+    monkeypatch.setattr(disk_writer.os, 'fsync', lambda fd: calls.append(fd))
+    return calls
+
+
+def write_file(writer, path, size):
+    with writer.open(str(path), 'wb') as f:
+        for _ in range(size // KB):
+            f.write(b'x' * KB)
+            f.flush()  # 逐块写入磁盘，写入线程不会把它们合并成一次写入
+
+
+def test_interval_policy_syncs_periodically_and_on_close(tmp_path, monkeypatch):
+    calls = count_fsync(monkeypatch)
+    writer = make_writer(threads=1, fsync_policy=FSYNC_INTERVAL, fsync_interval_bytes=4 * KB)
+    write_file(writer, tmp_path / 'out.bin', 10 * KB)
+    # 每 4 KB 一次，关闭时剩余的 2 KB 再同步一次
+    assert len(calls) == 3
+
+
+def test_none_and_on_complete_policies_do_not_sync_while_writing(tmp_path, monkeypatch):
+    calls = count_fsync(monkeypatch)
+    for policy in (FSYNC_NONE, FSYNC_ON_COMPLETE):
+        write_file(make_writer(threads=1, fsync_policy=policy), tmp_path / f'{policy}.bin', 10 * KB)
+    assert calls == []
+    # on_complete 由下载线程在重命名前调用 sync_file
+    sync_file(str(tmp_path / f'{FSYNC_ON_COMPLETE}.bin'))
+    assert len(calls) == 1
@@ -0,0 +1,51 @@
+from src.download.download_scheduler import DownloadScheduler, POLICY_SMALLEST_FIRST
+
+
+def push(scheduler, work_id, **kwargs):
+    scheduler.push((work_id, {}, None), **kwargs)
+
+
+def pop_all(scheduler):
+    order = []
+    while True:
+        item = scheduler.pop()
+        if item is None:
+            return order
+        order.append(item[0])
+
+
+def test_age_order():
+    scheduler = DownloadScheduler()
+    for work_id in ('1', '2', '3'):
+        push(scheduler, work_id)
+    assert pop_all(scheduler) == ['1', '2', '3']
+
+
+def test_removed_then_pushed_again_goes_to_the_back():
+    scheduler = DownloadScheduler()
+    for work_id in ('1', '2', '3'):
+        push(scheduler, work_id)
+    scheduler.remove('1')
+    push(scheduler, '1')
+    assert pop_all(scheduler) == ['2', '3', '1']
+
+
+def test_popped_then_pushed_again_ignores_stale_entries():
+    scheduler = DownloadScheduler()
+    for work_id in ('1', '2', '3'):
+        push(scheduler, work_id)
+    scheduler.set_priority('1', 5)
+    assert scheduler.pop()[0] == '1'
+    push(scheduler, '1')
+    assert pop_all(scheduler) == ['2', '3', '1']
+
+
+def test_pin_and_priority():
+    scheduler = DownloadScheduler(POLICY_SMALLEST_FIRST)
+    push(scheduler, '1', remaining_bytes=300)
+    push(scheduler, '2', remaining_bytes=100)
+    push(scheduler, '3', remaining_bytes=200)
+    scheduler.pin('1')
+    scheduler.set_priority('3', 1)
+    assert scheduler.work_ids() == ['1', '3', '2']
+    assert pop_all(scheduler) == ['1', '3', '2']
@@ -0,0 +1,65 @@
+from src.download.job_store import (
+    DownloadJobStore, WORK_DOWNLOADING, WORK_PAUSED, WORK_COMPLETED, WORK_FAILED, WORK_RETRYING,
+    FILE_DOWNLOADING, FILE_FAILED
+)
+
+
+def detail(work_id):
+    return {'id': work_id, 'title': f'作品{work_id}', 'files': []}
+
+
+def restored_ids(db_path):
+    """重新打开数据库（模拟重启）后恢复的作品顺序"""
+    return [work_id for work_id, _, _, _ in DownloadJobStore(str(db_path)).unfinished_works()]
+
+
+def test_unfinished_works_restore_in_queue_order(tmp_path):
+    db_path = tmp_path / 'jobs.db'
+    store = DownloadJobStore(str(db_path))
+    for work_id in (3, 1, 2, 4, 5):
+        store.add_work(work_id, detail(work_id), {'id': work_id})
+    store.set_work_state(1, WORK_DOWNLOADING)
+    store.set_work_state(2, WORK_PAUSED)
+    store.set_work_state(4, WORK_COMPLETED)
+    store.set_work_state(5, WORK_RETRYING, 'timeout')
+
+    assert restored_ids(db_path) == ['3', '1', '2', '5']
+    work_id, work_detail, work_info, state = DownloadJobStore(str(db_path)).unfinished_works()[1]
+    assert (work_id, work_detail, work_info, state) == ('1', detail(1), {'id': 1}, WORK_DOWNLOADING)
+
+
+def test_failed_and_removed_works_are_not_restored(tmp_path):
+    db_path = tmp_path / 'jobs.db'
+    store = DownloadJobStore(str(db_path))
+    for work_id in (1, 2, 3):
+        store.add_work(work_id, detail(work_id))
+    store.set_work_state(1, WORK_FAILED, 'gone')
+    store.set_file_state(2, '/works/2/a.mp3', FILE_DOWNLOADING, 1024)
+    store.remove_works([2])
+
+    assert restored_ids(db_path) == ['3']
+    assert DownloadJobStore(str(db_path)).get_file_states(2) == {}
+
+
+def test_readded_work_moves_to_the_end(tmp_path):
+    db_path = tmp_path / 'jobs.db'
+    store = DownloadJobStore(str(db_path))
+    for work_id in (1, 2, 3):
+        store.add_work(work_id, detail(work_id))
+    store.set_work_state(1, WORK_FAILED, 'gone')
+    store.add_work(1, detail(1))
+
+    assert restored_ids(db_path) == ['2', '3', '1']
+
+
+def test_file_offsets_survive_restart(tmp_path):
+    db_path = tmp_path / 'jobs.db'
+    store = DownloadJobStore(str(db_path))
+    store.add_work(1, detail(1))
+    store.set_file_state(1, '/works/1/a.mp3', FILE_DOWNLOADING, 4096, size=8192)
+    store.set_file_state(1, '/works/1/b.mp3', FILE_FAILED, 0, error='404')
+
+    assert DownloadJobStore(str(db_path)).get_file_states('1') == {
+        '/works/1/a.mp3': (FILE_DOWNLOADING, 4096),
+        '/works/1/b.mp3': (FILE_FAILED, 0),
+    }
@@ -0,0 +1,84 @@
+import time
+import pytest
+import src.download.rate_limiter as rate_limiter
+from src.download.rate_limiter import RateLimiter
+
+MB = 1024 * 1024
+
+
+class FakeConf:
+    """只提供限速器读取的配置，不读写 conf.ini"""
+    config_version = 0
+    speed_limit = 10  # MB/s
+
+    def read_download_conf(self):
+        return {'speed_limit': FakeConf.speed_limit, 'host_speed_limit': 0}
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'ReadConf', FakeConf)
+    return RateLimiter()
+
+
+def work_rates(limiter):
+    return {work_id: bucket.rate for work_id, bucket in limiter.work_buckets.items()}
+
+
+def measure(limiter, usage, elapsed=1.0):
+    """模拟一个统计周期：各作品在 elapsed 秒内申请了 usage 中的字节数"""
+    limiter.work_usage = dict(usage)
+    limiter.last_rebalance_time = time.monotonic() - elapsed
+    limiter.update_work_rates(measure=True)
+
+
+def test_new_works_split_evenly(limiter):
+    limiter.open('a', 'http://h/a')
+    limiter.open('b', 'http://h/b')
+    assert work_rates(limiter) == {'a': 5 * MB, 'b': 5 * MB}
+
+
+def test_unused_share_goes_to_other_works(limiter):
+    limiter.open('slow', 'http://h/slow')
+    limiter.open('fast', 'http://h/fast')
+    # 慢作品只用了 1 MB/s，只分配实际速度加余量，其余的给快作品
+    measure(limiter, {'slow': 1 * MB, 'fast': 8 * MB})
+    rates = work_rates(limiter)
+    assert rates['slow'] == pytest.approx(1 * MB * limiter.headroom, rel=1e-3)
+    assert rates['fast'] == pytest.approx(10 * MB - rates['slow'])
+
+
+def test_idle_work_keeps_minimum_share(limiter):
+    limiter.open('idle', 'http://h/idle')
+    limiter.open('busy', 'http://h/busy')
+    measure(limiter, {'idle': 0, 'busy': 8 * MB})
+    rates = work_rates(limiter)
+    assert rates['idle'] == pytest.approx(10 * MB * limiter.min_share_ratio, rel=1e-3)
+    assert sum(rates.values()) == pytest.approx(10 * MB)
+
+
+def test_released_work_returns_its_share(limiter):
+    throttle = limiter.open('a', 'http://h/a')
+    limiter.open('b', 'http://h/b')
+    throttle.close()
+    assert work_rates(limiter) == {'b': 10 * MB}
+
+
+def test_work_is_not_slowed_by_another_works_debt(limiter, monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, 'sleep', lambda seconds: None)
+    limiter.open('greedy', 'http://h/greedy')
+    limiter.open('light', 'http://h/light')
+    greedy_wait = limiter.acquire(20 * MB, 'greedy', 'h')
+    light_wait = limiter.acquire(64 * 1024, 'light', 'h')
+    assert greedy_wait > 3.0
+    assert light_wait < 0.05
+
+
+def test_throttle_batches_small_reads(limiter, monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, 'sleep', lambda seconds: None)
+    throttle = limiter.open('a', 'http://h/a')
+    limiter.work_usage['a'] = 0
+    throttle.consume(limiter.batch_size - 1)
+    assert limiter.work_usage['a'] == 0
+    throttle.consume(1)
+    assert limiter.work_usage['a'] == limiter.batch_size
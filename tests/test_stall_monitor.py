@@ -0,0 +1,30 @@
+from src.download.stall_monitor import ThroughputMonitor
+
+
+def feed(monitor, chunk, network_time, throttle_time, duration, pass_idle=True):
+    """模拟稳定的连接：每块数据接收耗时 network_time，之后在限速器中休眠 throttle_time"""
+    now = 0.0
+    while now < duration:
+        now += network_time + throttle_time
+        reason = monitor.add(chunk, now=now, idle=throttle_time if pass_idle else 0.0)
+        if reason:
+            return now, reason
+    return None
+
+
+def test_throttled_steady_stream_is_not_flagged():
+    # 限速到约 170 KB/s，最小速度 256 KB/s，连接本身每块只需 0.02 秒
+    monitor = ThroughputMonitor(256 * 1024, window=5.0, warmup=30.0, now=0.0)
+    assert feed(monitor, 17 * 1024, 0.02, 0.08, 120.0) is None
+
+
+def test_throttle_time_counted_as_stall_without_idle():
+    monitor = ThroughputMonitor(256 * 1024, window=5.0, warmup=30.0, now=0.0)
+    result = feed(monitor, 17 * 1024, 0.02, 0.08, 120.0, pass_idle=False)
+    assert result is not None and result[0] >= 30.0
+
+
+def test_slow_stream_is_still_flagged():
+    monitor = ThroughputMonitor(256 * 1024, window=5.0, warmup=30.0, now=0.0)
+    result = feed(monitor, 17 * 1024, 0.1, 0.0, 120.0)
+    assert result is not None
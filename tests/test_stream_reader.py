@@ -0,0 +1,89 @@
+import threading
+import time
+import http.server
+
+import pytest
+import requests
+
+from src.download.stream_reader import StreamReader
+
+
+FAST_BYTES = 2 * 1024 * 1024
+TOTAL_BYTES = 10 * 1024 * 1024
+DATA = bytes(range(256)) * (TOTAL_BYTES // 256)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(TOTAL_BYTES))
+        self.end_headers()
+        if self.path == '/full':
+            self.wfile.write(DATA)
+            return
+        self.wfile.write(DATA[:FAST_BYTES])
+        self.wfile.flush()
+        if self.path == '/truncated':
+            self.close_connection = True
+            return
+        # 之后每 0.2 秒只发送 100 字节，直到客户端断开
+        position = FAST_BYTES
+        try:
+            while position < TOTAL_BYTES:
+                time.sleep(0.2)
+                self.wfile.write(DATA[position:position + 100])
+                self.wfile.flush()
+                position += 100
+        except OSError:
+            pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_reads_whole_response(server_url):
+    with requests.Session() as session:
+        response = session.get(f'{server_url}/full', stream=True, timeout=10)
+        received = bytearray()
+        for chunk in StreamReader(response, bytearray(StreamReader.max_block_size)).blocks():
+            received += chunk
+        assert bytes(received) == DATA
+
+
+def test_trickling_link_returns_control(server_url):
+    """链路降到极慢时每块仍在 max_block_time 左右返回，调用方可以暂停或判断停滞"""
+    with requests.Session() as session:
+        response = session.get(f'{server_url}/trickle', stream=True, timeout=10)
+        received = 0
+        gaps = []
+        last = time.monotonic()
+        for chunk in StreamReader(response).blocks():
+            now = time.monotonic()
+            if received >= FAST_BYTES:
+                gaps.append(now - last)
+            last = now
+            received += len(chunk)
+            if len(gaps) >= 5:
+                break
+        response.close()
+    assert len(gaps) == 5
+    assert max(gaps) < 1.0
+
+
+def test_early_close_raises(server_url):
+    with requests.Session() as session:
+        response = session.get(f'{server_url}/truncated', stream=True, timeout=10)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            for _ in StreamReader(response).blocks():
+                pass